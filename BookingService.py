@@ -0,0 +1,494 @@
+# BookingService.py — asyncio JSON-over-HTTP booking service, Python 3.8
+#
+#   python BookingService.py                          # backend from DB_Config_sample.BACKEND
+#   python BookingService.py --backend sqlite --sqlite :memory: --seed 30
+#
+# Clients use BACKEND = "http". The service owns the DB connection pool and keeps an
+# authoritative in-memory occupancy grid for the booking window, so DB load does not
+# grow with the number of desktop clients. GET /events is a Server-Sent Events stream
+# of booking deltas {"op", "m" machine_id, "d" date, "s" slot, "n" name, "w" wwid}.
+# It listens on 127.0.0.1 unless told otherwise; with SERVICE["token"] set, every request
+# but /health must carry "Authorization: Bearer <token>". GET /machines never lists the
+# password columns, GET /machines/<sn> returns the full row.
+import argparse, asyncio, hmac, json, logging, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import DB_Config_sample
+from Repo import Repo, SQLiteRepo, make_repo, DB_ERRORS
+from Recurring import expand_window
+from Sweeper import Sweeper
+from Metrics import QUERY_STATS
+
+log = logging.getLogger("RemoteVNCBooking.service")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+WINDOW_DAYS = 15                        # today + 14, same as DateEdit
+SSE_PING_S = 15                         # keep-alive comment so clients notice dead streams
+SSE_QUEUE = 1000                        # events buffered per subscriber before it is dropped
+SECRETS = ("host_account_password", "windows_password")     # left out of GET /machines
+
+def _row(mid: int, date_s: str, slot: int, r: dict) -> dict:
+    return {"machine_id": mid, "date": date_s, "slot": slot,
+            "display_name": r.get("display_name") or "", "wwid": r.get("wwid") or ""}
+
+def _delta(op: str, mid: int, date_s: str, slot: int, name: str = "", wwid: str = "") -> dict:
+    return {"op": op, "m": mid, "d": date_s, "s": slot, "n": name, "w": wwid}
+
+def _diff(date_s: str, old: Dict[int, Dict[int, dict]], new: Dict[int, Dict[int, dict]]) -> List[dict]:
+    out = []
+    for mid in set(old) | set(new):
+        a, b = old.get(mid, {}), new.get(mid, {})
+        for slot in set(a) | set(b):
+            ra, rb = a.get(slot), b.get(slot)
+            if rb is None:
+                out.append(_delta("cancel", mid, date_s, slot))
+            elif ra is None or (ra["wwid"], ra["display_name"]) != (rb["wwid"], rb["display_name"]):
+                out.append(_delta("book", mid, date_s, slot, rb["display_name"], rb["wwid"]))
+    return out
+
+class HttpError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+class BookingService:
+    REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+    def __init__(self, repo: Repo, pool_size: int = 4, resync_s: float = 60.0, recurring_s: float = 0.0,
+                 sweeper: Optional[Sweeper] = None, sweep_s: float = 60.0, token: str = ""):
+        self.repo = repo
+        self.token = token
+        repo.enable_pool(pool_size)
+        self._db = ThreadPoolExecutor(pool_size, thread_name_prefix="db")
+        self.resync_s = resync_s
+        self.recurring_s = recurring_s
+        self.sweeper = sweeper
+        self.sweep_s = sweep_s
+        self.machines: List[dict] = []
+        self.listing: List[dict] = []    # self.machines without SECRETS, served by GET /machines
+        self.details: Dict[str, dict] = {}   # get_machine_by_sn() rows (every column), dropped with the fingerprint
+        self.fingerprint = ""            # Repo.machines_fingerprint() of self.machines
+        # date -> machine_id -> slot -> row
+        self.grid: Dict[str, Dict[int, Dict[int, dict]]] = {}
+        self._locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+        self._version = 0                # bumped by every local write; a resync that raced one is dropped
+        self.requests = 0
+        self.db_calls = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.seq = 0
+        self.routes = {
+            ("GET", "/health"): self.h_health,
+            ("GET", "/machines"): self.h_machines,
+            ("GET", "/snapshot"): self.h_snapshot,
+            ("POST", "/book"): self.h_book,
+            ("POST", "/cancel"): self.h_cancel,
+            ("POST", "/apply"): self.h_apply,
+            ("POST", "/connections"): self.h_connections,
+        }
+
+    async def db(self, fn, *a):
+        self.db_calls += 1
+        return await asyncio.get_running_loop().run_in_executor(self._db, lambda: fn(*a))
+
+    def _lock(self, mid: int, date_s: str) -> asyncio.Lock:
+        k = (mid, date_s)
+        if k not in self._locks:
+            self._locks[k] = asyncio.Lock()
+        return self._locks[k]
+
+    # push
+    def publish(self, deltas: List[dict]):
+        if not deltas:
+            return
+        self.seq += 1
+        data = ("id: %d\nevent: delta\ndata: %s\n\n" % (
+            self.seq, json.dumps({"seq": self.seq, "deltas": deltas}, ensure_ascii=False))).encode("utf-8")
+        for q in list(self.subscribers):
+            try:
+                q.put_nowait(data)
+            except asyncio.QueueFull:             # too slow: drop it, the client reconnects and resyncs
+                self.subscribers.discard(q)
+
+    async def stream_events(self, writer: asyncio.StreamWriter):
+        q: asyncio.Queue = asyncio.Queue(SSE_QUEUE)
+        self.subscribers.add(q)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Connection: close\r\n\r\n")
+            writer.write(("event: hello\ndata: {\"seq\": %d}\n\n" % self.seq).encode())
+            await writer.drain()
+            while q in self.subscribers:
+                try:
+                    data = await asyncio.wait_for(q.get(), SSE_PING_S)
+                except asyncio.TimeoutError:
+                    data = b": ping\n\n"
+                writer.write(data)
+                await writer.drain()
+        finally:
+            self.subscribers.discard(q)
+
+    # state
+    def _window(self) -> Tuple[str, str]:
+        d0 = datetime.now(TZ).date()
+        return d0.isoformat(), (d0 + timedelta(days=WINDOW_DAYS - 1)).isoformat()
+
+    def _fill(self, dates: List[str], rows: List[dict]) -> Dict[str, Dict[int, Dict[int, dict]]]:
+        g: Dict[str, Dict[int, Dict[int, dict]]] = {d: {} for d in dates}
+        for r in rows:
+            d = str(r["date"]); mid = int(r["machine_id"]); slot = int(r["slot"])
+            g.setdefault(d, {}).setdefault(mid, {})[slot] = _row(mid, d, slot, r)
+        return g
+
+    async def resync(self):
+        """Reload the whole window, and the machines if their fingerprint moved (two or
+        three queries, independent of client count)."""
+        v = self._version
+        d0, d1 = self._window()
+        fp = await self.db(self.repo.machines_fingerprint)
+        if fp != self.fingerprint:
+            machines = await self.db(self.repo.list_machines)
+            self.machines, self.fingerprint = machines, fp
+            self.listing = [{k: v for k, v in m.items() if k not in SECRETS} for m in machines]
+            self.details = {}
+        rows = await self.db(self.repo.bookings_between, d0, d1)
+        if v != self._version:
+            log.debug("resync raced a write, keeping local grid")
+            return
+        start = date.fromisoformat(d0)
+        dates = [(start + timedelta(days=i)).isoformat() for i in range(WINDOW_DAYS)]
+        fresh = self._fill(dates, rows)
+        for d in list(self.grid):
+            if d < d0:
+                del self.grid[d]
+        deltas = []
+        for d, g in fresh.items():
+            if d in self.grid:
+                deltas += _diff(d, self.grid[d], g)      # written behind the service's back
+        self.grid.update(fresh)
+        self.publish(deltas)
+        log.info("resynced %d machines, %d bookings in %s..%s", len(self.machines), len(rows), d0, d1)
+
+    async def _date(self, date_s: str) -> Dict[int, Dict[int, dict]]:
+        if date_s not in self.grid:
+            rows = await self.db(self.repo.bookings_of, None, date_s)
+            self.grid.update(self._fill([date_s], rows))
+        return self.grid[date_s]
+
+    async def resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync_s)
+            try:
+                await self.resync()
+            except DB_ERRORS as e:
+                log.warning("resync failed: %s", e)
+
+    async def recurring_loop(self):
+        """Expand recurring rules over the window, then resync so the new rows reach subscribers."""
+        try:
+            await self.db(self.repo.create_recurring_schema)
+        except DB_ERRORS as e:
+            log.warning("recurring rules unavailable: %s", e)
+            return
+        while True:
+            res = await self.db(expand_window, self.repo)
+            if any(r["booked"] for r in res):
+                try:
+                    await self.resync()
+                except DB_ERRORS as e:
+                    log.warning("resync after expansion failed: %s", e)
+            await asyncio.sleep(self.recurring_s)
+
+    async def sweeper_loop(self):
+        """Release no-show bookings; the grid is patched and cancels pushed without a resync."""
+        try:
+            await self.db(self.repo.create_usage_schema)
+        except DB_ERRORS as e:
+            log.warning("sweeper disabled: %s", e)
+            return
+        while True:
+            self._version += 1
+            try:
+                rows = await self.db(self.sweeper.sweep)
+            except DB_ERRORS as e:
+                log.warning("sweep failed: %s", e)
+                rows = []
+            if rows:
+                self._version += 1
+                for r in rows:
+                    d, mid, slot = str(r["date"]), int(r["machine_id"]), int(r["slot"])
+                    self.grid.get(d, {}).get(mid, {}).pop(slot, None)
+                self.publish([_delta("cancel", int(r["machine_id"]), str(r["date"]), int(r["slot"])) for r in rows])
+            await asyncio.sleep(self.sweep_s)
+
+    # handlers
+    async def h_health(self, q, body):
+        return {"ok": True, "machines": len(self.machines), "dates": len(self.grid),
+                "requests": self.requests, "db_calls": self.db_calls, "circuit": self.repo.breaker.state,
+                "subscribers": len(self.subscribers), "seq": self.seq, "gauges": QUERY_STATS.gauges}
+
+    async def h_machines(self, q, body, sn: Optional[str] = None):
+        if sn is None:
+            return {"fingerprint": self.fingerprint} if "fingerprint" in q else self.listing
+        row = self.details.get(sn)
+        if row is None:
+            fp = self.fingerprint
+            row = await self.db(self.repo.get_machine_by_sn, sn)
+            if row is None:
+                raise HttpError(404, f"machine not found: {sn}")
+            if fp == self.fingerprint:               # not a row read across an inventory change
+                self.details[sn] = row
+        if "date" in q:
+            # connect_info(): the booking comes from the grid, no database round trip
+            b = (await self._date(q["date"])).get(int(row["id"]), {}).get(int(q.get("slot", -1)))
+            return dict(row, booked_name=b["display_name"] if b else None, booked_wwid=b["wwid"] if b else None)
+        return row
+
+    async def h_snapshot(self, q, body):
+        if "wwid" in q:
+            # "my bookings": the window is in memory, so this is a scan, not a query
+            d0 = max(q.get("from", ""), self._window()[0])
+            sn = {int(m["id"]): m["sn"] for m in self.machines}
+            out = [dict(r, sn=sn.get(mid, "")) for d in sorted(self.grid) if d >= d0
+                   for mid, occ in self.grid[d].items() for r in occ.values() if r["wwid"] == q["wwid"]]
+            out.sort(key=lambda r: (r["date"], r["sn"], r["slot"]))
+            return out
+        if "from" in q:
+            d0, d1 = q["from"], q.get("to", q["from"])
+            ids = {int(x) for x in q.get("machine_ids", "").split(",") if x}
+            span = (date.fromisoformat(d1) - date.fromisoformat(d0)).days
+            if span < 0 or span > 62:
+                raise HttpError(400, "date range must be 0..62 days")
+            out = []
+            for i in range(span + 1):
+                d = (date.fromisoformat(d0) + timedelta(days=i)).isoformat()
+                for mid, occ in (await self._date(d)).items():
+                    if not ids or mid in ids:
+                        out.extend(occ.values())
+            return out
+        date_s = q.get("date")
+        if date_s is None:
+            mid = q.get("machine_id")
+            return await self.db(self.repo.bookings_of, int(mid) if mid else None, None)
+        g = await self._date(date_s)
+        if "machine_id" in q:
+            return list(g.get(int(q["machine_id"]), {}).values())
+        return [r for occ in g.values() for r in occ.values()]
+
+    async def h_book(self, q, body):
+        mid, date_s = int(body["machine_id"]), str(body["date"])
+        name, wwid = body.get("display_name", ""), body.get("wwid", "")
+        slots = sorted({int(s) for s in body.get("slots", [])})
+        async with self._lock(mid, date_s):
+            occ = (await self._date(date_s)).setdefault(mid, {})
+            free = [s for s in slots if s not in occ]
+            conflicts = [s for s in slots if s in occ]     # answered from memory, no DB round trip
+            booked = []
+            if free:
+                ops = [{"op": "book", "machine_id": mid, "date": date_s, "slot": s, "display_name": name, "wwid": wwid}
+                       for s in free]
+                self._version += 1
+                res = await self.db(self.repo.apply_ops, ops, False)     # one transaction for all slots
+                self._version += 1
+                booked = [int(r["slot"]) for r in res if r["result"] == "won"]
+                g = await self._date(date_s)                 # a resync may have swapped the date
+                occ = g.setdefault(mid, {})
+                for s in booked:
+                    occ[s] = _row(mid, date_s, s, {"display_name": name, "wwid": wwid})
+                self.publish([_delta("book", mid, date_s, s, name, wwid) for s in booked])
+                lost = [s for s in free if s not in booked]
+                if lost:                                     # someone wrote behind our back
+                    conflicts += lost
+                    await self._reread(mid, date_s)
+        return {"booked": booked, "conflicts": sorted(conflicts)}
+
+    async def _reread(self, mid: int, date_s: str):
+        """Replace one (machine, date) of the grid from the database and push the difference;
+        the caller holds its _lock."""
+        fresh = await self.db(self.repo.bookings_of, mid, date_s)
+        g = await self._date(date_s)
+        new = {int(r["slot"]): _row(mid, date_s, int(r["slot"]), r) for r in fresh}
+        self.publish(_diff(date_s, {mid: g.get(mid, {})}, {mid: new}))
+        g[mid] = new
+
+    async def h_cancel(self, q, body):
+        mid, date_s = int(body["machine_id"]), str(body["date"])
+        slots = sorted({int(s) for s in body.get("slots", [])})
+        async with self._lock(mid, date_s):
+            self._version += 1
+            n = await self.db(self.repo.delete_bookings, mid, date_s, slots)
+            self._version += 1
+            occ = (await self._date(date_s)).setdefault(mid, {})
+            gone = [s for s in slots if occ.pop(s, None) is not None]
+            if n:
+                self.publish([_delta("cancel", mid, date_s, s) for s in (gone or slots)])
+        return {"cancelled": n}
+
+    async def h_apply(self, q, body):
+        ops = body.get("ops") or []
+        pairs = sorted({(int(o["machine_id"]), str(o["date"])) for o in ops})
+        async with AsyncExitStack() as locks:
+            for mid, date_s in pairs:                        # sorted: two batches never wait on each other
+                await locks.enter_async_context(self._lock(mid, date_s))
+            for date_s in sorted({d for _, d in pairs}):
+                await self._date(date_s)                     # loaded before the write, so it gets patched
+            self._version += 1
+            res = await self.db(self.repo.apply_ops, ops, bool(body.get("atomic")))
+            self._version += 1
+            deltas, stale = [], set()
+            for r in res:
+                mid, date_s, slot = int(r["machine_id"]), str(r["date"]), int(r["slot"])
+                if r["result"] == "lost":
+                    stale.add((mid, date_s))
+                if r["result"] != "won":
+                    continue
+                occ = (await self._date(date_s)).setdefault(mid, {})
+                if r["op"] == "book":
+                    row = _row(mid, date_s, slot, r)
+                    if occ.get(slot) != row:
+                        occ[slot] = row
+                        deltas.append(_delta("book", mid, date_s, slot, row["display_name"], row["wwid"]))
+                elif occ.pop(slot, None) is not None:
+                    deltas.append(_delta("cancel", mid, date_s, slot))
+            self.publish(deltas)
+            for mid, date_s in sorted(stale):                # lost to a write the grid did not see
+                await self._reread(mid, date_s)
+        return res
+
+    # HTTP/1.1 (keep-alive, Content-Length bodies)
+    async def h_connections(self, q, body):
+        rows = body.get("rows") or []
+        return {"recorded": await self.db(self.repo.record_connections, rows)}
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        u = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        payload = json.loads(body.decode("utf-8")) if body else {}
+        if method == "GET" and u.path.startswith("/machines/"):
+            return await self.h_machines(q, payload, unquote(u.path[len("/machines/"):]))
+        h = self.routes.get((method, u.path))
+        if h is None:
+            if any(p == u.path for _, p in self.routes):
+                raise HttpError(405, f"{method} not allowed on {u.path}")
+            raise HttpError(404, f"no route {u.path}")
+        return await h(q, payload)
+
+    def _authorized(self, path: str, headers: Dict[str, str]) -> bool:
+        if not self.token or path == "/health":
+            return True
+        scheme, _, cred = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(cred.strip().encode(), self.token.encode())
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, _ = line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                n = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(n) if n else b""
+                self.requests += 1
+                path = target.split("?", 1)[0]
+                if method == "GET" and path == "/events" and self._authorized(path, headers):
+                    await self.stream_events(writer)
+                    break
+                t0 = time.perf_counter()
+                try:
+                    if not self._authorized(path, headers):
+                        raise HttpError(401, "missing or wrong service token")
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except DB_ERRORS as e:
+                    status, payload = 503, {"error": f"database unavailable: {e}"}
+                except (KeyError, ValueError, TypeError) as e:
+                    status, payload = 400, {"error": f"bad request: {e}"}
+                except Exception as e:
+                    log.exception("%s %s failed", method, target)
+                    status, payload = 500, {"error": str(e)}
+                data = json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n"
+                             b"Content-Length: %d\r\n\r\n" % (status, self.REASONS.get(status, "").encode(), len(data)))
+                writer.write(data)
+                await writer.drain()
+                log.debug("%s %s -> %d (%.1f ms)", method, target, status, (time.perf_counter() - t0) * 1000.0)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        await self.resync()
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info("booking service on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        tasks = [asyncio.ensure_future(self.resync_loop())]
+        if self.recurring_s > 0:
+            tasks.append(asyncio.ensure_future(self.recurring_loop()))
+        if self.sweeper is not None:
+            tasks.append(asyncio.ensure_future(self.sweeper_loop()))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for t in tasks:
+                t.cancel()
+            self._db.shutdown(wait=False)
+
+def main(argv=None):
+    scfg = getattr(DB_Config_sample, "SERVICE", {})
+    default_port = urlsplit(scfg.get("url", "http://127.0.0.1:8765")).port or 8765
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking booking service")
+    ap.add_argument("--host", default=scfg.get("host", "127.0.0.1"),
+                    help="listen address (default 127.0.0.1; 0.0.0.0 to serve other hosts, with a token)")
+    ap.add_argument("--token", default=scfg.get("token", ""), help="shared token clients must send (default: SERVICE token)")
+    ap.add_argument("--port", type=int, default=default_port)
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("--seed", type=int, default=0, help="SQLite only: create N demo machines")
+    ap.add_argument("--pool", type=int, default=int(scfg.get("pool_size", 4)))
+    ap.add_argument("--resync", type=float, default=float(scfg.get("resync_s", 60)))
+    rcfg = getattr(DB_Config_sample, "RECURRING", {})
+    ap.add_argument("--recurring", type=float, metavar="S",
+                    default=float(rcfg.get("interval_s", 3600)) if rcfg.get("enabled") else 0.0,
+                    help="expand recurring rules every S seconds (0 = off)")
+    wcfg = getattr(DB_Config_sample, "SWEEPER", {})
+    ap.add_argument("--sweep", type=int, metavar="MIN",
+                    default=int(wcfg.get("grace_min", 15)) if wcfg.get("enabled") else -1,
+                    help="release bookings not connected to within MIN minutes of slot start (-1 = off)")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not a.token and a.host not in ("127.0.0.1", "localhost", "::1"):
+        log.warning("listening on %s without a token: anyone who can reach it can book and read passwords", a.host)
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+    if a.seed and isinstance(repo, SQLiteRepo):
+        repo.seed_machines([f"{'ABCDEFGH'[i % 8]}_{i // 8 + 1:02d}" for i in range(a.seed)])
+    try:
+        asyncio.run(BookingService(repo, a.pool, a.resync, a.recurring,
+                                   Sweeper(repo, a.sweep) if a.sweep >= 0 else None,
+                                   float(wcfg.get("interval_s", 60)), a.token).serve(a.host, a.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
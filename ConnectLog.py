@@ -0,0 +1,142 @@
+# ConnectLog.py — buffered, asynchronous connect-event logging, Python 3.8
+import logging, threading, uuid
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from Metrics import QUERY_STATS
+from Offline import Journal
+from Repo import Repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.connectlog")
+
+def default_spool_path() -> Path:
+    return Path.home() / ".RemoteVNCBooking" / "connect_spool.jsonl"
+
+class ConnectLog:
+    """record() only appends to an in-memory buffer, so the Connect click never waits on
+    the database. A background thread writes the buffer with Repo.record_connections()
+    in multi-row batches every `flush_s` seconds, or as soon as `batch` rows wait.
+    close() flushes what is left; rows that still cannot be written are spooled to a
+    Journal and resent by the next session. Only outages are retried: rows the database
+    refuses for any other reason are moved to a "rejected" Journal beside the spool."""
+
+    def __init__(self, repo: Repo, flush_s: float = 5.0, batch: int = 200, max_buffer: int = 10000,
+                 spool: Optional[str] = None):
+        self.repo = repo
+        self.flush_s = flush_s
+        self.batch = max(1, batch)
+        self.max_buffer = max_buffer
+        self.journal = Journal(spool or str(default_spool_path()))
+        self.rejects = Journal(str(self.journal.path.with_name(self.journal.path.stem + ".rejected.jsonl")))
+        self._buf: Deque[dict] = deque(self.journal.read())     # spooled rows keep their "id"
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name="connect-log", daemon=True)
+        if self._buf:
+            log.info("resending %d spooled connect event(s)", len(self._buf))
+
+    def start(self):
+        self._thread.start()
+
+    def record(self, row: dict):
+        with self._lock:
+            if len(self._buf) >= self.max_buffer:
+                self._buf.popleft(); self.dropped += 1
+            self._buf.append(row)
+            n = len(self._buf)
+        if n >= self.batch:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            if not self._stop:
+                self.flush()
+
+    def flush(self) -> bool:
+        """Write everything buffered; False (rows kept, in order) when the database refuses."""
+        with self._flushing:
+            while True:
+                with self._lock:
+                    rows = [self._buf.popleft() for _ in range(min(self.batch, len(self._buf)))]
+                if not rows:
+                    self._gauges()
+                    return True
+                try:
+                    self.repo.record_connections(rows)
+                except DB_ERRORS as e:
+                    if self.repo.is_outage(e):
+                        return self._requeue(rows, e)
+                    log.warning("connect events refused (%s); writing %d row(s) one by one", e, len(rows))
+                    if not self._write_singly(rows):
+                        return False
+                    continue
+                self._done(rows)
+
+    def _write_singly(self, rows: List[dict]) -> bool:
+        """Isolate the rows the database refuses; False (rest re-queued) on an outage."""
+        bad = []
+        for i, r in enumerate(rows):
+            try:
+                self.repo.record_connections([r])
+            except DB_ERRORS as e:
+                if self.repo.is_outage(e):
+                    self._reject(bad)
+                    return self._requeue(rows[i:], e)
+                log.warning("connect event rejected: %s: %r", e, r)
+                bad.append(r)
+                continue
+            self._done([r])
+        self._reject(bad)
+        return True
+
+    def _requeue(self, rows: List[dict], e: BaseException) -> bool:
+        with self._lock:
+            self._buf.extendleft(reversed(rows))
+        log.debug("connect events not written yet (%d pending): %s", len(self._buf), e)
+        self._gauges()
+        return False
+
+    def _done(self, rows: List[dict]):
+        self.written += len(rows)
+        spooled = [r["id"] for r in rows if "id" in r]
+        if spooled:
+            self.journal.drop(spooled)
+
+    def _reject(self, rows: List[dict]):
+        if not rows:
+            return
+        self.rejects.append(rows)
+        self.rejected += len(rows)
+        spooled = [r["id"] for r in rows if "id" in r]
+        if spooled:
+            self.journal.drop(spooled)
+        log.warning("%d connect event(s) moved to %s", len(rows), self.rejects.path)
+
+    def close(self, timeout: float = 5.0):
+        """Clean shutdown: stop the thread, flush, spool whatever the database did not take."""
+        self._stop = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        if self.flush():
+            return
+        with self._lock:
+            rows: List[dict] = list(self._buf)
+            self._buf.clear()
+        fresh = [dict(r, id=uuid.uuid4().hex) for r in rows if "id" not in r]   # the rest is spooled already
+        self.journal.append(fresh)
+        log.warning("database unavailable at exit: %d connect event(s) spooled to %s", len(rows), self.journal.path)
+
+    def _gauges(self):
+        QUERY_STATS.set_gauge("connect_log_pending", len(self._buf))
+        QUERY_STATS.set_gauge("connect_log_written", self.written)
+        QUERY_STATS.set_gauge("connect_log_dropped", self.dropped)
+        QUERY_STATS.set_gauge("connect_log_rejected", self.rejected)
@@ -0,0 +1,259 @@
+# ContentionTest.py — booking race / double-booking stress test, Python 3.8
+#
+#   python ContentionTest.py --backend sqlite --workers 32 --duration 20
+#   python ContentionTest.py --backend mysql --machines 2 --slots 4 --workers 64
+#   python ContentionTest.py --backend http --url http://127.0.0.1:8765 --batch 3
+#
+# Workers hammer a deliberately small set of (machine, date, slot) keys. Each worker
+# only cancels slots it believes it holds, so the run is correct iff
+#   * the table never holds a key twice,
+#   * no two workers' ownership intervals of a key overlap (an interval runs from the
+#     insert returning True to the cancel being issued: the true hold contains it),
+#   * a cancel never finds its slot already gone,
+#   * at the end every surviving row is owned by exactly the worker that believes it.
+# Check-then-act mode (default) also reproduces update_action_buttons: read the
+# snapshot, book only what looked free, and count how often that view was stale.
+import argparse, logging, os, random, tempfile, threading, time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import DB_Config_sample
+from Metrics import Histogram
+from Repo import Repo, SQLiteRepo, HttpRepo, make_repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.contention")
+
+TZ = timezone(timedelta(hours=8))
+Key = Tuple[int, str, int]
+
+def _err_code(e: BaseException) -> str:
+    code = e.args[0] if e.args and isinstance(e.args[0], int) else None
+    return f"{type(e).__name__}({code})" if code else f"{type(e).__name__}: {str(e)[:40]}"
+
+class Worker:
+    def __init__(self, i: int, repo: Repo, keys: List[Key], a):
+        self.i = i
+        self.repo = repo
+        self.wwid = f"STRESS{i:03d}"
+        self.keys = keys
+        self.a = a
+        self.rnd = random.Random(a.rng + i)
+        self.held: Dict[Key, float] = {}
+        self.intervals: List[Tuple[Key, float, float, int]] = []
+        self.won = self.lost = self.cancelled = self.stolen = self.stale = 0
+        self.unsure = set()                         # keys whose last write failed mid-flight
+        self.errors: Counter = Counter()
+        self.hot: Counter = Counter()               # (machine, date) -> errors / slow writes
+        self.latency = Histogram()
+
+    def _book(self, keys: List[Key]):
+        mid, d = keys[0][0], keys[0][1]
+        if not self.a.blind:                        # update_action_buttons: decide from a snapshot
+            taken = {int(r["slot"]) for r in self.repo.bookings_of(machine_id=mid, date_s=d)}
+            keys = [k for k in keys if k[2] not in taken]
+            if not keys:
+                return
+        t0 = time.perf_counter()
+        if self.a.batch > 1:
+            res = self.repo.apply_ops([{"op": "book", "machine_id": k[0], "date": k[1], "slot": k[2],
+                                        "display_name": self.wwid, "wwid": self.wwid, "expect_wwid": ""}
+                                       for k in keys])
+            ok = [r["result"] == "won" for r in res]
+        else:
+            ok = [self.repo.insert_booking(k[0], k[1], k[2], self.wwid, self.wwid) for k in keys]
+        t1 = time.perf_counter()
+        self._note(mid, d, t1 - t0)
+        for k, won in zip(keys, ok):
+            if won:
+                self.won += 1; self.held[k] = t1
+            else:
+                self.lost += 1
+                if not self.a.blind: self.stale += 1    # looked free a moment ago
+
+    def _cancel(self, keys: List[Key]):
+        mid, d = keys[0][0], keys[0][1]
+        t0 = time.perf_counter()
+        if self.a.batch > 1:
+            res = self.repo.apply_ops([{"op": "cancel", "machine_id": k[0], "date": k[1], "slot": k[2],
+                                        "display_name": self.wwid, "wwid": self.wwid, "expect_wwid": self.wwid}
+                                       for k in keys])
+            n = sum(1 for r in res if r["result"] == "won")
+        else:
+            n = self.repo.delete_bookings(mid, d, [k[2] for k in keys])
+        self._note(mid, d, time.perf_counter() - t0)
+        for k in keys:
+            self.intervals.append((k, self.held.pop(k), t0, self.i))
+        self.cancelled += n
+        self.stolen += len(keys) - n                # someone else removed a row we held
+
+    def _note(self, mid: int, d: str, dt: float):
+        ms = dt * 1000.0
+        self.latency.add(ms)
+        if ms >= self.a.slow_ms:
+            self.hot[(mid, d)] += 1
+
+    def run(self, t_end: float):
+        while time.monotonic() < t_end:
+            mid, d, _ = self.rnd.choice(self.keys)
+            pool = [k for k in self.keys if k[0] == mid and k[1] == d]
+            mine = [k for k in pool if k in self.held]
+            try:
+                if mine and self.rnd.random() < 0.5:
+                    self._cancel(self.rnd.sample(mine, min(len(mine), self.a.batch)))
+                else:
+                    free = [k for k in pool if k not in self.held]
+                    if free:
+                        self._book(sorted(self.rnd.sample(free, min(len(free), self.a.batch))))
+            except DB_ERRORS as e:
+                self.errors[_err_code(e)] += 1
+                self.hot[(mid, d)] += 1
+                # the write may or may not have landed; forget beliefs on this pair and let verify() judge
+                for k in [k for k in self.held if k[0] == mid and k[1] == d]:
+                    self.intervals.append((k, self.held.pop(k), time.perf_counter(), self.i))
+                self.unsure.update(pool)
+            if self.a.think_ms:
+                time.sleep(self.rnd.uniform(0, self.a.think_ms) / 1000.0)
+
+def _stress_rows(repo: Repo, keys: List[Key]) -> List[dict]:
+    dates = sorted({k[1] for k in keys}); mids = sorted({k[0] for k in keys})
+    hot = set(keys)
+    return [r for r in repo.bookings_between(dates[0], dates[-1], mids)
+            if (int(r["machine_id"]), str(r["date"]), int(r["slot"])) in hot]
+
+def verify(repo: Repo, workers: List[Worker], keys: List[Key]) -> List[str]:
+    problems = []
+    unsure = set().union(*(w.unsure for w in workers))
+    by_key: Dict[Key, List[Tuple[float, float, int]]] = defaultdict(list)
+    for w in workers:
+        for k, t0, t1, i in w.intervals:
+            by_key[k].append((t0, t1, i))
+    for k, iv in by_key.items():
+        iv.sort()
+        end, owner = iv[0][1], iv[0][2]
+        for b0, b1, bi in iv[1:]:
+            if b0 < end and bi != owner:
+                problems.append(f"{k}: held by worker {owner} until {end:.6f} and by worker {bi} from {b0:.6f}")
+            if b1 > end:
+                end, owner = b1, bi
+    for w in workers:
+        if w.stolen:
+            problems.append(f"worker {w.i}: {w.stolen} slot(s) it held were removed by someone else")
+
+    rows = _stress_rows(repo, keys)
+    seen: Counter = Counter((int(r["machine_id"]), str(r["date"]), int(r["slot"])) for r in rows)
+    problems += [f"{k}: {n} rows" for k, n in seen.items() if n > 1]
+    holder = {(int(r["machine_id"]), str(r["date"]), int(r["slot"])): r.get("wwid") for r in rows}
+    believed = {k: w.wwid for w in workers for k in w.held}
+    for k, wwid in believed.items():
+        if holder.get(k) != wwid and k not in unsure:
+            problems.append(f"{k}: worker {wwid} believes it holds it, table says {holder.get(k)!r}")
+    for k, wwid in holder.items():
+        if believed.get(k) != wwid and k not in unsure:
+            problems.append(f"{k}: row of {wwid} that no worker believes it holds")
+    return problems
+
+def build_repo(a) -> Repo:
+    if a.backend == "sqlite":
+        return SQLiteRepo(a.sqlite)
+    if a.backend == "http":
+        return HttpRepo(a.url)
+    return make_repo(a.backend)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking booking contention stress test")
+    ap.add_argument("--backend", choices=("mysql", "sqlite", "http"),
+                    default=getattr(DB_Config_sample, "BACKEND", "mysql"))
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (default: a fresh temp file)")
+    ap.add_argument("--url", help="booking service for --backend http")
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=15.0)
+    ap.add_argument("--machines", type=int, default=3, help="hot machines (the first N by sn)")
+    ap.add_argument("--dates", type=int, default=2, help="hot dates starting --day days from today")
+    ap.add_argument("--day", type=int, default=10)
+    ap.add_argument("--slots", type=int, default=6, help="hot slots per machine/date")
+    ap.add_argument("--batch", type=int, default=1, help=">1: book/cancel that many slots per apply_ops transaction")
+    ap.add_argument("--blind", action="store_true", help="insert without the check-then-act snapshot read")
+    ap.add_argument("--think-ms", type=float, default=0.0)
+    ap.add_argument("--slow-ms", type=float, default=100.0, help="writes slower than this count as lock-wait hotspots")
+    ap.add_argument("--rng", type=int, default=1)
+    ap.add_argument("-v", "--verbose", action="store_true")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    tmp = None
+    if a.backend == "sqlite" and not a.sqlite:
+        fd, tmp = tempfile.mkstemp(prefix="rvb_race_", suffix=".db"); os.close(fd)
+        a.sqlite = tmp
+    admin = build_repo(a)
+    if isinstance(admin, SQLiteRepo):
+        admin.seed_machines([f"{'ABCDEFGH'[i % 8]}_{i // 8 + 1:02d}" for i in range(max(a.machines, 1))])
+    machines = admin.list_machines()[:a.machines]
+    if not machines:
+        print("no machines"); return 2
+    d0 = datetime.now(TZ).date() + timedelta(days=a.day)
+    dates = [(d0 + timedelta(days=i)).isoformat() for i in range(a.dates)]
+    slots = list(range(24 - a.slots, 24))       # late-evening slots: least likely to be real bookings
+    keys = [(int(m["id"]), d, s) for m in machines for d in dates for s in slots]
+    if any(not str(r.get("wwid") or "").startswith("STRESS") for r in _stress_rows(admin, keys)):
+        print("hot keys already hold real bookings; pick another --day"); return 2
+
+    workers = [Worker(i, build_repo(a), keys, a) for i in range(a.workers)]
+    lock0 = admin.lock_status()
+    print(f"{a.workers} workers on {a.backend}: {len(machines)} machines x {len(dates)} dates x {len(slots)} slots "
+          f"= {len(keys)} keys, batch {a.batch}, {'blind' if a.blind else 'check-then-act'}, {a.duration:g} s ...")
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=w.run, args=(t0 + a.duration,), name=f"race-{w.i}", daemon=True)
+               for w in workers]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.monotonic() - t0
+    lock1 = admin.lock_status()
+
+    problems = verify(admin, workers, keys)
+    won = sum(w.won for w in workers); lost = sum(w.lost for w in workers)
+    lat = Histogram()
+    for w in workers:
+        lat.counts = [x + y for x, y in zip(lat.counts, w.latency.counts)]
+        lat.n += w.latency.n; lat.total += w.latency.total; lat.hi = max(lat.hi, w.latency.hi)
+    print(f"committed bookings {won} ({won / wall:.1f}/s), lost races {lost}, cancelled {sum(w.cancelled for w in workers)}")
+    if not a.blind:
+        print(f"stale check-then-act decisions {sum(w.stale for w in workers)} "
+              f"({100.0 * sum(w.stale for w in workers) / max(1, won + lost):.1f} % of attempts)")
+    print(f"write latency p50={lat.percentile(50):.1f} p95={lat.percentile(95):.1f} "
+          f"p99={lat.percentile(99):.1f} max={lat.hi:.1f} ms")
+    errors = sum((w.errors for w in workers), Counter())
+    if errors:
+        print("errors: " + ", ".join(f"{k} x{v}" for k, v in errors.most_common()))
+    hot = sum((w.hot for w in workers), Counter())
+    for (mid, d), n in hot.most_common(5):
+        print(f"  hotspot machine {mid} {d}: {n} errors / writes over {a.slow_ms:g} ms")
+    if lock1:
+        waits = lock1.get("Innodb_row_lock_waits", 0) - lock0.get("Innodb_row_lock_waits", 0)
+        ms = lock1.get("Innodb_row_lock_time", 0) - lock0.get("Innodb_row_lock_time", 0)
+        print(f"InnoDB lock waits {waits} ({ms} ms), deadlocks "
+              f"{lock1.get('Innodb_deadlocks', 0) - lock0.get('Innodb_deadlocks', 0)}")
+
+    by: Dict[Tuple[int, str], List[int]] = defaultdict(list)     # release what is left
+    for r in _stress_rows(admin, keys):
+        by[(int(r["machine_id"]), str(r["date"]))].append(int(r["slot"]))
+    for (mid, d), ss in by.items():
+        try:
+            admin.delete_bookings(mid, d, ss)
+        except DB_ERRORS as e:
+            log.warning("cleanup %s %s failed: %s", mid, d, e)
+    if tmp:
+        for p in (tmp, tmp + "-wal", tmp + "-shm"):
+            if os.path.exists(p): os.remove(p)
+
+    if problems:
+        print(f"FAIL: {len(problems)} consistency violation(s)")
+        for p in problems[:20]:
+            print("  " + p)
+        return 1
+    print("OK: no slot was ever held twice")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,3 +6,103 @@ DB = {
     "database": "RemoteVNCBooking",
     "charset": "utf8mb4",
 }
+
+# Repository backend: "mysql" (uses DB above), "sqlite" (local dev / tests / benchmarks)
+# or "http" (talk to BookingService.py at SERVICE["url"]; no DB credentials on the client)
+BACKEND = "mysql"
+
+SQLITE = {
+    "path": "RemoteVNCBooking.sqlite3",   # ":memory:" for a throwaway in-process database
+    "timeout": 5.0,
+}
+
+# Booking service (BookingService.py): clients with BACKEND = "http" connect to `url`;
+# the service itself uses the backend above with a pool of `pool_size` connections.
+# It listens on `host` (loopback unless changed); set a shared `token` on the service and
+# every client before opening it to other hosts.
+SERVICE = {
+    "url": "http://127.0.0.1:8765",
+    "host": "127.0.0.1",
+    "token": "",
+    "timeout": 5.0,
+    "pool_size": 4,
+    "resync_s": 60,
+    "push": True,             # subscribe to GET /events; polling drops to fallback_poll_s while connected
+    "fallback_poll_s": 60,
+}
+
+# Query instrumentation: summary to the log every dump_interval_s (0 = on exit / Ctrl+Shift+M only),
+# optionally appended to a CSV file
+METRICS = {
+    "dump_interval_s": 0,
+    "csv": "",
+    "log_ticks": False,   # log "this _tick issued N queries taking X ms" for every refresh
+}
+
+# GUI event-loop stall monitor: heartbeat every interval_ms, log stalls longer than threshold_ms with the stack
+WATCHDOG = {
+    "enabled": True,
+    "interval_ms": 20,
+    "threshold_ms": 250,
+}
+
+# Chrome trace-event timeline of refresh cycles (empty = off; env RVB_TRACE=<file> also enables it).
+# Written on exit and on Ctrl+Shift+T; open in chrome://tracing or ui.perfetto.dev
+TRACE = {
+    "path": "",
+}
+
+# MySQL socket timeouts (seconds), merged into DB when connecting
+DB_TIMEOUTS = {
+    "connect_timeout": 3,
+    "read_timeout": 10,
+    "write_timeout": 10,
+}
+
+# Circuit breaker: after `failures` consecutive outages fail fast, probe again after
+# backoff_s, doubling up to max_backoff_s until the database answers
+BREAKER = {
+    "failures": 3,
+    "backoff_s": 2.0,
+    "max_backoff_s": 60.0,
+}
+
+# Offline mode: serve the last snapshot while the database is down and queue bookings/cancellations
+# in a local journal (default ~/.RemoteVNCBooking/offline_journal.jsonl), replayed on reconnect
+OFFLINE = {
+    "enabled": True,
+    "journal": "",
+}
+
+# Machine list: the client reads a cheap fingerprint (count + MAX(data_update_at)) every check_s
+# seconds and re-reads the list / rebuilds the machine grid only when it changed (Inventory.py)
+INVENTORY = {
+    "check_s": 60,
+}
+
+# Recurring bookings (Recurring.py): rules are expanded into `bookings` over the booking window,
+# one transaction per day. BookingService.py runs the expansion every interval_s when enabled
+RECURRING = {
+    "enabled": False,
+    "interval_s": 3600,
+}
+
+# No-show sweeper (Sweeper.py): a booked hour is released when its owner has not launched a
+# connection to the machine within grace_min minutes of the slot start. Releases are audited in
+# booking_releases. BookingService.py checks every interval_s when enabled
+SWEEPER = {
+    "enabled": False,
+    "grace_min": 15,
+    "interval_s": 60,
+}
+
+# Connect events (Connect button -> `connections` table) are buffered in memory and written by a
+# background thread every flush_s seconds or once `batch` rows wait; what the database cannot
+# take at exit is spooled (default ~/.RemoteVNCBooking/connect_spool.jsonl) and resent next start.
+# Only outages are retried; rows the database refuses go to connect_spool.rejected.jsonl beside it
+CONNECT_LOG = {
+    "flush_s": 5.0,
+    "batch": 200,
+    "max_buffer": 10000,
+    "spool": "",
+}
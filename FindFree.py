@@ -0,0 +1,135 @@
+# FindFree.py — "find a free machine" dialog, PySide6 6.5.3 / Python 3.8
+from typing import Callable, List, Optional
+
+from PySide6.QtCore import QDate, Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView, QCheckBox, QComboBox, QDateEdit, QDialog, QHBoxLayout, QHeaderView, QLabel,
+    QLineEdit, QPushButton, QSpinBox, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+from Occupancy import DayOccupancy, find_free, fmt_hours, hours_mask, hours_of, section_of
+from Repo import DB_ERRORS
+
+class FindFreeDialog(QDialog):
+    """Filters are answered from a DayOccupancy bitmap; only a date change (or Refresh)
+    reads the database, with one date-wide bookings_of()."""
+    book_requested = Signal(str, QDate, list)          # sn, date, hours
+
+    def __init__(self, repo, machines: Callable[[], List[dict]], today: Callable[[], QDate],
+                 now_hour: Callable[[], int], parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("Find a free machine")
+        self.repo = repo
+        self._machines = machines
+        self._today = today
+        self._now_hour = now_hour
+        self.occ: Optional[DayOccupancy] = None
+        self._rows: List[tuple] = []
+
+        self.section = QComboBox()
+        self.pattern = QLineEdit(); self.pattern.setPlaceholderText("sn, e.g. A_0* or 12")
+        self.date = QDateEdit(); self.date.setCalendarPopup(True)
+        self.h_from = QSpinBox(); self.h_from.setRange(0, 23)
+        self.h_to = QSpinBox(); self.h_to.setRange(0, 23)
+        self.partial = QCheckBox("Show partly free")
+        self.status = QLabel()
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Machine", "Section", "Free hours"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.btn_refresh = QPushButton("Refresh")
+        self.btn_book = QPushButton("Book")
+        self.btn_book.setEnabled(False)
+
+        top = QHBoxLayout()
+        for w in (QLabel("Section"), self.section, self.pattern, QLabel("Date"), self.date,
+                  QLabel("From"), self.h_from, QLabel("to"), self.h_to, self.partial):
+            top.addWidget(w)
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.status, 1); bottom.addWidget(self.btn_refresh); bottom.addWidget(self.btn_book)
+        v = QVBoxLayout(self)
+        v.addLayout(top); v.addWidget(self.table, 1); v.addLayout(bottom)
+        self.resize(760, 480)
+
+        self.date.dateChanged.connect(self.reload)
+        self.btn_refresh.clicked.connect(self.reload)
+        for sig in (self.section.currentIndexChanged, self.pattern.textChanged, self.h_from.valueChanged,
+                    self.h_to.valueChanged, self.partial.toggled):
+            sig.connect(self.search)
+        self.table.itemSelectionChanged.connect(lambda: self.btn_book.setEnabled(bool(self._selected())))
+        self.table.cellDoubleClicked.connect(lambda *_: self.book())
+        self.btn_book.clicked.connect(self.book)
+
+    def open_for(self, date: QDate, section: Optional[str] = None):
+        today = self._today()
+        self.date.blockSignals(True)
+        self.date.setMinimumDate(today); self.date.setMaximumDate(today.addDays(14)); self.date.setDate(date)
+        self.date.blockSignals(False)
+        secs = sorted({section_of(m["sn"]) for m in self._machines()})
+        self.section.blockSignals(True)
+        self.section.clear(); self.section.addItem("All", None)
+        for s in secs:
+            self.section.addItem(s, s)
+        if section in secs:
+            self.section.setCurrentIndex(secs.index(section) + 1)
+        self.section.blockSignals(False)
+        if date == today:
+            h = self._now_hour()
+            self.h_from.setValue(h); self.h_to.setValue(min(23, h + 1))
+        self.reload()
+        self.show(); self.raise_(); self.activateWindow()
+
+    def reload(self):
+        date_s = self.date.date().toString("yyyy-MM-dd")
+        try:
+            self.occ = DayOccupancy(date_s, self.repo.bookings_of(machine_id=None, date_s=date_s))
+        except DB_ERRORS as e:
+            self.occ = None
+            self.status.setText(f"Database unavailable: {e}")
+            self.table.setRowCount(0)
+            return
+        self.search()
+
+    def apply_deltas(self, deltas: list):
+        if self.occ is not None and self.isVisible():
+            self.occ.apply_deltas(deltas)
+            self.search()
+
+    def _want(self) -> int:
+        a, b = self.h_from.value(), self.h_to.value()
+        want = hours_mask(min(a, b), max(a, b))
+        if self.date.date() == self._today():
+            want &= ~hours_mask(0, self._now_hour() - 1)     # hours already over
+        return want
+
+    def search(self):
+        if self.occ is None:
+            return
+        want = self._want()
+        self._rows = find_free(self._machines(), self.occ, want, self.section.currentData(),
+                               self.pattern.text(), self.partial.isChecked()) if want else []
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(self._rows))
+        for i, (m, free) in enumerate(self._rows):
+            for c, text in enumerate((m["sn"], section_of(m["sn"]), fmt_hours(free) + ("" if free == want else " (partly)"))):
+                self.table.setItem(i, c, QTableWidgetItem(text))
+        self.table.setUpdatesEnabled(True)
+        full = sum(1 for _, f in self._rows if f == want)
+        self.status.setText(f"{full} free" + (f", {len(self._rows) - full} partly free" if len(self._rows) > full else "")
+                            + f" · {self.occ.date_s} {fmt_hours(want) or '—'}")
+        self.btn_book.setEnabled(bool(self._selected()))
+
+    def _selected(self):
+        rows = self.table.selectionModel().selectedRows() if self.table.selectionModel() else []
+        return self._rows[rows[0].row()] if rows and rows[0].row() < len(self._rows) else None
+
+    def book(self):
+        hit = self._selected()
+        if not hit:
+            return
+        m, free = hit
+        self.book_requested.emit(m["sn"], self.date.date(), hours_of(free))
+        self.reload()
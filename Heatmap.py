@@ -0,0 +1,137 @@
+# Heatmap.py — fleet occupancy heatmap for one day (sections x machines x 24 h), PySide6 6.5.3 / Python 3.8
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QDate, QRect, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QPainter, QPen
+from PySide6.QtWidgets import QDialog, QLabel, QScrollArea, QToolTip, QVBoxLayout, QWidget
+
+from Occupancy import DayOccupancy, hours_mask, section_of
+from Timeline import FREE, BOOKED, MINE, PAST, GRID, DAY
+
+NOW = QColor("#ffd700")
+
+class FleetHeatmap(QWidget):
+    """One painted widget; rows are section headers and machines, columns the 24 hours.
+    Fed with the DayOccupancy the Controller already builds for the machine LEDs."""
+    cell_activated = Signal(str, QDate, int)
+
+    CELL_W, ROW_H, LABEL_W, HEAD_H, SEC_H = 26, 20, 90, 22, 22
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.rows: List[Tuple[str, Optional[dict]]] = []      # ("A", None) section header / (sn, machine)
+        self.occ = DayOccupancy("")
+        self.date = QDate()
+        self.now_hour = -1
+        self.wwid = ""
+        self._y: List[int] = []
+        self._font = QFont(); self._font.setPointSize(9)
+        self._bold = QFont(self._font); self._bold.setBold(True)
+
+    def set_machines(self, machines: List[dict]):
+        groups: Dict[str, List[dict]] = {}
+        for m in machines:
+            groups.setdefault(section_of(m["sn"]), []).append(m)
+        self.rows = []
+        for sec in sorted(groups):
+            self.rows.append((sec, None))
+            self.rows += [(m["sn"], m) for m in sorted(groups[sec], key=lambda m: m["sn"])]
+        y, self._y = self.HEAD_H, []
+        for _, m in self.rows:
+            self._y.append(y)
+            y += self.ROW_H if m else self.SEC_H
+        self.setFixedSize(self.LABEL_W + 24 * self.CELL_W + 1, y + 1)
+        self.update()
+
+    def set_day(self, occ: DayOccupancy, date: QDate, now_hour: int, wwid: str):
+        self.occ, self.date, self.now_hour, self.wwid = occ, date, now_hour, wwid
+        self.update()
+
+    def _row_at(self, y: int) -> int:
+        lo, hi = 0, len(self._y)
+        while lo < hi:                                  # rows are sorted by y
+            mid = (lo + hi) // 2
+            if self._y[mid] <= y: lo = mid + 1
+            else: hi = mid
+        return lo - 1
+
+    def paintEvent(self, e):
+        p = QPainter(self)
+        clip = e.rect()
+        p.fillRect(clip, GRID)
+        cw = self.CELL_W
+        past = hours_mask(0, self.now_hour - 1)
+        p.setFont(self._font); p.setPen(DAY)
+        for h in range(24):
+            p.drawText(QRect(self.LABEL_W + h * cw, 0, cw, self.HEAD_H), Qt.AlignCenter, str(h))
+        first = max(0, self._row_at(clip.top()))
+        for i in range(first, len(self.rows)):
+            y = self._y[i]
+            if y > clip.bottom():
+                break
+            name, m = self.rows[i]
+            if m is None:
+                p.setFont(self._bold); p.setPen(DAY)
+                p.drawText(QRect(4, y, self.LABEL_W + 24 * cw, self.SEC_H), Qt.AlignVCenter | Qt.AlignLeft, f"Section {name}")
+                p.setFont(self._font)
+                continue
+            mid = int(m["id"])
+            busy = self.occ.busy(mid)
+            p.drawText(QRect(12, y, self.LABEL_W - 14, self.ROW_H), Qt.AlignVCenter | Qt.AlignLeft, name)
+            for h in range(24):
+                bit = 1 << h
+                if busy & bit:
+                    color = MINE if self.occ.who.get((mid, h), ("", ""))[1] == self.wwid else BOOKED
+                    if past & bit:
+                        color = color.lighter(150)
+                elif past & bit:
+                    color = PAST
+                else:
+                    color = FREE
+                p.fillRect(self.LABEL_W + h * cw + 1, y + 1, cw - 2, self.ROW_H - 2, color)
+        if 0 <= self.now_hour < 24:
+            p.setPen(QPen(NOW, 2))
+            p.drawRect(self.LABEL_W + self.now_hour * cw, self.HEAD_H - 2, cw, self.height() - self.HEAD_H)
+
+    def _hit(self, pos) -> Optional[Tuple[dict, int]]:
+        i = self._row_at(pos.y())
+        h = (pos.x() - self.LABEL_W) // self.CELL_W
+        if i < 0 or pos.x() < self.LABEL_W or not 0 <= h < 24 or self.rows[i][1] is None:
+            return None
+        return self.rows[i][1], h
+
+    def mouseMoveEvent(self, e):
+        hit = self._hit(e.position().toPoint())
+        if hit is None:
+            QToolTip.hideText(); return
+        m, h = hit
+        who = self.occ.who.get((int(m["id"]), h))
+        text = f"{m['sn']} {h}:00–{h + 1}:00\n" + (f"{who[0]} ({who[1]})" if who else "free")
+        QToolTip.showText(e.globalPosition().toPoint(), text, self)
+
+    def mouseDoubleClickEvent(self, e):
+        hit = self._hit(e.position().toPoint())
+        if hit is not None:
+            self.cell_activated.emit(hit[0]["sn"], self.date, hit[1])
+
+class HeatmapDialog(QDialog):
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("Fleet today")
+        self.status = QLabel()
+        self.map = FleetHeatmap()
+        area = QScrollArea(); area.setWidget(self.map); area.setWidgetResizable(False)
+        v = QVBoxLayout(self)
+        v.addWidget(self.status); v.addWidget(area, 1)
+        self.resize(self.map.LABEL_W + 24 * self.map.CELL_W + 40, 560)
+        self.cell_activated = self.map.cell_activated
+
+    def update_day(self, machines: List[dict], occ: DayOccupancy, date: QDate, now_hour: int, wwid: str):
+        # same count is not same fleet: a sync can retire one machine and add another
+        if {(m["id"], m["sn"]) for m in machines} != {(m["id"], m["sn"]) for _, m in self.map.rows if m}:
+            self.map.set_machines(machines)
+        self.map.set_day(occ, date, now_hour, wwid)
+        busy_now = sum(1 for m in machines if occ.busy(int(m["id"])) >> now_hour & 1)
+        self.status.setText(f"{occ.date_s} · {busy_now}/{len(machines)} machines in use at {now_hour}:00 "
+                            f"· {len(occ.who)} booked hour(s)")
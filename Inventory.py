@@ -0,0 +1,138 @@
+# Inventory.py — sync the machines table from an authoritative inventory file, Python 3.8
+#
+#   python Inventory.py diff inventory.csv            # what a sync would change
+#   python Inventory.py sync inventory.csv [--batch 500]
+#   python Inventory.py sync inventory.json --force   # allow retiring more than --max-retire %
+#
+# The file (CSV, JSON array / {"machines": [...]}, or JSON Lines) lists every machine
+# with sn and any of owner, host_name, host_account_password, windows_account,
+# windows_password, note, state. It is diffed against the table and only the
+# difference is written: new sn are inserted, rows whose listed columns differ are
+# updated, and machines missing from the file are retired (state = 'retired', hidden
+# from the machine grid, bookings history kept) rather than deleted. data_update_at
+# moves only on rows that really changed, so clients can watch it to rebuild their
+# grid. Columns absent from the file are left alone; a retired machine listed again
+# comes back.
+import argparse, json, logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import DB_Config_sample
+from Repo import Repo, SQLiteRepo, make_repo, DB_ERRORS
+from Transfer import format_of, read_records
+
+log = logging.getLogger("RemoteVNCBooking.inventory")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+SECRETS = ("host_account_password", "windows_password")
+
+def read_inventory(path: str) -> List[dict]:
+    if Path(path).suffix.lower() == ".json":
+        text = Path(path).read_text(encoding="utf-8")
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = [json.loads(l) for l in text.splitlines() if l.strip()]      # JSON Lines named .json
+        recs = data.get("machines", []) if isinstance(data, dict) else data
+    else:
+        recs = list(read_records(path, format_of(path)))
+    seen = set()
+    for i, r in enumerate(recs, 1):
+        sn = (r.get("sn") or "").strip() if isinstance(r, dict) else ""
+        if not sn:
+            raise ValueError(f"{path}: record {i} has no sn")
+        if sn in seen:
+            raise ValueError(f"{path}: sn {sn} listed twice")
+        seen.add(sn)
+        r["sn"] = sn
+    return recs
+
+def _norm(v) -> str:
+    return "" if v is None else str(v)
+
+def synced_cols(cols: List[str]) -> List[str]:
+    """Columns a sync writes: those in the file, plus state (see diff_inventory)."""
+    return cols if "state" in cols else [*cols, "state"]
+
+def diff_inventory(current: List[dict], wanted: List[dict], cols: List[str], retired: str = Repo.RETIRED
+                   ) -> Tuple[List[dict], List[dict], List[str], Dict[str, List[str]]]:
+    """-> (inserts, updates, retire sn, changed columns per updated sn). Rows carry
+    synced_cols(cols); without a state column in the file a machine keeps its state,
+    except that a retired one listed again becomes active."""
+    cur = {m["sn"]: m for m in current}
+    listed = {r["sn"] for r in wanted}
+    inserts, updates, changed = [], [], {}
+    for r in wanted:
+        m = cur.get(r["sn"])
+        row = {"sn": r["sn"], **{c: r.get(c) for c in cols}}
+        if "state" not in cols:
+            row["state"] = None if m is None or m.get("state") == retired else m.get("state")
+        if m is None:
+            inserts.append(row)
+            continue
+        diff = [c for c in synced_cols(cols) if _norm(row[c]) != _norm(m.get(c))]
+        if diff:
+            updates.append(row)
+            changed[r["sn"]] = diff
+    retire = [sn for sn, m in cur.items() if sn not in listed and m.get("state") != retired]
+    return inserts, updates, retire, changed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking machine inventory sync")
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("diff", help="show what a sync would change")
+    p.add_argument("file")
+    p = sub.add_parser("sync", help="apply the inventory")
+    p.add_argument("file")
+    p.add_argument("--batch", type=int, default=500, help="rows per transaction")
+    p.add_argument("--max-retire", type=float, default=50.0, metavar="PCT",
+                   help="refuse to retire more than PCT %% of the active machines (default 50)")
+    p.add_argument("--force", action="store_true", help="ignore --max-retire")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+    try:
+        wanted = read_inventory(a.file)
+    except (OSError, ValueError) as e:
+        print(e); return 2
+    cols = [c for c in repo.INVENTORY_COLS if any(c in r for r in wanted)]
+    current = repo.inventory()
+    inserts, updates, retire, changed = diff_inventory(current, wanted, cols)
+
+    for r in inserts:
+        print(f"+ {r['sn']}")
+    by_sn = {m["sn"]: m for m in current}
+    for r in updates:
+        what = [f"{c}: changed" if c in SECRETS else f"{c}: {_norm(by_sn[r['sn']].get(c))!r} -> {_norm(r.get(c))!r}"
+                for c in changed[r["sn"]]]
+        print(f"~ {r['sn']}  " + ", ".join(what))
+    for sn in retire:
+        print(f"- {sn}  retired")
+    print(f"{len(inserts)} new, {len(updates)} changed, {len(retire)} to retire, "
+          f"{len(wanted) - len(inserts) - len(updates)} unchanged")
+    if a.cmd == "diff" or not (inserts or updates or retire):
+        return 0
+
+    active = sum(1 for m in current if m.get("state") != repo.RETIRED)
+    if retire and not a.force and len(retire) > active * a.max_retire / 100.0:
+        print(f"refusing to retire {len(retire)} of {active} active machines (--max-retire {a.max_retire:g}); "
+              f"check the file or use --force")
+        return 2
+    at = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        res = repo.sync_machines(inserts, updates, retire, synced_cols(cols), at, a.batch)
+    except DB_ERRORS as e:
+        print(f"sync stopped: {e}\nbatches before the error are committed; re-run to finish")
+        return 1
+    print(f"inserted {res['inserted']}, updated {res['updated']}, retired {res['retired']} at {res['at']}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,375 @@
+# LoadGen.py — simulate a lab full of RemoteVNCBooking clients, Python 3.8
+#
+#   python LoadGen.py --clients 50 --duration 60                     # backend from DB_Config_sample
+#   python LoadGen.py --backend sqlite --seed 30 --clients 20 --tick 1
+#   python LoadGen.py --backend http --url http://127.0.0.1:8765 --clients 200
+#
+# Every client is a thread issuing exactly the repository calls Controller makes:
+# the periodic _tick (slot colors, one date-wide LED read; details and buttons come
+# from the client's caches), the inventory fingerprint check, plus machine clicks,
+# date changes, slot toggles, bookings (apply_ops), cancellations and Connect
+# (connect_info) at --actions per minute. --legacy replays the older mix instead (one
+# LED query per machine, details and buttons re-read every tick, one insert per
+# slot) to measure against. Bookings use wwid LOADGEN_WWID and are cancelled at exit.
+import argparse, logging, os, random, tempfile, threading, time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+import DB_Config_sample
+from Metrics import Histogram, QUERY_STATS
+from Repo import Repo, SQLiteRepo, HttpRepo, make_repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.loadgen")
+
+TZ = timezone(timedelta(hours=8))
+LOADGEN_WWID = "LOADGEN"
+ACTIONS = {"click": 4, "date": 2, "toggle": 6, "book": 2, "cancel": 1, "connect": 1}
+
+class SimClient:
+    """Controller without widgets: same state, same queries, same order."""
+
+    def __init__(self, i: int, repo: Repo, tick_s: float, actions_per_min: float, seed: int,
+                 inventory_s: float = 60.0):
+        self.i = i
+        self.repo = repo
+        self.name = f"loadgen-{i:03d}"
+        self.tick_s = tick_s
+        self.inventory_s = inventory_s
+        self.action_s = 60.0 / actions_per_min if actions_per_min > 0 else 0.0
+        self.rnd = random.Random(seed + i)
+        self.machines: List[dict] = []
+        self.current: Optional[dict] = None
+        self.date_s = ""
+        self.selected: Set[int] = set()
+        self.rows: List[dict] = []                  # last slot-color snapshot
+        self.rows_key: Optional[tuple] = None       # (machine id, date) of self.rows, like _slot_cache
+        self.fingerprint: Optional[str] = None
+        self.details_cache: Dict[str, dict] = {}
+        self.held: Dict[tuple, None] = {}
+        self.errors: Counter = Counter()
+        self.conflicts = 0
+        self.booked = 0
+        self.cancelled = 0
+        self.tick_lag = Histogram()
+
+    # queries, in Controller order
+    def _today(self) -> str:
+        return datetime.now(TZ).date().isoformat()
+
+    def slot_colors(self):
+        self.rows_key = None
+        self.slot_rows()
+
+    def slot_rows(self) -> List[dict]:
+        key = (self.current["id"], self.date_s) if self.current else None
+        if key != self.rows_key:
+            self.rows = self.repo.bookings_of(machine_id=key[0], date_s=key[1]) if key else []
+            self.rows_key = key
+        return self.rows
+
+    def leds(self):
+        self.repo.bookings_of(machine_id=None, date_s=self._today())
+
+    def details(self):
+        # current user comes from the LED snapshot; the row is read once per fingerprint
+        if self.current and self.current["sn"] not in self.details_cache:
+            row = self.repo.get_machine_by_sn(self.current["sn"])
+            if row: self.details_cache[self.current["sn"]] = row
+
+    def buttons(self):
+        if self.current and self.selected:
+            self.slot_rows()
+
+    def check_inventory(self):
+        fp = self.repo.machines_fingerprint()
+        if fp != self.fingerprint:
+            self.details_cache.clear()
+            if self.fingerprint is not None:
+                self.machines = self.repo.list_machines()
+            self.fingerprint = fp
+            self.details()
+
+    # user actions
+    def start(self):
+        self.machines = self.repo.list_machines()
+        self.fingerprint = self.repo.machines_fingerprint()
+        self.date_s = self._today()
+        self.leds()
+
+    def tick(self):
+        self.slot_colors(); self.leds(); self.details(); self.buttons()
+
+    def _book_slots(self, mid: int, slots: List[int]):
+        ops = [{"op": "book", "machine_id": mid, "date": self.date_s, "slot": s,
+                "display_name": self.name, "wwid": LOADGEN_WWID} for s in slots]
+        for r in self.repo.apply_ops(ops):
+            if r["result"] == "won":
+                self.booked += 1; self.held[(mid, self.date_s, int(r["slot"]))] = None
+            else:
+                self.conflicts += 1
+
+    def click(self):
+        m = self.rnd.choice(self.machines)
+        self.selected.clear()
+        if self.current is not None and self.current["id"] == m["id"]:
+            self.current = None
+        else:
+            self.current = m
+            self.details()
+        self.slot_colors(); self.buttons()
+
+    def connect(self):
+        if not self.current:
+            return self.click()
+        self.repo.connect_info(self.current["sn"], self._today(), datetime.now(TZ).hour)
+
+    def date(self):
+        d0 = datetime.now(TZ).date()
+        self.date_s = (d0 + timedelta(days=self.rnd.randrange(15))).isoformat()
+        self.selected.clear()
+        self.slot_colors(); self.buttons()
+
+    def toggle(self):
+        if not self.current:
+            return self.click()
+        s = self.rnd.randrange(24)
+        self.selected.symmetric_difference_update({s})
+        self.buttons()                              # selection-only: repaint from the cached rows
+
+    def book(self):
+        if not self.current:
+            return self.click()
+        taken = {int(r["slot"]) for r in self.slot_rows()}
+        free = [s for s in range(24) if s not in taken]
+        if not free:
+            return self.date()
+        self.selected = set(self.rnd.sample(free, min(len(free), self.rnd.randint(1, 3))))
+        self._book_slots(self.current["id"], sorted(self.selected))
+        self.selected.clear()
+        self.slot_colors(); self.leds(); self.buttons()
+
+    def cancel(self):
+        mine = [k for k in self.held if self.current and k[0] == self.current["id"] and k[1] == self.date_s]
+        if not mine:
+            if not self.held:
+                return self.book()
+            mid, self.date_s, _ = self.rnd.choice(list(self.held))
+            self.current = next((m for m in self.machines if m["id"] == mid), self.current)
+            return self.slot_colors()
+        n = self.repo.delete_bookings(mine[0][0], self.date_s, [k[2] for k in mine])
+        self.cancelled += n
+        for k in mine:
+            self.held.pop(k, None)
+        self.slot_colors(); self.leds(); self.buttons()
+
+    def cleanup(self):
+        by: Dict[tuple, List[int]] = {}
+        for mid, d, s in self.held:
+            by.setdefault((mid, d), []).append(s)
+        for (mid, d), slots in by.items():
+            try:
+                self.repo.delete_bookings(mid, d, slots)
+            except DB_ERRORS as e:
+                log.warning("%s: cleanup of %s %s failed: %s", self.name, mid, d, e)
+        self.held.clear()
+
+    # driver
+    def _do(self, label: str, fn):
+        with QUERY_STATS.tick(label):
+            try:
+                fn()
+            except DB_ERRORS as e:
+                self.errors[type(e).__name__] += 1
+
+    def run(self, stop: threading.Event, t_end: float):
+        self._do("startup", self.start)
+        if not self.machines:
+            return
+        now = time.monotonic()
+        next_tick = now + self.rnd.uniform(0, self.tick_s)      # clients don't start in lockstep
+        next_inv = now + self.rnd.uniform(0, self.inventory_s) if self.inventory_s > 0 else float("inf")
+        next_act = now + self.rnd.expovariate(1.0 / self.action_s) if self.action_s else float("inf")
+        names, weights = list(ACTIONS), list(ACTIONS.values())
+        while not stop.is_set():
+            now = time.monotonic()
+            if now >= t_end:
+                break
+            if now >= next_tick:
+                self.tick_lag.add((now - next_tick) * 1000.0)
+                self._do("_tick", self.tick)
+                next_tick += self.tick_s
+                if time.monotonic() > next_tick:            # QTimer drops missed beats too
+                    next_tick = time.monotonic()
+            elif now >= next_inv:
+                self._do("check_inventory", self.check_inventory)
+                next_inv = max(next_inv + self.inventory_s, time.monotonic())
+            elif now >= next_act:
+                act = self.rnd.choices(names, weights)[0]
+                self._do(act, getattr(self, act))
+                next_act = now + self.rnd.expovariate(1.0 / self.action_s)
+            else:
+                stop.wait(min(next_tick, next_act, next_inv, t_end) - now)
+        self._do("cleanup", self.cleanup)
+
+class LegacyClient(SimClient):
+    """The query mix before the date-wide LED read and the client-side caches (--legacy)."""
+
+    def slot_rows(self) -> List[dict]:
+        return self.rows
+
+    def slot_colors(self):
+        self.rows = self.repo.bookings_of(machine_id=self.current["id"], date_s=self.date_s) if self.current else []
+
+    def leds(self):
+        today = self._today()
+        for m in self.machines:
+            self.repo.bookings_of(machine_id=m["id"], date_s=today)
+
+    def details(self):
+        if self.current:
+            self.repo.get_machine_by_sn(self.current["sn"])
+            self.repo.bookings_of(machine_id=self.current["id"], date_s=self._today())
+
+    def buttons(self):
+        if self.current and self.selected:
+            self.repo.bookings_of(machine_id=self.current["id"], date_s=self.date_s)
+
+    def check_inventory(self):
+        pass
+
+    def start(self):
+        self.machines = self.repo.list_machines()
+        self.date_s = self._today()
+        self.leds()
+
+    def toggle(self):
+        if not self.current:
+            return self.click()
+        self.selected.symmetric_difference_update({self.rnd.randrange(24)})
+        self.slot_colors(); self.buttons()
+
+    def connect(self):
+        if not self.current:
+            return self.click()
+        self.repo.get_machine_by_sn(self.current["sn"])
+        self.repo.bookings_of(machine_id=self.current["id"], date_s=self._today())
+
+    def _book_slots(self, mid: int, slots: List[int]):
+        for s in slots:
+            if self.repo.insert_booking(mid, self.date_s, s, self.name, LOADGEN_WWID):
+                self.booked += 1; self.held[(mid, self.date_s, s)] = None
+            else:
+                self.conflicts += 1
+
+def build_repo(a) -> Repo:
+    if a.backend == "sqlite":
+        return SQLiteRepo(a.sqlite)
+    if a.backend == "http":
+        return HttpRepo(a.url)
+    return make_repo(a.backend)
+
+def report(clients: List[SimClient], wall: float, lock0: dict, lock1: dict):
+    snap = QUERY_STATS.snapshot()
+    stmts = [r for r in snap if r["kind"] == "stmt"]
+    ticks = {r["name"]: r for r in snap if r["kind"] == "tick"}
+    q = sum(r["calls"] for r in stmts)
+    err = sum(r["errors"] for r in stmts)
+    print(f"\n{len(clients)} clients, {wall:.1f} s: {q} queries, {q / wall:.1f} QPS, "
+          f"errors {err} ({100.0 * err / max(1, q):.2f} %)")
+    print(f"{'statement':<18}{'calls':>8}{'err':>6}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>9}  ms")
+    for r in sorted(stmts, key=lambda r: -r["calls"]):
+        print(f"{r['name']:<18}{r['calls']:>8}{r['errors']:>6}{r['total_ms_p50']:>8.1f}{r['total_ms_p95']:>8.1f}"
+              f"{r['total_ms_p99']:>8.1f}{r['total_ms_max']:>9.1f}")
+    print(f"{'action':<18}{'n':>8}{'q/act':>6}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>9}  ms (wall)")
+    for name in ["_tick", "check_inventory", "startup"] + list(ACTIONS) + ["cleanup"]:
+        r = ticks.get(name)
+        if r:
+            print(f"{name:<18}{r['calls']:>8}{r['queries'] / max(1, r['calls']):>6.1f}{r['total_ms_p50']:>8.1f}"
+                  f"{r['total_ms_p95']:>8.1f}{r['total_ms_p99']:>8.1f}{r['total_ms_max']:>9.1f}")
+    lag = Histogram()
+    for c in clients:
+        lag.counts = [x + y for x, y in zip(lag.counts, c.tick_lag.counts)]
+        lag.n += c.tick_lag.n; lag.total += c.tick_lag.total; lag.hi = max(lag.hi, c.tick_lag.hi)
+    print(f"tick start lag p50={lag.percentile(50):.0f} p95={lag.percentile(95):.0f} max={lag.hi:.0f} ms "
+          f"(grows when the backend cannot keep up)")
+    booked = sum(c.booked for c in clients); conflicts = sum(c.conflicts for c in clients)
+    print(f"bookings {booked}, conflicts {conflicts}, cancelled {sum(c.cancelled for c in clients)}")
+    errors = sum((c.errors for c in clients), Counter())
+    if errors:
+        print("client errors: " + ", ".join(f"{k}={v}" for k, v in errors.most_common()))
+    if lock1:
+        waits = lock1.get("Innodb_row_lock_waits", 0) - lock0.get("Innodb_row_lock_waits", 0)
+        ms = lock1.get("Innodb_row_lock_time", 0) - lock0.get("Innodb_row_lock_time", 0)
+        dl = lock1.get("Innodb_deadlocks", 0) - lock0.get("Innodb_deadlocks", 0)
+        print(f"lock waits {waits} ({ms} ms, max {lock1.get('Innodb_row_lock_time_max', 0)} ms), deadlocks {dl}, "
+              f"threads connected {lock1.get('Threads_connected', '?')}, running {lock1.get('Threads_running', '?')}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking multi-client load generator")
+    ap.add_argument("--backend", choices=("mysql", "sqlite", "http"),
+                    default=getattr(DB_Config_sample, "BACKEND", "mysql"))
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (default: a fresh temp file)")
+    ap.add_argument("--seed", type=int, default=0, help="SQLite only: create N demo machines")
+    ap.add_argument("--url", help="booking service for --backend http")
+    ap.add_argument("--clients", type=int, default=20)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--tick", type=float, default=5.0, help="Controller refresh period in seconds")
+    ap.add_argument("--actions", type=float, default=6.0, help="user actions per client per minute")
+    ap.add_argument("--inventory", type=float, metavar="S",
+                    default=float(getattr(DB_Config_sample, "INVENTORY", {}).get("check_s", 60)),
+                    help="fingerprint check period in seconds (0 = off)")
+    ap.add_argument("--legacy", action="store_true",
+                    help="replay the older query mix (per-machine LED reads, no caches, one insert per slot)")
+    ap.add_argument("--pool", type=int, default=0, help="pool N connections per client (0 = connect per call)")
+    ap.add_argument("--csv", help="append the per-statement snapshot to this CSV")
+    ap.add_argument("--rng", type=int, default=1)
+    ap.add_argument("-v", "--verbose", action="store_true")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    tmp = None
+    if a.backend == "sqlite" and not a.sqlite:
+        fd, tmp = tempfile.mkstemp(prefix="rvb_load_", suffix=".db"); os.close(fd)
+        a.sqlite = tmp
+    admin = build_repo(a)
+    if a.seed and isinstance(admin, SQLiteRepo):
+        admin.seed_machines([f"{'ABCDEFGH'[i % 8]}_{i // 8 + 1:02d}" for i in range(a.seed)])
+    lock0 = admin.lock_status()
+
+    clients = []
+    for i in range(a.clients):
+        repo = build_repo(a)                    # one breaker / pool per client, like real desktops
+        if a.pool:
+            repo.enable_pool(a.pool)
+        clients.append((LegacyClient if a.legacy else SimClient)(i, repo, a.tick, a.actions, a.rng,
+                                                                   0.0 if a.legacy else a.inventory))
+    QUERY_STATS.reset()
+    stop = threading.Event()
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=c.run, args=(stop, t0 + a.duration), name=c.name, daemon=True)
+               for c in clients]
+    for t in threads:
+        t.start()
+    print(f"{a.clients} {'legacy ' if a.legacy else ''}clients on {a.backend}, tick {a.tick:g} s, "
+          f"{a.actions:g} actions/min, {a.duration:g} s ...")
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join()
+    wall = time.monotonic() - t0
+    lock1 = admin.lock_status()
+    report(clients, wall, lock0, lock1)
+    if a.csv:
+        QUERY_STATS.dump_csv(a.csv)
+    if tmp:
+        for p in (tmp, tmp + "-wal", tmp + "-shm"):
+            if os.path.exists(p):
+                os.remove(p)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# Metrics.py — in-process query instrumentation (latency histograms, round-trip counters)
+import csv, functools, logging, threading, time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from Trace import TRACER
+
+log = logging.getLogger("RemoteVNCBooking.metrics")
+
+# upper bounds (ms); the last bucket is open-ended
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+class Histogram:
+    __slots__ = ("counts", "n", "total", "lo", "hi")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.n = 0; self.total = 0.0
+        self.lo = float("inf"); self.hi = 0.0
+
+    def add(self, v: float):
+        i = 0
+        while i < len(BUCKETS_MS) and v > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1; self.total += v
+        if v < self.lo: self.lo = v
+        if v > self.hi: self.hi = v
+
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Bucket upper bound holding the p-th percentile (clamped to the observed max)."""
+        if not self.n:
+            return 0.0
+        want, seen = p / 100.0 * self.n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= want:
+                return min(BUCKETS_MS[i], self.hi) if i < len(BUCKETS_MS) else self.hi
+        return self.hi
+
+class StatementStats:
+    __slots__ = ("calls", "errors", "rows", "bytes", "connect_ms", "exec_ms", "total_ms")
+
+    def __init__(self):
+        self.calls = self.errors = self.rows = self.bytes = 0
+        self.connect_ms = Histogram(); self.exec_ms = Histogram(); self.total_ms = Histogram()
+
+def _result_size(res):
+    """(rows, approx bytes) of a repository result."""
+    if res is None:
+        return 0, 0
+    if isinstance(res, bool):
+        return int(res), 0
+    if isinstance(res, int):
+        return res, 0
+    rows = [res] if isinstance(res, dict) else (res if isinstance(res, (list, tuple)) else None)
+    if rows is None:
+        return 1, 0
+    nbytes = 0
+    for r in rows:
+        if isinstance(r, dict):
+            nbytes += sum(len(str(v)) for v in r.values() if v is not None)
+    return len(rows), nbytes
+
+class _Call:
+    __slots__ = ("connect_ms", "connects")
+
+    def __init__(self):
+        self.connect_ms = 0.0; self.connects = 0
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, StatementStats] = {}
+        self._ticks: Dict[str, StatementStats] = {}
+        self._local = threading.local()
+        self.gauges: Dict[str, object] = {}
+        self.tick_level = logging.DEBUG
+
+    # recording
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator for repository methods."""
+        def deco(fn):
+            stmt = name or fn.__name__
+            @functools.wraps(fn)
+            def wrapper(*a, **kw):
+                outer = getattr(self._local, "call", None)
+                call = self._local.call = _Call()
+                t0 = time.perf_counter(); err = False; res = None
+                try:
+                    with TRACER.span(stmt, "db"):
+                        res = fn(*a, **kw)
+                    return res
+                except Exception:
+                    err = True
+                    raise
+                finally:
+                    total = (time.perf_counter() - t0) * 1000.0
+                    self._local.call = outer
+                    self._record(stmt, total, call.connect_ms, err, res)
+            return wrapper
+        return deco
+
+    def note_connect(self, ms: float):
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call.connect_ms += ms; call.connects += 1
+
+    def _record(self, stmt: str, total: float, connect: float, err: bool, res):
+        rows, nbytes = (0, 0) if err else _result_size(res)
+        with self._lock:
+            st = self._stats.get(stmt)
+            if st is None:
+                st = self._stats[stmt] = StatementStats()
+            st.calls += 1; st.errors += int(err); st.rows += rows; st.bytes += nbytes
+            st.connect_ms.add(connect); st.exec_ms.add(max(0.0, total - connect)); st.total_ms.add(total)
+        tick = getattr(self._local, "tick", None)
+        if tick is not None:
+            tick[0] += 1; tick[1] += total; tick[2] += int(err)
+
+    @contextmanager
+    def tick(self, label: str = "_tick"):
+        """Count the queries issued on this thread inside the block."""
+        outer = getattr(self._local, "tick", None)
+        acc = self._local.tick = [0, 0.0, 0]
+        t0 = time.perf_counter()
+        try:
+            yield acc
+        finally:
+            wall = (time.perf_counter() - t0) * 1000.0
+            self._local.tick = outer
+            if outer is not None:
+                outer[0] += acc[0]; outer[1] += acc[1]; outer[2] += acc[2]
+            with self._lock:
+                st = self._ticks.get(label)
+                if st is None:
+                    st = self._ticks[label] = StatementStats()
+                st.calls += 1; st.rows += acc[0]; st.errors += acc[2]
+                st.exec_ms.add(acc[1]); st.total_ms.add(wall)
+            log.log(self.tick_level, "this %s issued %d queries taking %.0f ms (wall %.0f ms, %d errors)",
+                    label, acc[0], acc[1], wall, acc[2])
+
+    def set_gauge(self, name: str, value):
+        self.gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear(); self._ticks.clear()
+
+    # reporting
+    def snapshot(self) -> List[dict]:
+        out = []
+        with self._lock:
+            items = [("stmt", k, v) for k, v in self._stats.items()] + [("tick", k, v) for k, v in self._ticks.items()]
+            for kind, k, st in sorted(items, key=lambda x: (x[0], -x[2].total_ms.total)):
+                row = {
+                    "kind": kind, "name": k, "calls": st.calls, "errors": st.errors,
+                    "rows" if kind == "stmt" else "queries": st.rows,
+                    "bytes": st.bytes,
+                    "connect_ms_avg": round(st.connect_ms.mean(), 3),
+                    "exec_ms_avg": round(st.exec_ms.mean(), 3),
+                    "total_ms_sum": round(st.total_ms.total, 3),
+                    "total_ms_p50": round(st.total_ms.percentile(50), 3),
+                    "total_ms_p95": round(st.total_ms.percentile(95), 3),
+                    "total_ms_p99": round(st.total_ms.percentile(99), 3),
+                    "total_ms_max": round(st.total_ms.hi, 3),
+                }
+                for b, c in zip(list(BUCKETS_MS) + ["inf"], st.total_ms.counts):
+                    row[f"le_{b}"] = c
+                out.append(row)
+        return out
+
+    def log_summary(self, level: int = logging.INFO):
+        for r in self.snapshot():
+            if r["kind"] == "tick":
+                log.log(level, "%-22s n=%d queries/avg=%.1f db=%.1fms wall p50=%.0f p95=%.0f max=%.0f ms",
+                        r["name"], r["calls"], r["queries"] / max(1, r["calls"]), r["exec_ms_avg"],
+                        r["total_ms_p50"], r["total_ms_p95"], r["total_ms_max"])
+            else:
+                log.log(level, "%-22s n=%d err=%d rows=%d bytes=%d connect=%.1fms exec=%.1fms p50=%.1f p95=%.1f p99=%.1f max=%.1f ms",
+                        r["name"], r["calls"], r["errors"], r["rows"], r["bytes"], r["connect_ms_avg"],
+                        r["exec_ms_avg"], r["total_ms_p50"], r["total_ms_p95"], r["total_ms_p99"], r["total_ms_max"])
+        if self.gauges:
+            log.log(level, "gauges %s", ", ".join(f"{k}={v}" for k, v in sorted(self.gauges.items())))
+
+    def dump_csv(self, path: str):
+        """Append one timestamped snapshot per statement to `path`."""
+        rows = self.snapshot()
+        if not rows:
+            return
+        p = Path(path)
+        fields = ["at", "kind", "name", "calls", "errors", "rows", "queries", "bytes",
+                  "connect_ms_avg", "exec_ms_avg", "total_ms_sum", "total_ms_p50", "total_ms_p95",
+                  "total_ms_p99", "total_ms_max"] + [f"le_{b}" for b in list(BUCKETS_MS) + ["inf"]]
+        new = not p.exists() or p.stat().st_size == 0
+        at = datetime.now().isoformat(timespec="seconds")
+        with p.open("a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            if new:
+                w.writeheader()
+            for r in rows:
+                w.writerow(dict(r, at=at))
+
+    def dump(self, csv_path: Optional[str] = None):
+        self.log_summary()
+        if csv_path:
+            try:
+                self.dump_csv(csv_path)
+            except OSError as e:
+                log.warning("metrics csv dump failed: %s", e)
+
+QUERY_STATS = QueryStats()
+timed = QUERY_STATS.timed
@@ -0,0 +1,155 @@
+# MyBookings.py — "My bookings": every future booking of the logged-in wwid, PySide6 6.5.3 / Python 3.8
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QDate, Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView, QDialog, QHBoxLayout, QHeaderView, QLabel, QMessageBox, QPushButton, QTableWidget,
+    QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+from Occupancy import hours_mask, hours_of
+from Repo import DB_ERRORS
+
+class MyBookingsDialog(QDialog):
+    """One indexed my_bookings() read on open/Refresh, then kept current from push deltas.
+    Rows are runs of consecutive hours; Cancel releases the selection in one apply_ops()."""
+    jump_requested = Signal(str, QDate, int)           # sn, date, first hour (double click)
+    changed = Signal()                                 # bookings cancelled from here
+
+    def __init__(self, repo, machines: Callable[[], List[dict]], today: Callable[[], QDate],
+                 now_hour: Callable[[], int], wwid: str, display_name: str = "", parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle(f"My bookings — {display_name or wwid}")
+        self.repo = repo
+        self._machines = machines
+        self._today = today
+        self._now_hour = now_hour
+        self.wwid = wwid
+        self.mine: Dict[Tuple[int, str], int] = {}      # (machine_id, date) -> slot mask
+        self._sn: Dict[int, str] = {}
+        self._rows: List[Tuple[int, str, int, int]] = []   # machine_id, date, first, last
+
+        self.status = QLabel()
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Date", "Machine", "Hours", "Length"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        btn_refresh = QPushButton("Refresh")
+        self.btn_cancel = QPushButton("Cancel selected")
+        self.btn_cancel.setEnabled(False)
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.status, 1); bottom.addWidget(btn_refresh); bottom.addWidget(self.btn_cancel)
+        v = QVBoxLayout(self)
+        v.addWidget(self.table, 1); v.addLayout(bottom)
+        self.resize(560, 420)
+
+        btn_refresh.clicked.connect(self.reload)
+        self.btn_cancel.clicked.connect(self.cancel_selected)
+        self.table.itemSelectionChanged.connect(lambda: self.btn_cancel.setEnabled(bool(self._selected())))
+        self.table.cellDoubleClicked.connect(self._jump)
+
+    def open_for(self):
+        self.reload()
+        self.show(); self.raise_(); self.activateWindow()
+
+    def reload(self):
+        try:
+            rows = self.repo.my_bookings(self.wwid, self._today().toString("yyyy-MM-dd"))
+        except DB_ERRORS as e:
+            self.status.setText(f"Database unavailable: {e}")
+            return
+        self.mine = {}
+        for r in rows:
+            k = (int(r["machine_id"]), str(r["date"]))
+            self.mine[k] = self.mine.get(k, 0) | 1 << int(r["slot"])
+            self._sn[k[0]] = r.get("sn") or ""
+        self.render()
+
+    def poll(self):
+        """Fallback refresh from the Controller's timer while no push stream is up."""
+        if self.isVisible():
+            self.reload()
+
+    def apply_deltas(self, deltas: list):
+        if not self.isVisible():
+            return
+        touched = False
+        for d in deltas:
+            k, bit = (int(d["m"]), d["d"]), 1 << int(d["s"])
+            if d["op"] == "book" and d.get("w") == self.wwid:
+                self.mine[k] = self.mine.get(k, 0) | bit
+            elif self.mine.get(k, 0) & bit:
+                self.mine[k] &= ~bit                    # cancelled, or taken over by someone else
+            else:
+                continue
+            touched = True
+        if touched:
+            self.render()
+
+    def render(self):
+        today, hour = self._today().toString("yyyy-MM-dd"), self._now_hour()
+        if any(mid not in self._sn for mid, _ in self.mine):
+            self._sn.update({int(m["id"]): m["sn"] for m in self._machines()})
+        self._rows = []
+        for (mid, d), mask in self.mine.items():
+            if d < today:
+                continue
+            if d == today:
+                mask &= ~hours_mask(0, hour - 1)        # hours already over
+            hs = hours_of(mask)
+            i = 0
+            while i < len(hs):                          # one row per run of consecutive hours
+                j = i
+                while j + 1 < len(hs) and hs[j + 1] == hs[j] + 1:
+                    j += 1
+                self._rows.append((mid, d, hs[i], hs[j]))
+                i = j + 1
+        self._rows.sort(key=lambda r: (r[1], self._sn.get(r[0], ""), r[2]))
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(self._rows))
+        for i, (mid, d, a, b) in enumerate(self._rows):
+            day = QDate.fromString(d, "yyyy-MM-dd").toString("yyyy-MM-dd ddd")
+            for c, text in enumerate((day, self._sn.get(mid, str(mid)), f"{a}:00–{b + 1}:00", f"{b - a + 1} h")):
+                self.table.setItem(i, c, QTableWidgetItem(text))
+        self.table.setUpdatesEnabled(True)
+        hours = sum(b - a + 1 for _, _, a, b in self._rows)
+        self.status.setText(f"{hours} hour(s) on {len({r[0] for r in self._rows})} machine(s)")
+        self.btn_cancel.setEnabled(bool(self._selected()))
+
+    def _selected(self) -> List[Tuple[int, str, int, int]]:
+        sm = self.table.selectionModel()
+        return [self._rows[ix.row()] for ix in (sm.selectedRows() if sm else []) if ix.row() < len(self._rows)]
+
+    def _jump(self, row: int, _col: int):
+        if row < len(self._rows):
+            mid, d, a, _ = self._rows[row]
+            self.jump_requested.emit(self._sn.get(mid, ""), QDate.fromString(d, "yyyy-MM-dd"), a)
+
+    def cancel_selected(self):
+        sel = self._selected()
+        if not sel:
+            return
+        hours = sum(b - a + 1 for _, _, a, b in sel)
+        if QMessageBox.question(self, "Cancel bookings", f"Cancel {hours} hour(s) in {len(sel)} booking(s)?") \
+                != QMessageBox.Yes:
+            return
+        ops = [{"op": "cancel", "machine_id": mid, "date": d, "slot": s, "expect_wwid": self.wwid}
+               for mid, d, a, b in sel for s in range(a, b + 1)]
+        try:
+            res = self.repo.apply_ops(ops)
+        except DB_ERRORS as e:
+            QMessageBox.warning(self, "Cancel bookings", f"Database unavailable: {e}")
+            return
+        for r in res:
+            if r["result"] == "won":
+                k = (int(r["machine_id"]), r["date"])
+                self.mine[k] = self.mine.get(k, 0) & ~(1 << int(r["slot"]))
+        lost = [r for r in res if r["result"] != "won"]
+        self.render()
+        self.changed.emit()
+        if lost:
+            QMessageBox.information(self, "Cancel bookings",
+                                    f"{len(lost)} hour(s) were no longer yours and were left alone.")
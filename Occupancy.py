@@ -0,0 +1,88 @@
+# Occupancy.py — per-machine 24-bit slot bitmaps for one date, Python 3.8
+import fnmatch
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FULL_DAY = (1 << 24) - 1
+
+def section_of(sn: str) -> str:
+    sn = (sn or "").strip()
+    return sn.split("_", 1)[0] if "_" in sn else "OTHER"
+
+def hours_mask(first: int, last: int) -> int:
+    """Bits first..last inclusive."""
+    if last < first:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << first
+
+def hours_of(mask: int) -> List[int]:
+    return [h for h in range(24) if mask >> h & 1]
+
+def fmt_hours(mask: int) -> str:
+    """'9-12, 15' style runs."""
+    out, h = [], 0
+    while h < 24:
+        if mask >> h & 1:
+            e = h
+            while e + 1 < 24 and mask >> (e + 1) & 1:
+                e += 1
+            out.append(str(h) if e == h else f"{h}-{e}")
+            h = e + 1
+        else:
+            h += 1
+    return ", ".join(out)
+
+class DayOccupancy:
+    """Booked slots of every machine on one date, built from a single date-wide read."""
+
+    def __init__(self, date_s: str, rows: Iterable[dict] = ()):
+        self.date_s = date_s
+        self.mask: Dict[int, int] = {}
+        self.who: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        for r in rows:
+            self.set(int(r["machine_id"]), int(r["slot"]), r.get("display_name") or "", r.get("wwid") or "")
+
+    def set(self, mid: int, slot: int, name: str, wwid: str):
+        self.mask[mid] = self.mask.get(mid, 0) | 1 << slot
+        self.who[(mid, slot)] = (name, wwid)
+
+    def clear(self, mid: int, slot: int):
+        self.mask[mid] = self.mask.get(mid, 0) & ~(1 << slot)
+        self.who.pop((mid, slot), None)
+
+    def apply_deltas(self, deltas: Iterable[dict]):
+        """Push deltas ({"op", "m", "d", "s", "n", "w"}) for this date."""
+        for d in deltas:
+            if d.get("d") != self.date_s:
+                continue
+            if d["op"] == "book":
+                self.set(int(d["m"]), int(d["s"]), d.get("n", ""), d.get("w", ""))
+            else:
+                self.clear(int(d["m"]), int(d["s"]))
+
+    def busy(self, mid: int) -> int:
+        return self.mask.get(mid, 0)
+
+def match_sn(sn: str, pattern: str) -> bool:
+    """Glob (A_0*) when the pattern has wildcards, otherwise a substring; case-insensitive."""
+    p = (pattern or "").strip().lower()
+    if not p:
+        return True
+    s = sn.lower()
+    return fnmatch.fnmatchcase(s, p) if any(c in p for c in "*?[") else p in s
+
+def find_free(machines: List[dict], occ: DayOccupancy, want: int, section: Optional[str] = None,
+              pattern: str = "", partial: bool = False) -> List[Tuple[dict, int]]:
+    """(machine, free mask within `want`) ranked: fully free first, then most free hours, then sn.
+    Only fully free machines unless `partial`."""
+    out = []
+    for m in machines:
+        sn = m["sn"] or ""
+        if section and section_of(sn) != section:
+            continue
+        if pattern and not match_sn(sn, pattern):
+            continue
+        free = want & ~occ.busy(int(m["id"]))
+        if free == want or (partial and free):
+            out.append((m, free))
+    out.sort(key=lambda x: (x[1] != want, -bin(x[1]).count("1"), x[0]["sn"]))
+    return out
@@ -0,0 +1,226 @@
+# Offline.py — last-snapshot reads and a durable write-ahead journal for bookings, Python 3.8
+import json, logging, os, threading, time, uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from Repo import Repo, DB_ERRORS, CircuitOpenError
+
+log = logging.getLogger("RemoteVNCBooking.offline")
+
+def default_journal_path() -> Path:
+    return Path.home() / ".RemoteVNCBooking" / "offline_journal.jsonl"
+
+class Journal:
+    """Append-only JSON Lines file; every append is fsync'ed before returning."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else default_journal_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def append(self, ops: List[dict]):
+        if not ops:
+            return
+        data = "".join(json.dumps(o, ensure_ascii=False) + "\n" for o in ops).encode("utf-8")
+        with self._lock, open(self.path, "a+b") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":          # torn tail of a crashed append: don't glue onto it
+                    data = b"\n" + data
+            f.write(data); f.flush(); os.fsync(f.fileno())
+
+    @staticmethod
+    def _parse(line: str) -> Optional[dict]:
+        try:
+            return json.loads(line)
+        except ValueError:
+            log.warning("skipping torn journal line: %r", line.strip()[:80])   # crash mid-append
+            return None
+
+    def read(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        with self._lock, open(self.path, encoding="utf-8") as f:
+            return [o for o in (self._parse(l) for l in f if l.strip()) if o is not None]
+
+    def drop(self, ids: List[str]):
+        """Remove replayed ops (atomic rewrite of whatever is left; torn lines go too)."""
+        done = set(ids)
+        with self._lock:
+            left = []
+            if self.path.exists():
+                with open(self.path, encoding="utf-8") as f:
+                    for l in f:
+                        o = self._parse(l) if l.strip() else None
+                        if o is not None and o.get("id") not in done:
+                            left.append(l if l.endswith("\n") else l + "\n")
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(left); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def __len__(self) -> int:
+        return len(self.read())
+
+class OfflineRepo:
+    """Wraps a Repo: reads fall back to the last good result while the database is
+    unreachable, and booking/cancel intents can be queued in a Journal and replayed
+    later with Repo.apply_ops(). While `live` (a push stream keeps the snapshot
+    current through apply_deltas()), cached booking reads skip the backend."""
+
+    def __init__(self, inner: Repo, journal_path: Optional[str] = None):
+        self.inner = inner
+        self.journal = Journal(journal_path)
+        self.offline = False
+        self.live = False
+        self._machines: Optional[List[dict]] = None
+        self._fingerprint: Optional[str] = None
+        self._by_sn: Dict[str, dict] = {}
+        self._bookings: Dict[Tuple[Optional[int], Optional[str]], List[dict]] = {}
+        self._mine: Dict[str, List[dict]] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def is_outage(self, e: BaseException) -> bool:
+        return self.inner.is_outage(e)
+
+    def _serve(self, fetch, cached):
+        try:
+            res = fetch()
+        except DB_ERRORS as e:
+            if not self.is_outage(e):
+                raise
+            hit = cached()
+            if hit is None:
+                raise
+            self.offline = True
+            return hit
+        self.offline = False
+        return res
+
+    # reads
+    def list_machines(self) -> List[dict]:
+        def fetch():
+            rows = self.inner.list_machines()
+            self._machines = rows
+            return rows
+        return self._serve(fetch, lambda: self._machines)
+
+    def machines_fingerprint(self) -> str:
+        def fetch():
+            self._fingerprint = self.inner.machines_fingerprint()
+            return self._fingerprint
+        return self._serve(fetch, lambda: self._fingerprint)
+
+    def get_machine_by_sn(self, sn: str) -> Optional[dict]:
+        def fetch():
+            row = self.inner.get_machine_by_sn(sn)
+            if row: self._by_sn[sn] = row
+            return row
+        return self._serve(fetch, lambda: self._by_sn.get(sn))
+
+    def connect_info(self, sn: str, date_s: str, slot: int) -> Optional[dict]:
+        def fetch():
+            row = self.inner.connect_info(sn, date_s, slot)
+            if row: self._by_sn[sn] = {k: v for k, v in row.items() if k not in ("booked_name", "booked_wwid")}
+            return row
+        def cached():
+            m = self._by_sn.get(sn)
+            rows = self._bookings.get((m["id"], date_s), self._bookings.get((None, date_s))) if m else None
+            if rows is None:
+                return None
+            b = next((r for r in rows if r["machine_id"] == m["id"] and int(r["slot"]) == slot), None)
+            return dict(m, booked_name=b["display_name"] if b else None, booked_wwid=b["wwid"] if b else None)
+        return self._serve(fetch, cached)
+
+    def bookings_of(self, machine_id: Optional[int] = None, date_s: Optional[str] = None) -> List[dict]:
+        key = (machine_id, date_s)
+        if self.live and key in self._bookings:
+            return self._bookings[key]
+        def fetch():
+            rows = self.inner.bookings_of(machine_id=machine_id, date_s=date_s)
+            self._bookings[key] = rows
+            if machine_id is None and date_s is not None and self._machines is not None:
+                # a date-wide read also answers every per-machine read of that date
+                per: Dict[int, List[dict]] = {m["id"]: [] for m in self._machines}
+                for r in rows:
+                    per.setdefault(r["machine_id"], []).append(r)
+                for mid, rs in per.items():
+                    self._bookings[(mid, date_s)] = rs
+            return rows
+        return self._serve(fetch, lambda: self._bookings.get(key))
+
+    def my_bookings(self, wwid: str, date_from: str) -> List[dict]:
+        def fetch():
+            rows = self.inner.my_bookings(wwid, date_from)
+            self._mine[wwid] = rows
+            return rows
+        return self._serve(fetch, lambda: [r for r in self._mine.get(wwid, []) if str(r["date"]) >= date_from]
+                           if wwid in self._mine else None)
+
+    # writes
+    def apply_ops(self, ops: List[dict], atomic: bool = False) -> List[dict]:
+        res = self.inner.apply_ops(ops, atomic)
+        self._apply_local([r for r in res if r["result"] == "won"])
+        return res
+
+    def delete_bookings(self, machine_id: int, date_s: str, slots: List[int]) -> int:
+        n = self.inner.delete_bookings(machine_id, date_s, slots)
+        self._apply_local([{"op": "cancel", "machine_id": machine_id, "date": date_s, "slot": int(s)} for s in slots])
+        return n
+
+    def pending(self) -> List[dict]:
+        return self.journal.read()
+
+    def queue_booking(self, machine_id: int, sn: str, date_s: str, slots: List[int],
+                      display_name: str, wwid: str) -> List[dict]:
+        return self._queue("book", machine_id, sn, date_s, slots, display_name, wwid, {})
+
+    def queue_cancel(self, machine_id: int, sn: str, date_s: str, slots: List[int],
+                     display_name: str, wwid: str, expect: Dict[int, str]) -> List[dict]:
+        """`expect` maps slot -> wwid of the booking the user saw when cancelling."""
+        return self._queue("cancel", machine_id, sn, date_s, slots, display_name, wwid, expect)
+
+    def _queue(self, op, machine_id, sn, date_s, slots, display_name, wwid, expect) -> List[dict]:
+        at = time.strftime("%Y-%m-%d %H:%M:%S")
+        ops = [{"id": uuid.uuid4().hex, "op": op, "machine_id": machine_id, "sn": sn, "date": date_s,
+                "slot": int(s), "display_name": display_name, "wwid": wwid,
+                "expect_wwid": expect.get(int(s), ""), "at": at} for s in sorted(slots)]
+        self.journal.append(ops)
+        self._apply_local(ops, queued=True)
+        log.info("queued %d offline %s op(s) for %s %s", len(ops), op, sn, date_s)
+        return ops
+
+    def _apply_local(self, ops: List[dict], **extra):
+        """Reflect book/cancel ops in the snapshot (queued intents, pushed deltas)."""
+        for o in ops:
+            for key in ((o["machine_id"], o["date"]), (None, o["date"])):
+                rows = self._bookings.get(key)
+                if rows is None:
+                    continue
+                rows = [r for r in rows if not (r["machine_id"] == o["machine_id"] and int(r["slot"]) == o["slot"])]
+                if o["op"] == "book":
+                    rows.append(dict({"machine_id": o["machine_id"], "date": o["date"], "slot": o["slot"],
+                                      "display_name": o["display_name"], "wwid": o["wwid"]}, **extra))
+                self._bookings[key] = rows
+
+    def apply_deltas(self, deltas: List[dict]):
+        """Pushed deltas are absolute (book sets the holder, cancel frees), so re-applying is harmless."""
+        self._apply_local([{"op": d["op"], "machine_id": int(d["m"]), "date": d["d"], "slot": int(d["s"]),
+                            "display_name": d.get("n", ""), "wwid": d.get("w", "")} for d in deltas])
+
+    def invalidate(self):
+        self._bookings.clear()
+
+    def replay(self) -> List[dict]:
+        """Submit the journal in one transaction; returns every op with its result."""
+        ops = self.journal.read()
+        if not ops:
+            return []
+        res = self.inner.apply_ops(ops)
+        self.journal.drop([o["id"] for o in ops])
+        self._bookings.clear()
+        won = sum(1 for r in res if r["result"] == "won")
+        log.info("replayed %d offline op(s): %d won, %d lost", len(res), won, len(res) - won)
+        return res
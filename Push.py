@@ -0,0 +1,79 @@
+# Push.py — booking delta subscriber (Server-Sent Events from BookingService.py), PySide6 6.5.3
+import http.client, json, logging, threading
+from typing import Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from PySide6.QtCore import QObject, Signal
+
+log = logging.getLogger("RemoteVNCBooking.push")
+
+def iter_sse(fp) -> Iterator[Tuple[str, str]]:
+    """(event, data) pairs from a text/event-stream file object; comments are skipped."""
+    event, data = "message", []
+    for raw in iter(fp.readline, b""):
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            k, _, v = line.partition(":")
+            v = v[1:] if v.startswith(" ") else v
+            if k == "event":
+                event = v
+            elif k == "data":
+                data.append(v)
+
+class DeltaSubscriber(QObject):
+    """Background thread holding GET /events open; signals are delivered on the GUI thread."""
+    deltas = Signal(list)
+    live = Signal(bool)
+
+    def __init__(self, url: str, parent: Optional[QObject] = None, read_timeout: float = 45.0, token: str = ""):
+        super().__init__(parent)
+        self._headers = {"Accept": "text/event-stream"}
+        if token: self._headers["Authorization"] = "Bearer " + token
+        u = urlsplit(url)
+        self._host, self._port = u.hostname or "127.0.0.1", u.port or 80
+        self._timeout = read_timeout            # > the service's 15 s ping
+        self._stop = threading.Event()
+        self._hc: Optional[http.client.HTTPConnection] = None
+        self._thread = threading.Thread(target=self._run, name="push", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        hc = self._hc
+        if hc is not None:
+            hc.close()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            up = False
+            try:
+                self._hc = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+                self._hc.request("GET", "/events", headers=self._headers)
+                resp = self._hc.getresponse()
+                if resp.status != 200:
+                    raise http.client.HTTPException(f"HTTP {resp.status}")
+                for event, data in iter_sse(resp):
+                    if event == "hello":
+                        up = True; backoff = 1.0
+                        self.live.emit(True)
+                    elif event == "delta":
+                        self.deltas.emit(json.loads(data).get("deltas", []))
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                if not self._stop.is_set():
+                    log.info("push stream lost (%s), retrying in %.0f s", e, backoff)
+            finally:
+                if self._hc is not None:
+                    self._hc.close()
+            if up:
+                self.live.emit(False)
+            self._stop.wait(backoff)
+            backoff = min(30.0, backoff * 2)
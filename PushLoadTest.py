@@ -0,0 +1,173 @@
+# PushLoadTest.py — fan-out load test for BookingService /events, Python 3.8
+#
+#   python PushLoadTest.py --spawn --subscribers 500 --writes 200
+#   python PushLoadTest.py --url http://booking-host:8765 --subscribers 300
+#
+# Opens N raw SSE subscribers, then books/cancels slots through the service and
+# measures write -> delivery latency at every subscriber and any missed deltas.
+import argparse, asyncio, json, os, random, subprocess, sys, time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import DB_Config_sample
+from Metrics import Histogram
+
+TZ = timezone(timedelta(hours=8))
+Key = Tuple[str, int, str, int]
+
+class Subscriber:
+    def __init__(self, i: int):
+        self.i = i
+        self.got: Dict[Key, float] = {}
+        self.ready = asyncio.Event()
+        self.events = 0
+
+    async def run(self, host: str, port: int, auth: bytes = b""):
+        r, w = await asyncio.open_connection(host, port)
+        w.write(b"GET /events HTTP/1.1\r\nHost: %s\r\nAccept: text/event-stream\r\n%s\r\n" % (host.encode(), auth))
+        await w.drain()
+        while (await r.readline()) not in (b"\r\n", b""):
+            pass
+        event, data = "message", []
+        try:
+            async for raw in r:
+                line = raw.decode("utf-8").rstrip("\r\n")
+                if line:
+                    k, _, v = line.partition(":")
+                    if k == "event": event = v.strip()
+                    elif k == "data": data.append(v.strip())
+                    continue
+                if event == "hello":
+                    self.ready.set()
+                elif event == "delta" and data:
+                    now = time.perf_counter()
+                    self.events += 1
+                    for d in json.loads("\n".join(data))["deltas"]:
+                        self.got.setdefault((d["op"], d["m"], d["d"], d["s"]), now)
+                event, data = "message", []
+        finally:
+            w.close()
+
+def auth_header(token: str) -> bytes:
+    return b"Authorization: Bearer %s\r\n" % token.encode() if token else b""
+
+async def post(r, w, host: str, path: str, body: dict, auth: bytes = b"") -> dict:
+    data = json.dumps(body).encode()
+    w.write(b"POST %s HTTP/1.1\r\nHost: %s\r\n%sContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+            % (path.encode(), host.encode(), auth, len(data)) + data)
+    await w.drain()
+    n = 0
+    while True:
+        h = await r.readline()
+        if h in (b"\r\n", b""):
+            break
+        if h.lower().startswith(b"content-length:"):
+            n = int(h.split(b":", 1)[1])
+    return json.loads(await r.readexactly(n))
+
+async def get(host: str, port: int, path: str, auth: bytes = b""):
+    r, w = await asyncio.open_connection(host, port)
+    w.write(b"GET %s HTTP/1.1\r\nHost: %s\r\n%sConnection: close\r\n\r\n" % (path.encode(), host.encode(), auth))
+    await w.drain()
+    raw = await r.read()
+    w.close()
+    return json.loads(raw.split(b"\r\n\r\n", 1)[1])
+
+async def run(a) -> int:
+    u = urlsplit(a.url)
+    host, port = u.hostname or "127.0.0.1", u.port or 80
+    auth = auth_header(a.token)
+    machines = await get(host, port, "/machines", auth)
+    if isinstance(machines, dict):
+        print(f"service refused: {machines.get('error')}"); return 2
+    if not machines:
+        print("service has no machines"); return 2
+    subs = [Subscriber(i) for i in range(a.subscribers)]
+    tasks = []
+    t0 = time.perf_counter()
+    for s in subs:
+        tasks.append(asyncio.ensure_future(s.run(host, port, auth)))
+        await asyncio.sleep(0)                  # don't SYN-flood the listen backlog
+    await asyncio.wait_for(asyncio.gather(*(s.ready.wait() for s in subs)), 30)
+    print(f"{len(subs)} subscribers connected in {time.perf_counter() - t0:.2f} s")
+
+    rnd = random.Random(a.seed)
+    date_s = (datetime.now(TZ).date() + timedelta(days=a.day)).isoformat()
+    sent: Dict[Key, float] = {}
+    held = set()
+    r, w = await asyncio.open_connection(host, port)
+    t0 = time.perf_counter()
+    for i in range(a.writes):
+        m = rnd.choice(machines)["id"]; s = rnd.randrange(24)
+        if (m, s) in held:
+            res = await post(r, w, host, "/cancel", {"machine_id": m, "date": date_s, "slots": [s]}, auth)
+            if res.get("cancelled"):
+                sent[("cancel", m, date_s, s)] = time.perf_counter(); held.discard((m, s))
+        else:
+            t = time.perf_counter()
+            res = await post(r, w, host, "/book", {"machine_id": m, "date": date_s, "slots": [s],
+                                                   "display_name": "loadtest", "wwid": "00000000"}, auth)
+            if s in res.get("booked", []):
+                sent[("book", m, date_s, s)] = t; held.add((m, s))
+        if a.rate:
+            await asyncio.sleep(max(0.0, t0 + (i + 1) / a.rate - time.perf_counter()))
+    wall = time.perf_counter() - t0
+    if held:                                    # leave the day as we found it
+        by_m: Dict[int, List[int]] = {}
+        for m, s in held:
+            by_m.setdefault(m, []).append(s)
+        for m, slots in by_m.items():
+            await post(r, w, host, "/cancel", {"machine_id": m, "date": date_s, "slots": slots}, auth)
+    w.close()
+
+    await asyncio.sleep(a.settle)
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    lat = Histogram()
+    missing = 0
+    for s in subs:
+        for k, ts in sent.items():
+            if k in s.got:
+                lat.add((s.got[k] - ts) * 1000.0)
+            else:
+                missing += 1
+    expected = len(sent) * len(subs)
+    events = sum(s.events for s in subs)
+    print(f"writes {len(sent)} in {wall:.2f} s ({len(sent) / wall:.0f}/s), day {date_s}")
+    print(f"deltas expected {expected}, delivered {lat.n}, missing {missing}")
+    print(f"delivery latency p50={lat.percentile(50):.1f} p95={lat.percentile(95):.1f} "
+          f"p99={lat.percentile(99):.1f} max={lat.hi:.1f} ms")
+    print(f"events fanned out {events} ({events / max(wall, 1e-9):.0f}/s)")
+    return 1 if missing else 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SSE fan-out load test for BookingService")
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--token", default=getattr(DB_Config_sample, "SERVICE", {}).get("token", ""),
+                    help="service token (default: SERVICE token)")
+    ap.add_argument("--spawn", action="store_true", help="start BookingService.py on an in-memory SQLite DB")
+    ap.add_argument("--subscribers", type=int, default=300)
+    ap.add_argument("--writes", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=0, help="writes per second (0 = as fast as possible)")
+    ap.add_argument("--day", type=int, default=7, help="book this many days from today")
+    ap.add_argument("--settle", type=float, default=2.0, help="seconds to wait for stragglers")
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args(argv)
+    proc = None
+    if a.spawn:
+        port = urlsplit(a.url).port or 8765
+        proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "BookingService.py"), "--host", "127.0.0.1", "--port", str(port),
+                                 "--sqlite", ":memory:", "--seed", "40", "--token", a.token])
+        time.sleep(1.5)
+    try:
+        return asyncio.run(run(a))
+    finally:
+        if proc is not None:
+            proc.terminate(); proc.wait()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# Recurring.py — recurring booking rules and their bulk expansion into bookings, Python 3.8
+#
+#   python Recurring.py init                                         # create the rule tables (MySQL)
+#   python Recurring.py add --sn A_01 --hours 20-23 --daily --until 2026-12-31 --name Nightly --wwid 12345678
+#   python Recurring.py add --sn B_02 --hours 9-11 --weekly mon,thu --name "Reg run" --wwid 12345678
+#   python Recurring.py list [--wwid 12345678]
+#   python Recurring.py remove 7
+#   python Recurring.py expand [--days 15]                           # materialise the booking window once
+#   python Recurring.py run [--interval 3600]                        # keep doing so
+#
+# A rule is a machine, an hour range and a weekday set between two dates. Expansion
+# never goes past the booking window (today + 14) and costs one transaction per day,
+# however many rules there are; slots someone else already holds are reported as
+# conflicts (and stored once in recurring_conflicts) instead of being overwritten.
+import argparse, logging, time
+from datetime import datetime, date, timedelta, timezone
+from typing import List, Optional
+
+import DB_Config_sample
+from Repo import Repo, SQLiteRepo, make_repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.recurring")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+WINDOW_DAYS = 15                        # today + 14, same as DateEdit
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAILY = 127
+
+def parse_weekdays(s: str) -> int:
+    """'mon,wed,fri' -> bitmask, bit 0 = Monday."""
+    mask = 0
+    for part in (s or "").lower().replace(" ", "").split(","):
+        if part[:3] not in WEEKDAYS:
+            raise ValueError(f"unknown weekday {part!r}")
+        mask |= 1 << WEEKDAYS.index(part[:3])
+    return mask
+
+def fmt_weekdays(mask: int) -> str:
+    return "daily" if mask & DAILY == DAILY else ",".join(d for i, d in enumerate(WEEKDAYS) if mask >> i & 1)
+
+def parse_hours(s: str):
+    a, _, b = s.partition("-")
+    first, last = int(a), int(b or a)
+    if not 0 <= first <= last <= 23:
+        raise ValueError(f"bad hour range {s!r}")
+    return first, last
+
+def expand_window(repo: Repo, days: int = WINDOW_DAYS, today: Optional[date] = None) -> List[dict]:
+    """expand_rules() for today .. today + days - 1; a failed day is logged and skipped."""
+    now = datetime.now(TZ)
+    d0 = today or now.date()
+    out = []
+    for i in range(min(days, WINDOW_DAYS)):
+        d = (d0 + timedelta(days=i)).isoformat()
+        try:
+            r = repo.expand_rules(d, now.hour if d == now.date().isoformat() else 0)
+        except DB_ERRORS as e:
+            log.warning("expanding %s failed: %s", d, e)
+            continue
+        out.append(r)
+        if r["booked"] or r["new_conflicts"]:
+            log.info("%s: %d rule(s), %d slot(s) booked, %d new conflict(s)", d, r["rules"], r["booked"], r["new_conflicts"])
+        for c in r["conflicts"] if r["new_conflicts"] else ():
+            log.debug("rule %s: machine %s %s %d:00 held by %s (%s)", c["rule_id"], c["machine_id"], d, c["slot"],
+                      c["holder"], c["holder_wwid"])
+    return out
+
+def _print_expansion(results: List[dict]):
+    for r in results:
+        if r["rules"]:
+            print(f"{r['date']}: {r['rules']} rule(s), booked {r['booked']}, already held {r['kept']}, "
+                  f"conflicts {len(r['conflicts'])} ({r['new_conflicts']} new)")
+        for c in r["conflicts"]:
+            print(f"    rule {c['rule_id']}: machine {c['machine_id']} {c['slot']}:00 held by "
+                  f"{c['holder']} ({c['holder_wwid']})")
+    print(f"booked {sum(r['booked'] for r in results)} slot(s), "
+          f"{sum(len(r['conflicts']) for r in results)} conflict(s) over {len(results)} day(s)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking recurring bookings")
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init", help="create recurring_rules / recurring_conflicts if missing")
+    p = sub.add_parser("add", help="add a rule")
+    p.add_argument("--sn", required=True)
+    p.add_argument("--hours", required=True, help="first-last hour, e.g. 20-23")
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--daily", action="store_true", help="every day (default)")
+    g.add_argument("--weekly", metavar="DAYS", help="comma separated weekdays, e.g. mon,thu")
+    p.add_argument("--from", dest="start", help="first date (default: today)")
+    p.add_argument("--until", help="last date (default: open-ended)")
+    p.add_argument("--name", required=True)
+    p.add_argument("--wwid", required=True)
+    p = sub.add_parser("list", help="list rules")
+    p.add_argument("--wwid")
+    p = sub.add_parser("remove", help="remove a rule (existing bookings stay)")
+    p.add_argument("rule_id", type=int)
+    p = sub.add_parser("expand", help="expand all rules over the booking window once")
+    p.add_argument("--days", type=int, default=WINDOW_DAYS)
+    p = sub.add_parser("run", help="expand periodically")
+    p.add_argument("--days", type=int, default=WINDOW_DAYS)
+    p.add_argument("--interval", type=float,
+                   default=float(getattr(DB_Config_sample, "RECURRING", {}).get("interval_s", 3600)))
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+
+    if a.cmd == "init":
+        repo.create_recurring_schema()
+        print("ok")
+    elif a.cmd == "add":
+        m = repo.get_machine_by_sn(a.sn)
+        if not m:
+            print(f"no machine {a.sn}"); return 2
+        try:
+            first, last = parse_hours(a.hours)
+            weekdays = parse_weekdays(a.weekly) if a.weekly else DAILY
+            start = date.fromisoformat(a.start).isoformat() if a.start else datetime.now(TZ).date().isoformat()
+            until = date.fromisoformat(a.until).isoformat() if a.until else None
+        except ValueError as e:
+            print(e); return 2
+        if until and until < start:
+            print("--until is before --from"); return 2
+        rid = repo.add_rule(int(m["id"]), first, last, weekdays, start, until, a.name, a.wwid)
+        print(f"rule {rid}: {a.sn} {first}-{last} {fmt_weekdays(weekdays)} from {start}" + (f" until {until}" if until else ""))
+    elif a.cmd == "list":
+        for r in repo.list_rules(a.wwid):
+            print(f"{r['id']:>5} {r['sn']:<12} {r['first_slot']:>2}-{r['last_slot']:<2} {fmt_weekdays(int(r['weekdays'])):<28} "
+                  f"{r['start_date']}..{r['end_date'] or ''}  {r['display_name']} ({r['wwid']})")
+    elif a.cmd == "remove":
+        print("removed" if repo.delete_rule(a.rule_id) else "no such rule")
+    elif a.cmd == "expand":
+        _print_expansion(expand_window(repo, a.days))
+    elif a.cmd == "run":
+        while True:
+            t0 = time.monotonic()
+            res = expand_window(repo, a.days)
+            log.info("expanded %d day(s) in %.2f s: %d slot(s) booked", len(res), time.monotonic() - t0,
+                     sum(r["booked"] for r in res))
+            time.sleep(max(1.0, a.interval - (time.monotonic() - t0)))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,18 @@
 # RemoteVNCBooking_v1.2.1py — PySide6 6.5.3 / Python 3.8.19
-import os, tempfile, re, sys, shutil
-import pymysql
+import os, tempfile, re, sys, shutil, logging, functools, time
 from pathlib import Path
 from typing import Optional, Dict, Set, Tuple, List
-from pymysql.cursors import DictCursor
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile, Slot, QDate, QTime, Qt, QSize, QTimer, QDateTime, QTimeZone
-from PySide6.QtGui import QFont, QColor
+from PySide6.QtCore import QFile, Slot, QDate, QTime, Qt, QSize, QTimer, QDateTime, QTimeZone, QObject, QEvent
+from PySide6.QtGui import QFont, QColor, QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QApplication, QListWidget, QAbstractButton, QDateEdit, QPushButton,
     QLabel, QHBoxLayout, QListWidgetItem, QWidget, QMessageBox, QToolButton,
     QScrollArea, QVBoxLayout, QGridLayout, QFrame, QSizePolicy, QInputDialog
 )
 
+from Trace import TRACER, traced
+
 def resource_path(rel: str) -> str:
     base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base, rel)
@@ -43,9 +43,10 @@ def tz_hour():
 def ymd(qdate: QDate) -> str:
     return qdate.toString("yyyy-MM-dd")
 
+@traced("paint", "qt")
 def paint(btn: QAbstractButton, bg: str, border: Optional[str] = None):
     border = border or bg
-    btn.setStyleSheet(
+    css = (
         "QPushButton {"
         f"background-color: {bg};"
         f"color: {FG};"
@@ -54,15 +55,33 @@ def paint(btn: QAbstractButton, bg: str, border: Optional[str] = None):
         "padding: 6px 12px;"
         "}"
     )
+    if btn.styleSheet() != css:         # re-polishing is the expensive part
+        btn.setStyleSheet(css)
 
 def slot_canon(s: str) -> str:
     m = re.match(r"\s*(\d{1,2})", (s or ""))
     return m.group(1) if m else (s or "").strip()
 
-# MySQL
+# Database
+import DB_Config_sample
 from DB_Config_sample import DB
+from Repo import make_repo, DB_ERRORS, CircuitOpenError, CircuitBreaker, HttpRepo
+from Metrics import QUERY_STATS
+from Watchdog import StallMonitor
+from Offline import OfflineRepo
+from Push import DeltaSubscriber
+from Occupancy import DayOccupancy, section_of
+from FindFree import FindFreeDialog
+from Timeline import TimelineDialog
+from Heatmap import HeatmapDialog
+from MyBookings import MyBookingsDialog
+from ConnectLog import ConnectLog
+
+log = logging.getLogger("RemoteVNCBooking")
 
 def fmt_mysql_error(e):
+    if isinstance(e, CircuitOpenError):
+        return f"Database is unreachable, retrying in {e.retry_in:.0f} s。"
     code = e.args[0] if getattr(e, "args", None) else None
     host = DB.get("host", "?"); port = DB.get("port", 3306)
     db   = DB.get("database", "")
@@ -74,67 +93,17 @@ def fmt_mysql_error(e):
         return f"Repository not found：{db}。"
     return f"Database error [{code}]"
 
-class Repo:
-    def __init__(self):
-        self._db = DB
-
-    def conn(self):
-        return pymysql.connect(cursorclass=DictCursor, autocommit=False, **self._db)
-
-    # machines
-    def list_machines(self) -> List[dict]:
-        sql = """
-            SELECT id, sn, owner, host_name, host_account_password, windows_account, windows_password, note, state,
-                   data_create_at, data_update_at
-            FROM machines
-            ORDER BY sn
-        """
-        with self.conn() as cx, cx.cursor() as cur:
-            cur.execute(sql)
-            return list(cur.fetchall())
-
-    def get_machine_by_sn(self, sn: str) -> Optional[dict]:
-        with self.conn() as cx, cx.cursor() as cur:
-            cur.execute("SELECT * FROM machines WHERE sn=%s", (sn,))
-            return cur.fetchone()
-
-    # bookings
-    def bookings_of(self, machine_id: Optional[int] = None,
-                    date_s: Optional[str] = None) -> List[dict]:
-        where, params = [], []
-        if machine_id is not None:
-            where.append("b.machine_id=%s"); params.append(machine_id)
-        if date_s is not None:
-            where.append("b.date=%s"); params.append(date_s)
-        sql = "SELECT b.* FROM bookings b"
-        if where:
-            sql += " WHERE " + " AND ".join(where)
-        with self.conn() as cx, cx.cursor() as cur:
-            cur.execute(sql, params)
-            return list(cur.fetchall())
-
-    def insert_booking(self, machine_id: int, date_s: str, slot_i: int,
-                       display_name: str, wwid: str) -> bool:
-        sql = """INSERT INTO bookings(machine_id,date,slot,display_name,wwid)
-                 VALUES(%s,%s,%s,%s,%s)"""
-        with self.conn() as cx, cx.cursor() as cur:
+def db_guarded(popup: bool = False):
+    """Controller handlers: turn database errors into the offline banner (and a dialog for user actions)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *a, **kw):
             try:
-                cur.execute(sql, (machine_id, date_s, slot_i, display_name, wwid))
-                cx.commit()
-                return True
-            except pymysql.err.IntegrityError:
-                cx.rollback()
-                return False
-
-    def delete_bookings(self, machine_id: int, date_s: str, slots: List[int]) -> int:
-        if not slots:
-            return 0
-        fmt = ",".join(["%s"] * len(slots))
-        sql = f"DELETE FROM bookings WHERE machine_id=%s AND date=%s AND slot IN ({fmt})"
-        with self.conn() as cx, cx.cursor() as cur:
-            cur.execute(sql, [machine_id, date_s, *slots])
-            cx.commit()
-            return cur.rowcount
+                return fn(self, *a, **kw)
+            except DB_ERRORS as e:
+                self._on_db_error(e, popup)
+        return wrapper
+    return deco
 
 # MachineButton LED
 class MachineButton(QPushButton):
@@ -159,6 +128,52 @@ class MachineButton(QPushButton):
     def set_led_blue(self):
         self._set_led(LED_BLUE)
 
+# Slot range selection
+class SlotDragFilter(QObject):
+    """Mouse handling for the Time_n buttons: click toggles, drag paints a range, shift-click
+    extends from the last clicked hour, dragging onto AM/PM flips the page mid-drag.
+    Selection changes are local; nothing here reads the database."""
+
+    def __init__(self, ctl: "Controller"):
+        super().__init__(ctl.ui)
+        self.ctl = ctl
+        self.anchor: Optional[int] = None
+        self._base: Optional[Set[int]] = None       # selection when the drag started
+        self._adding = True
+        self._flip_armed = True
+
+    def eventFilter(self, obj, ev):
+        t = ev.type()
+        if t in (QEvent.MouseButtonPress, QEvent.MouseButtonDblClick) and ev.button() == Qt.LeftButton:
+            h = self.ctl.hour_of(obj)
+            if h is None:
+                return False
+            if ev.modifiers() & Qt.ShiftModifier and self.anchor is not None:
+                self.ctl.select_range(self.anchor, h, True, set(self.ctl.selected))
+                self._base = None
+            else:
+                self.anchor = h
+                self._base = set(self.ctl.selected)
+                self._adding = h not in self._base
+                self.ctl.select_range(h, h, self._adding, self._base)
+            return True
+        if t == QEvent.MouseMove and self._base is not None and ev.buttons() & Qt.LeftButton:
+            w = QApplication.widgetAt(ev.globalPosition().toPoint())
+            if w is not None and w is self.ctl.btn_ampm:
+                if self._flip_armed:
+                    self._flip_armed = False
+                    self.ctl.toggle_am_pm()
+                return True
+            h = self.ctl.hour_of(w)
+            if h is not None:
+                self._flip_armed = True
+                self.ctl.select_range(self.anchor, h, self._adding, self._base)
+            return True
+        if t == QEvent.MouseButtonRelease and ev.button() == Qt.LeftButton:
+            self._base = None; self._flip_armed = True
+            return True
+        return False
+
 class Controller:
     def _as_url(self, v: str) -> str:
         s = (v or "").strip()
@@ -172,7 +187,10 @@ class Controller:
         self.ui = ui
         self.display_name = display_name or ""
         self.wwid = wwid or ""
-        self.repo = Repo()
+        self.repo = make_repo()
+        ocfg = getattr(DB_Config_sample, "OFFLINE", {})
+        if ocfg.get("enabled", True):
+            self.repo = OfflineRepo(self.repo, ocfg.get("journal") or None)
 
         self.listw = ui.findChild(QListWidget, "listWidget")
         self.date_edit = ui.findChild(QDateEdit, "DateEdit")
@@ -195,8 +213,20 @@ class Controller:
 
         self.current_machine: Optional[str] = None     
         self.sn_to_id: Dict[str, int] = {}           
+        self.machines: List[dict] = []
+        self._inv_fp: Optional[str] = None         # machines_fingerprint() the grid was built from
+        self._details: Dict[str, dict] = {}         # get_machine_by_sn() rows, dropped when _inv_fp moves
+        self._details_shown: Optional[tuple] = None # (sn, row, current user) in the details panel
+        self._viewer_found = False                  # RealVNC Viewer located once; a miss is probed again
+        self._find_dlg: Optional[FindFreeDialog] = None
+        self._timeline_dlg: Optional[TimelineDialog] = None
+        self._heatmap_dlg: Optional[HeatmapDialog] = None
+        self._mine_dlg: Optional[MyBookingsDialog] = None
+        self.today_occ = DayOccupancy("")
         self.machine_btns: Dict[str, MachineButton] = {}
         self.selected: Set[int] = set()             
+        self._slot_cache: Optional[Tuple[Tuple[str, str], List[dict]]] = None
+        self.multi: Set[str] = set()                # Ctrl+clicked machines booked together with current_machine
 
         today = tz_today()
         if self.date_edit:
@@ -226,22 +256,118 @@ class Controller:
             self.section_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
             self.section_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
 
+        # Connect events, written in the background
+        ccfg = getattr(DB_Config_sample, "CONNECT_LOG", {})
+        self.connlog = ConnectLog(self.repo, float(ccfg.get("flush_s", 5.0)), int(ccfg.get("batch", 200)),
+                                  int(ccfg.get("max_buffer", 10000)), ccfg.get("spool") or None)
+        self.connlog.start()
+
+        # Offline banner (circuit breaker state)
+        self._init_offline_banner()
+
         # Periodic refresh
         self._timer = QTimer(self.ui)
         self._timer.setInterval(5000)
         self._timer.timeout.connect(self._tick)
         self._timer.start()
 
+        # Machine list changes (fingerprint only; the list is re-read when it moves)
+        self._inv_timer = QTimer(self.ui)
+        self._inv_timer.setInterval(int(float(getattr(DB_Config_sample, "INVENTORY", {}).get("check_s", 60)) * 1000))
+        self._inv_timer.timeout.connect(self.check_inventory)
+        self._inv_timer.start()
+
+        # Query metrics
+        mcfg = getattr(DB_Config_sample, "METRICS", {})
+        self._metrics_csv = mcfg.get("csv") or None
+        if mcfg.get("log_ticks"): QUERY_STATS.tick_level = logging.INFO
+        self._metrics_timer = QTimer(self.ui)
+        self._metrics_timer.timeout.connect(self.dump_metrics)
+        if mcfg.get("dump_interval_s"):
+            self._metrics_timer.start(int(mcfg["dump_interval_s"] * 1000))
+        QShortcut(QKeySequence("Ctrl+Shift+M"), self.ui, activated=self.dump_metrics)
+        QShortcut(QKeySequence("Ctrl+F"), self.ui, activated=self.open_find_free)
+        QShortcut(QKeySequence("Ctrl+T"), self.ui, activated=self.open_timeline)
+        QShortcut(QKeySequence("Ctrl+H"), self.ui, activated=self.open_heatmap)
+        QShortcut(QKeySequence("Ctrl+B"), self.ui, activated=self.open_my_bookings)
+        app = QApplication.instance()
+        if app: app.aboutToQuit.connect(self.connlog.close)
+        if app: app.aboutToQuit.connect(self.dump_metrics)
+
+        # Push deltas from the booking service; polling stays as the fallback
+        scfg = getattr(DB_Config_sample, "SERVICE", {})
+        self._poll_ms = self._timer.interval()
+        self._fallback_poll_ms = int(scfg.get("fallback_poll_s", 60) * 1000)
+        self.push: Optional[DeltaSubscriber] = None
+        if isinstance(getattr(self.repo, "inner", self.repo), HttpRepo) and scfg.get("push", True):
+            self.push = DeltaSubscriber(scfg.get("url", "http://127.0.0.1:8765"), self.ui, token=scfg.get("token", ""))
+            self.push.deltas.connect(self.on_deltas)
+            self.push.live.connect(self.on_push_live)
+            self.push.start()
+            if app: app.aboutToQuit.connect(self.push.stop)
+
+        # Event-loop stall monitor
+        wcfg = getattr(DB_Config_sample, "WATCHDOG", {})
+        self.watchdog: Optional[StallMonitor] = None
+        if wcfg.get("enabled", True):
+            self.watchdog = StallMonitor(self.ui, interval_ms=int(wcfg.get("interval_ms", 20)),
+                                         threshold_ms=int(wcfg.get("threshold_ms", 250)))
+            self.watchdog.start()
+
+        # Timeline tracing (opt-in)
+        tcfg = getattr(DB_Config_sample, "TRACE", {})
+        if tcfg.get("path") or os.environ.get("RVB_TRACE"):
+            TRACER.start(os.environ.get("RVB_TRACE") or tcfg.get("path"))
+            QShortcut(QKeySequence("Ctrl+Shift+T"), self.ui, activated=TRACER.save)
+            if app: app.aboutToQuit.connect(TRACER.save)
+
         self.refresh_slot_colors()
         self.refresh_machine_colors()
         self.refresh_machine_leds()
         self.update_action_buttons()
         self.update_date_nav_state()
+        self._maybe_replay()
+
+    def _init_offline_banner(self):
+        self.offline_banner = QLabel(self.ui)
+        self.offline_banner.setAlignment(Qt.AlignCenter)
+        self.offline_banner.setStyleSheet(f"QLabel {{background:{RED}; color:{FG}; font-weight:600; padding:4px;}}")
+        self.offline_banner.hide()
+        self._banner_timer = QTimer(self.ui)
+        self._banner_timer.setInterval(1000)
+        self._banner_timer.timeout.connect(self._update_offline_banner)
+
+    def _update_offline_banner(self):
+        br = self.repo.breaker
+        offline = br.state != CircuitBreaker.CLOSED or self._offline()
+        if not offline:
+            self.offline_banner.hide(); self._banner_timer.stop()
+            return
+        if br.state == CircuitBreaker.OPEN:
+            txt = f"Database offline — retrying in {br.retry_in():.0f} s"
+        else:
+            txt = "Database offline — reconnecting…"
+        if isinstance(self.repo, OfflineRepo):
+            n = len(self.repo.pending())
+            txt += " · showing last snapshot" + (f" · {n} change(s) queued" if n else "")
+        self.offline_banner.setText(txt)
+        self.offline_banner.setGeometry(0, 0, self.ui.width(), 28)
+        self.offline_banner.raise_(); self.offline_banner.show()
+        if not self._banner_timer.isActive(): self._banner_timer.start()
+
+    def _on_db_error(self, e: Exception, popup: bool = False):
+        if not isinstance(e, CircuitOpenError):
+            log.warning("database error: %s", e)
+        self._update_offline_banner()
+        if popup:
+            QMessageBox.warning(self.ui, "Database error", fmt_mysql_error(e))
 
     def _init_time_buttons(self):
         self.btn_ampm: Optional[QAbstractButton] = self.ui.findChild(QAbstractButton, "DataButton_Pm")
         self.is_pm: bool = False
         self.time_btns: List[Tuple[int, QAbstractButton]] = []
+        self._btn_base: Dict[QAbstractButton, int] = {}
+        self._drag = SlotDragFilter(self)
 
         for i in range(1, 13):
             b = self.ui.findChild(QAbstractButton, f"Time_{i}")
@@ -250,7 +376,9 @@ class Controller:
             base = i - 1
             b.setCheckable(True)
             b.toggled.connect(lambda checked, base=base: self.on_base_slot_toggled(base, checked))
+            b.installEventFilter(self._drag)
             self.time_btns.append((base, b))
+            self._btn_base[b] = base
 
         if self.btn_ampm:
             self.btn_ampm.setText("AM")
@@ -269,10 +397,11 @@ class Controller:
             btn.setText(str(base + off))
 
     @Slot()
+    @db_guarded()
     def toggle_am_pm(self):
         self.is_pm = not self.is_pm
         self.relabel_time_buttons()
-        self.refresh_slot_colors()
+        self._paint_slots()
         self.update_action_buttons()
 
     def _apply_code_fonts(self):
@@ -288,51 +417,109 @@ class Controller:
             btn.setFont(f_btn)
         for btn in self.machine_btns.values(): btn.setFont(f_btn)
 
+    def dump_metrics(self):
+        QUERY_STATS.dump(self._metrics_csv)
+        if self.watchdog: self.watchdog.log_summary()
+
+    @Slot(bool)
+    def on_push_live(self, live: bool):
+        log.info("push stream %s", "up" if live else "down, polling every %d s" % (self._poll_ms // 1000))
+        if isinstance(self.repo, OfflineRepo):
+            self.repo.live = live
+            self.repo.invalidate()
+        self._timer.setInterval(self._fallback_poll_ms if live else self._poll_ms)
+        self._tick()
+
+    @Slot(list)
+    @db_guarded()
+    def on_deltas(self, deltas: list):
+        with TRACER.span("deltas", "cycle", n=len(deltas)), QUERY_STATS.tick("deltas"):
+            if isinstance(self.repo, OfflineRepo):
+                self.repo.apply_deltas(deltas)
+            for dlg in (self._find_dlg, self._timeline_dlg, self._mine_dlg):
+                if dlg: dlg.apply_deltas(deltas)
+            mid = self.sn_to_id.get(self.current_machine) if self.current_machine else None
+            shown = ymd(self.date_edit.date()) if self.date_edit else None
+            today, hour = ymd(tz_today()), tz_hour()
+            if any(d["m"] == mid and d["d"] == shown for d in deltas):
+                self.refresh_slot_colors()
+                self.update_action_buttons()
+            if any(d["d"] == today for d in deltas):
+                self.refresh_machine_leds()
+            if any(d["d"] == today and d["s"] == hour for d in deltas):
+                if self.current_machine:
+                    self.show_machine_details(self.current_machine)
+
+    @db_guarded()
     def _tick(self):
-        self.refresh_slot_colors()
-        self.refresh_machine_leds()
-        if self.current_machine:
-            self.show_machine_details(self.current_machine)
-        self.update_action_buttons()
-
+        if isinstance(self.repo, OfflineRepo) and self.repo.live:
+            self.repo.invalidate()          # fallback poll: re-read everything once
+        with TRACER.span("_tick", "cycle"), QUERY_STATS.tick("_tick"):
+            self.refresh_slot_colors()
+            self.refresh_machine_leds()
+            if self.current_machine:
+                self.show_machine_details(self.current_machine)
+            self.update_action_buttons()
+            if self._mine_dlg: self._mine_dlg.poll()
+        self._update_offline_banner()
+        self._maybe_replay()
+
+    @db_guarded(popup=True)
     def on_connect_clicked(self):
         if not self.current_machine:
             QMessageBox.warning(self.ui, "Connect", "Please select the machine first"); return
+        sn, t0 = self.current_machine, time.perf_counter()
 
-        rec = self._current_booking_record_now(self.current_machine)
-        if rec:
-            booked_name = (rec.get("display_name") or "").strip()
-            booked_wwid = (rec.get("wwid") or "").strip()
-            my_wwid     = (self.wwid or "").strip()
-            if booked_wwid and booked_wwid != my_wwid:
-                tip = (
-                    f"This period is for {booked_name} reserved。\n"
-                    f"Please contact {booked_name}, or enter the {booked_name} WWID。"
-                )
-                ww, ok = QInputDialog.getText(self.ui, "Already booked", tip)
-                if not ok:
-                    return
-                if ww.strip() != booked_wwid:
-                    QMessageBox.warning(self.ui, "Connection Rejected", "WWID does not match, Unable to connect。")
-                    return
+        # machine + booking of this hour in one query
+        row = self.repo.connect_info(sn, ymd(tz_today()), tz_hour())
+        if not row:
+            self._log_connect(sn, "not_found", t0)
+            QMessageBox.warning(self.ui, "Connect", "Database cannot find the machine"); return
+
+        booked_name = (row.get("booked_name") or "").strip()
+        booked_wwid = (row.get("booked_wwid") or "").strip()
+        my_wwid     = (self.wwid or "").strip()
+        if booked_wwid and booked_wwid != my_wwid:
+            tip = (
+                f"This period is for {booked_name} reserved。\n"
+                f"Please contact {booked_name}, or enter the {booked_name} WWID。"
+            )
+            ww, ok = QInputDialog.getText(self.ui, "Already booked", tip)
+            if not ok:
+                self._log_connect(sn, "cancelled", t0); return
+            if ww.strip() != booked_wwid:
+                self._log_connect(sn, "rejected", t0)
+                QMessageBox.warning(self.ui, "Connection Rejected", "WWID does not match, Unable to connect。")
+                return
 
         if not self._has_vnc_viewer():
+            self._log_connect(sn, "no_viewer", t0)
             QMessageBox.warning(self.ui, "RealVNC not installed", "Not found RealVNC Viewer，Please install first and then connect。")
             return
 
-        row = self.repo.get_machine_by_sn(self.current_machine)
-        if not row:
-            QMessageBox.warning(self.ui, "Connect", "Database cannot find the machine"); return
-
         host = (row.get("host_name") or "").strip()
         user = (row.get("windows_account") or "").strip()
         pwd  = (row.get("32-bit_password") or row.get("windows_password") or "").strip()
         if not host:
+            self._log_connect(sn, "no_host", t0)
             QMessageBox.warning(self.ui, "Connect", "host_name 為空"); return
         try:
-            self._launch_vnc_with(host, user, pwd, self.current_machine)
+            self._launch_vnc_with(host, user, pwd, sn)
         except Exception as e:
+            self._log_connect(sn, "error", t0)
             QMessageBox.critical(self.ui, "Connect 失敗", str(e))
+            return
+        self._log_connect(sn, "launched", t0)
+
+    def _log_connect(self, sn: str, outcome: str, t0: float):
+        """Buffered; written in batches by ConnectLog's thread (the sweeper reads "launched")."""
+        mid = self.sn_to_id.get(sn)
+        if mid is None:                     # connections.machine_id is NOT NULL; not a loggable machine
+            log.debug("connect %s on unknown machine %s not logged", outcome, sn)
+            return
+        self.connlog.record({"machine_id": mid, "sn": sn, "wwid": self.wwid,
+                             "at": tz_now().toString("yyyy-MM-dd HH:mm:ss"), "outcome": outcome,
+                             "latency_ms": int((time.perf_counter() - t0) * 1000)})
 
     def _launch_vnc_with(self, host: str, user: str, pwd: str, sn: str):
         tpl = Path(resource_path("VNC/MyHost.vnc"))
@@ -352,31 +539,19 @@ class Controller:
         tmp.write_text(txt, encoding="utf-8")
         os.startfile(str(tmp))
 
-    def _current_booking_record_now(self, sn: str):
-        """回傳『今天此小時檔期』的預約資料 dict；找不到回 None。"""
-        mid = self.sn_to_id.get(sn)
-        if mid is None:
-            return None
-        date_s = tz_today().toString("yyyy-MM-dd")
-        hour  = tz_time().hour()
-        rows = self.repo.bookings_of(machine_id=mid, date_s=date_s)
-        for r in rows:
-            try:
-                if int(r.get("slot", -1)) == int(hour):
-                    return r
-            except Exception:
-                pass
-        return None
-
     def _has_vnc_viewer(self) -> bool:
-        """是否可找到 RealVNC Viewer 執行檔。"""
+        """是否可找到 RealVNC Viewer 執行檔。找到後不再掃描 PATH / Program Files。"""
+        if self._viewer_found:
+            return True
         if shutil.which("vncviewer") or shutil.which("vncviewer.exe"):
+            self._viewer_found = True
             return True
         candidates = [
             Path(os.environ.get("ProgramFiles", "")) / "RealVNC" / "VNC Viewer" / "vncviewer.exe",
             Path(os.environ.get("ProgramFiles(x86)", "")) / "RealVNC" / "VNC Viewer" / "vncviewer.exe",
         ]
-        return any(p.exists() for p in candidates)
+        self._viewer_found = any(p.exists() for p in candidates)
+        return self._viewer_found
 
     def shift_date(self, days: int):
         if not self.date_edit: return
@@ -392,17 +567,19 @@ class Controller:
         if self.btn_prev: self.btn_prev.setEnabled(cur > self.date_edit.minimumDate())
         if self.btn_next: self.btn_next.setEnabled(cur < self.date_edit.maximumDate())
 
-    def _fetch_machines(self):
+    def _fetch_machines(self, fp: Optional[str] = None):
+        # fingerprint first: a change racing the list read shows up at the next check
+        self._inv_fp = fp if fp is not None else self.repo.machines_fingerprint()
         rows = self.repo.list_machines()
         self.sn_to_id = {r["sn"]: r["id"] for r in rows}
+        self.machines = rows
         return rows
 
-    def machines_by_section(self) -> Dict[str, List[str]]:
+    def machines_by_section(self, rows: Optional[List[dict]] = None) -> Dict[str, List[str]]:
         groups: Dict[str, List[str]] = {}
-        for r in self._fetch_machines():
+        for r in (self._fetch_machines() if rows is None else rows):
             sn = (r["sn"] or "").strip()
-            sec = sn.split("_", 1)[0] if "_" in sn else "OTHER"
-            groups.setdefault(sec, []).append(sn)
+            groups.setdefault(section_of(sn), []).append(sn)
         for k in list(groups.keys()):
             groups[k] = sorted(set(groups[k]))
         return groups
@@ -435,14 +612,34 @@ class Controller:
             grid.addWidget(btn, r, c)
         return block
 
-    def build_section_ui(self):
+    def build_section_ui(self, groups: Optional[Dict[str, List[str]]] = None):
         self.machine_btns.clear()
         if not self.section_area: return
         self.section_area.setWidgetResizable(True)
         content = QWidget()
         lay = QVBoxLayout(content); lay.setContentsMargins(2,2,2,2); lay.setSpacing(6)
 
-        groups = self.machines_by_section()
+        btn_find = QPushButton("Find free machine…")
+        btn_find.setToolTip("Ctrl+F")
+        paint(btn_find, GREEN)
+        btn_find.clicked.connect(self.open_find_free)
+        btn_timeline = QPushButton("Timeline…")
+        btn_timeline.setToolTip("Ctrl+T")
+        paint(btn_timeline, BLUE)
+        btn_timeline.clicked.connect(self.open_timeline)
+        btn_heatmap = QPushButton("Fleet…")
+        btn_heatmap.setToolTip("Ctrl+H")
+        paint(btn_heatmap, BLUE)
+        btn_heatmap.clicked.connect(self.open_heatmap)
+        btn_mine = QPushButton("My bookings…")
+        btn_mine.setToolTip("Ctrl+B")
+        paint(btn_mine, BLUE)
+        btn_mine.clicked.connect(self.open_my_bookings)
+        tools = QHBoxLayout(); tools.setSpacing(6)
+        tools.addWidget(btn_find); tools.addWidget(btn_timeline); tools.addWidget(btn_heatmap); tools.addWidget(btn_mine)
+        lay.addLayout(tools)
+
+        groups = self.machines_by_section() if groups is None else groups
         for sec in sorted(groups.keys()):
             lay.addWidget(self._make_section_block(sec, groups[sec], cols=3))
         lay.addStretch(1)
@@ -452,10 +649,56 @@ class Controller:
         self.refresh_machine_colors()
         self.refresh_machine_leds()
 
+    @Slot()
+    @db_guarded()
+    def check_inventory(self):
+        """One fingerprint read per INVENTORY["check_s"]; the machine list is re-read only when
+        it moved, and the grid rebuilt only when machines were added or retired."""
+        fp = self.repo.machines_fingerprint()
+        if fp == self._inv_fp:
+            return
+        self._details.clear()
+        with TRACER.span("inventory", "cycle"), QUERY_STATS.tick("inventory"):
+            groups = self.machines_by_section(self._fetch_machines(fp))
+            sns = {sn for g in groups.values() for sn in g}
+            if sns != set(self.machine_btns):
+                log.info("machine list changed: %d added, %d gone", len(sns - set(self.machine_btns)),
+                         len(set(self.machine_btns) - sns))
+                self._rebuild_grid(groups, sns)
+            elif self.current_machine:
+                self.show_machine_details(self.current_machine)
+
+    def _rebuild_grid(self, groups: Dict[str, List[str]], sns: Set[str]):
+        bar = self.section_area.verticalScrollBar() if self.section_area else None
+        pos = bar.value() if bar else 0
+        self.multi &= sns
+        if self.current_machine not in sns:
+            self.current_machine = None
+            self.selected.clear()
+            self._clear_details()
+        self.build_section_ui(groups)
+        if bar: bar.setValue(pos)
+        self.refresh_slot_colors()
+        self.update_action_buttons()
+
+    def _clear_details(self):
+        if self.listw: self.listw.clear()
+        self._details_shown = None
+
+    @traced(cat="qt")
     def show_machine_details(self, sn: str):
+        """The machine row is read once and kept until the inventory fingerprint moves; the
+        current user comes from today_occ. The panel is rebuilt only when either changed."""
         if not self.listw: return
+        row = self._details.get(sn)
+        if row is None:
+            row = self.repo.get_machine_by_sn(sn)
+            if row: self._details[sn] = row
+        info = self._current_booker_now(sn)
+        if self._details_shown == (sn, row, info):
+            return
+        self._details_shown = (sn, row, info)
         self.listw.clear()
-        row = self.repo.get_machine_by_sn(sn)
         if not row:
             self.listw.addItem(sn + " : not found")
             return
@@ -471,7 +714,6 @@ class Controller:
         add("ipkvm", str(row.get("ipkvm")))
         add("account/password", str(row.get("account/password")))
         add("data_update_at", str(row.get("data_update_at")))
-        info = self._current_booker_now(sn)
         if info:
             name, wwid = info
             self._add_kv_item("Current User", name, value_color=RED)
@@ -503,11 +745,26 @@ class Controller:
         item.setSizeHint(row.sizeHint()); self.listw.addItem(item); self.listw.setItemWidget(item, row)
 
     @Slot()
+    @db_guarded()
     def on_machine_clicked(self, sn: str):
+        with TRACER.span("machine_click", "cycle", sn=sn), QUERY_STATS.tick("machine_click"):
+            if QApplication.keyboardModifiers() & Qt.ControlModifier and self.current_machine:
+                self._toggle_multi(sn)
+            else:
+                self._select_machine(sn)
+
+    def _toggle_multi(self, sn: str):
+        if sn != self.current_machine:
+            self.multi.symmetric_difference_update({sn})
+        self.refresh_machine_colors()
+        self.update_action_buttons()
+
+    def _select_machine(self, sn: str):
+        self.multi.clear()
         if self.current_machine == sn:
             self.current_machine = None
             self.selected.clear()
-            if self.listw: self.listw.clear()
+            self._clear_details()
         else:
             self.current_machine = sn
             self.selected.clear()
@@ -522,13 +779,19 @@ class Controller:
         self.update_action_buttons()
 
     @Slot()
+    @db_guarded()
     def on_date_changed(self, _):
+        with TRACER.span("date_change", "cycle"), QUERY_STATS.tick("date_change"):
+            self._date_changed()
+
+    def _date_changed(self):
         self.selected.clear()
         self.refresh_slot_colors()
         self.update_action_buttons()
         self.update_date_nav_state()
 
     @Slot()
+    @db_guarded()
     def on_base_slot_toggled(self, base_i: int, checked: bool):
         if not self.current_machine or not self.date_edit:
             for b_base, b in self.time_btns:
@@ -539,10 +802,30 @@ class Controller:
         hour_i = base_i + self._offset()
         if checked: self.selected.add(hour_i)
         else:       self.selected.discard(hour_i)
-        self.refresh_slot_colors()
+        self._paint_slots()
+        self.update_action_buttons()
+
+    def hour_of(self, w) -> Optional[int]:
+        base = self._btn_base.get(w)
+        if base is None or not w.isEnabled():
+            return None
+        return base + self._offset()
+
+    def _slot_past(self, hour: int) -> bool:
+        return bool(self.date_edit) and self.date_edit.date() == tz_today() and tz_time() >= QTime(min(23, hour + 1), 0)
+
+    @db_guarded()
+    def select_range(self, a: int, b: int, add: bool, base: Set[int]):
+        """Selection = base with hours a..b added (or removed); may span AM and PM."""
+        if not self.current_machine or not self.date_edit:
+            return
+        hours = {h for h in range(min(a, b), max(a, b) + 1) if not self._slot_past(h)}
+        self.selected = (base | hours) if add else (base - hours)
+        self._paint_slots()
         self.update_action_buttons()
 
     @Slot()
+    @db_guarded(popup=True)
     def on_booking_clicked(self):
         if not (self.current_machine and self.date_edit and self.selected):
             return
@@ -551,22 +834,111 @@ class Controller:
         if mid is None:
             QMessageBox.warning(self.ui, "Error", "Machine number not found")
             return
-        committed = []
-        for slot_i in sorted(self.selected):
-            ok = self.repo.insert_booking(mid, date_s, int(slot_i), self.display_name, self.wwid)
-            if ok: committed.append(slot_i)
-        if committed:
-            slots = ", ".join(str(s) for s in committed)
+        slots = sorted(int(s) for s in self.selected)
+        if self.multi:
+            return self._book_multi(date_s, slots)
+        ops = [{"op": "book", "machine_id": mid, "date": date_s, "slot": s,
+                "display_name": self.display_name, "wwid": self.wwid} for s in slots]
+        lost = []
+        try:
+            res = self.repo.apply_ops(ops)           # the whole range in one transaction
+        except DB_ERRORS as e:
+            if not self._queue_offline("book", mid, date_s, slots, e):
+                raise
+            committed = slots
+        else:
+            committed = [int(r["slot"]) for r in res if r["result"] == "won"]
+            lost = [f"{r['slot']} ({r['holder']})" if r["holder"] else str(r["slot"]) for r in res if r["result"] != "won"]
+        if committed and not self._offline():
+            text = ", ".join(str(s) for s in committed)
             QMessageBox.information(
                 self.ui, "Booking Successful",
-                f"Time zone use : GMT+8\nMachine： {self.current_machine}\nDate： {date_s}\nTime： {slots}"
+                f"Time zone use : GMT+8\nMachine： {self.current_machine}\nDate： {date_s}\nTime： {text}"
+                + (f"\nAlready booked： {', '.join(lost)}" if lost else "")
             )
+        elif lost:
+            QMessageBox.warning(self.ui, "Booking", f"Already booked： {', '.join(lost)}")
         self.selected.difference_update(committed)
         self.refresh_slot_colors()
         self.refresh_machine_leds()
         self.update_action_buttons()
 
+    def _book_multi(self, date_s: str, slots: List[int]):
+        """Same hours on current_machine + self.multi in one transaction."""
+        sns = [self.current_machine] + sorted(self.multi)
+        hours = ", ".join(str(s) for s in slots)
+        box = QMessageBox(QMessageBox.Question, "Book several machines",
+                          f"Date： {date_s}\nTime： {hours}\nMachines： {', '.join(sns)}", parent=self.ui)
+        b_all = box.addButton("All or nothing", QMessageBox.AcceptRole)
+        b_free = box.addButton("Book what is free", QMessageBox.AcceptRole)
+        box.addButton(QMessageBox.Cancel)
+        if self._offline():                 # replay is not all-or-nothing
+            b_all.setEnabled(False)
+            box.setInformativeText("Offline: the hours are queued per machine。")
+        box.exec()
+        if box.clickedButton() not in (b_all, b_free):
+            return
+        atomic = box.clickedButton() is b_all
+        ops = [{"op": "book", "machine_id": self.sn_to_id[sn], "date": date_s, "slot": s, "sn": sn,
+                "display_name": self.display_name, "wwid": self.wwid} for sn in sns if sn in self.sn_to_id for s in slots]
+        try:
+            res = self.repo.apply_ops(ops, atomic)
+        except DB_ERRORS as e:
+            if not (isinstance(self.repo, OfflineRepo) and self.repo.is_outage(e)):
+                raise
+            return self._queue_multi_offline(sns, date_s, slots, atomic)
+        per: Dict[str, Tuple[List[str], List[str]]] = {sn: ([], []) for sn in sns}
+        for r in res:
+            won, lost = per[r["sn"]]
+            if r["result"] == "won": won.append(str(r["slot"]))
+            elif r["result"] == "lost": lost.append(f"{r['slot']} ({r['holder'] or '?'})")
+        lines = []
+        for sn in sns:
+            won, lost = per[sn]
+            line = f"{sn}： " + (f"booked {', '.join(won)}" if won else "nothing booked")
+            if lost: line += f" — taken {', '.join(lost)}"
+            lines.append(line)
+        n_lost = sum(1 for r in res if r["result"] == "lost")
+        if atomic and n_lost:
+            title, head = "Booking aborted", "Nothing was booked (all or nothing)："
+        elif n_lost:
+            title, head = "Booking partly done", "Free slots were booked："
+        else:
+            title, head = "Booking Successful", f"Time zone use : GMT+8\nDate： {date_s}\nTime： {hours}"
+        QMessageBox.information(self.ui, title, head + "\n" + "\n".join(lines))
+        if not n_lost or not atomic:
+            self.selected.clear()
+        self.refresh_slot_colors()
+        self.refresh_machine_leds()
+        self.update_action_buttons()
+
+    def _queue_multi_offline(self, sns: List[str], date_s: str, slots: List[int], atomic: bool):
+        """_book_multi() hit an outage: journal each machine's hours, or book nothing if all-or-nothing."""
+        self.repo.offline = True
+        self._update_offline_banner()
+        if atomic:
+            QMessageBox.warning(
+                self.ui, "Booking not done (offline)",
+                "Database is unreachable。Nothing was booked: all or nothing needs the database。\n"
+                "Book what is free to queue the hours for each machine。"
+            )
+            return
+        queued = [sn for sn in sns if sn in self.sn_to_id]
+        for sn in queued:
+            self.repo.queue_booking(self.sn_to_id[sn], sn, date_s, slots, self.display_name, self.wwid)
+        QMessageBox.information(
+            self.ui, "Booking queued (offline)",
+            f"Database is unreachable。\nMachines： {', '.join(queued)}\nDate： {date_s}\n"
+            f"Time： {', '.join(str(s) for s in slots)}\n"
+            "The request is saved locally and will be submitted when the connection returns。"
+        )
+        self.selected.clear()
+        self.refresh_slot_colors()
+        self.refresh_machine_leds()
+        self.update_action_buttons()
+
     @Slot()
+    @db_guarded(popup=True)
     def on_delete_clicked(self):
         if not (self.current_machine and self.date_edit and self.selected):
             return
@@ -574,7 +946,14 @@ class Controller:
         mid = self.sn_to_id.get(self.current_machine)
         if mid is None:
             return
-        n = self.repo.delete_bookings(mid, date_s, sorted(int(x) for x in self.selected))
+        slots = sorted(int(x) for x in self.selected)
+        try:
+            n = self.repo.delete_bookings(mid, date_s, slots)
+        except DB_ERRORS as e:
+            if not self._queue_offline("cancel", mid, date_s, slots, e):
+                raise
+            self.selected.clear()
+            n = 0
         if n > 0:
             QMessageBox.information(
                 self.ui, "Cancel Successful",
@@ -585,12 +964,129 @@ class Controller:
         self.refresh_machine_leds()
         self.update_action_buttons()
 
+    def open_find_free(self):
+        if self._find_dlg is None:
+            self._find_dlg = FindFreeDialog(self.repo, lambda: self.machines, tz_today, tz_hour, self.ui)
+            self._find_dlg.book_requested.connect(self.book_from_search)
+        date = self.date_edit.date() if self.date_edit else tz_today()
+        sec = section_of(self.current_machine) if self.current_machine else None
+        self._find_dlg.open_for(date, sec)
+
+    def open_timeline(self):
+        if self._timeline_dlg is None:
+            self._timeline_dlg = TimelineDialog(self.repo, lambda: self.machines, tz_today, tz_hour, self.wwid, self.ui)
+            self._timeline_dlg.cell_activated.connect(self.jump_to)
+        self._timeline_dlg.open_for(self.current_machine)
+
+    @db_guarded()
+    def open_heatmap(self):
+        if self._heatmap_dlg is None:
+            self._heatmap_dlg = HeatmapDialog(self.ui)
+            self._heatmap_dlg.cell_activated.connect(self.jump_to)
+        self._heatmap_dlg.show(); self._heatmap_dlg.raise_()
+        self.refresh_machine_leds()
+
+    def open_my_bookings(self):
+        if self._mine_dlg is None:
+            self._mine_dlg = MyBookingsDialog(self.repo, lambda: self.machines, tz_today, tz_hour,
+                                              self.wwid, self.display_name, self.ui)
+            self._mine_dlg.jump_requested.connect(self.jump_to)
+            self._mine_dlg.changed.connect(self.on_bookings_changed)
+        self._mine_dlg.open_for()
+
+    @Slot()
+    @db_guarded()
+    def on_bookings_changed(self):
+        self.refresh_slot_colors()
+        self.refresh_machine_leds()
+        self.update_action_buttons()
+
+    @Slot(str, QDate, int)
+    @db_guarded()
+    def jump_to(self, sn: str, date: QDate, hour: int):
+        """Show `sn` on `date` in the slot grid, on the AM/PM page holding `hour`."""
+        if sn not in self.machine_btns:
+            return
+        if self.date_edit and self.date_edit.date() != date:
+            self.date_edit.setDate(date)
+        if self.current_machine != sn:
+            self._select_machine(sn)
+        elif self.multi:                            # a jump shows one machine; don't book the old Ctrl+click set
+            self.multi.clear()
+            self.refresh_machine_colors()
+        self.is_pm = hour >= 12
+        self.relabel_time_buttons()
+        self.refresh_slot_colors()
+        self.update_action_buttons()
+
+    @Slot(str, QDate, list)
+    @db_guarded(popup=True)
+    def book_from_search(self, sn: str, date: QDate, hours: list):
+        """Show the hit in the main window with its free hours selected, then book them."""
+        if not hours or sn not in self.machine_btns:
+            return
+        self.jump_to(sn, date, min(hours))
+        self.selected = set(int(h) for h in hours)
+        self.refresh_slot_colors()
+        self.update_action_buttons()
+        self.on_booking_clicked()
+
+    def _offline(self) -> bool:
+        return isinstance(self.repo, OfflineRepo) and self.repo.offline
+
+    def _queue_offline(self, op: str, mid: int, date_s: str, slots: List[int], e: Exception) -> bool:
+        """Journal a booking/cancel the database could not take; False if offline mode can't help."""
+        if not (isinstance(self.repo, OfflineRepo) and self.repo.is_outage(e) and slots):
+            return False
+        sn = self.current_machine
+        if op == "book":
+            self.repo.queue_booking(mid, sn, date_s, slots, self.display_name, self.wwid)
+        else:
+            expect = {int(r["slot"]): (r.get("wwid") or "") for r in self._booking_rows_for(sn, date_s)}
+            self.repo.queue_cancel(mid, sn, date_s, slots, self.display_name, self.wwid, expect)
+        self.repo.offline = True
+        self._update_offline_banner()
+        what = "Booking" if op == "book" else "Cancel"
+        QMessageBox.information(
+            self.ui, f"{what} queued (offline)",
+            f"Database is unreachable。\nMachine： {sn}\nDate： {date_s}\nTime： {', '.join(str(s) for s in slots)}\n"
+            "The request is saved locally and will be submitted when the connection returns。"
+        )
+        return True
+
+    def _maybe_replay(self):
+        if not isinstance(self.repo, OfflineRepo) or self.repo.offline:
+            return
+        if self.repo.breaker.state != CircuitBreaker.CLOSED or not self.repo.pending():
+            return
+        try:
+            res = self.repo.replay()
+        except DB_ERRORS as e:
+            log.warning("offline replay deferred: %s", e)
+            return
+        lines = []
+        for r in res:
+            what = "Book" if r["op"] == "book" else "Cancel"
+            verdict = "OK" if r["result"] == "won" else f"LOST (held by {r['holder'] or '?'})"
+            lines.append(f"{what} {r['sn']} {r['date']} {r['slot']}:00 — {verdict}")
+        lost = sum(1 for r in res if r["result"] != "won")
+        box = QMessageBox(QMessageBox.Warning if lost else QMessageBox.Information,
+                          "Offline requests submitted",
+                          f"{len(res) - lost} of {len(res)} queued time slots were applied。", parent=self.ui)
+        box.setDetailedText("\n".join(lines))
+        box.show()
+        self.refresh_slot_colors()
+        self.refresh_machine_leds()
+        self.update_action_buttons()
+
     def _current_booker_now(self, sn: str) -> Optional[Tuple[str, str]]:
         mid = self.sn_to_id.get(sn)
         if mid is None:
             return None
         date_s = ymd(tz_today())
         now_h = tz_hour()
+        if self.today_occ.date_s == date_s:         # fleet snapshot of refresh_machine_leds(), no extra read
+            return self.today_occ.who.get((mid, now_h))
         rows = self.repo.bookings_of(machine_id=mid, date_s=date_s)
         for r in rows:
             try:
@@ -600,44 +1096,57 @@ class Controller:
                 pass
         return None
 
+    @traced(cat="qt")
     def refresh_machine_colors(self):
         for sn, btn in self.machine_btns.items():
             if self.current_machine == sn: paint(btn, GREEN)
+            elif sn in self.multi: paint(btn, GREEN, LED_BLUE)
             else: paint(btn, BLUE)
+        if self.btn_booking:
+            self.btn_booking.setToolTip(f"Book on {len(self.multi) + 1} machines" if self.multi else "")
 
+    @traced(cat="qt")
     def refresh_machine_leds(self):
-        date_s = ymd(tz_today())
+        """One date-wide read for the whole fleet; also feeds the heatmap."""
+        today = tz_today()
+        date_s = ymd(today)
         now_slot = tz_hour()
+        self.today_occ = DayOccupancy(date_s, self.repo.bookings_of(machine_id=None, date_s=date_s))
         for sn, btn in self.machine_btns.items():
             mid = self.sn_to_id.get(sn)
-            led_red = False
-            if mid is not None:
-                for r in self.repo.bookings_of(machine_id=mid, date_s=date_s):
-                    try:
-                        if int(r.get("slot", -1)) == now_slot:
-                            led_red = True; break
-                    except Exception:
-                        pass
-            if led_red: btn.set_led_red()
+            if mid is not None and self.today_occ.busy(mid) >> now_slot & 1: btn.set_led_red()
             else: btn.set_led_blue()
+        if self._heatmap_dlg is not None and self._heatmap_dlg.isVisible():
+            self._heatmap_dlg.update_day(self.machines, self.today_occ, today, now_slot, self.wwid)
 
+    @traced(cat="qt")
     def refresh_slot_colors(self):
+        self._slot_cache = None             # re-read; selection-only changes call _paint_slots()
+        self._paint_slots()
+
+    def _slot_rows(self) -> List[dict]:
+        """Bookings of the shown machine/date, read once per refresh_slot_colors()."""
+        key = (self.current_machine, ymd(self.date_edit.date()))
+        if self._slot_cache is None or self._slot_cache[0] != key:
+            self._slot_cache = (key, self._booking_rows_for(*key))
+        return self._slot_cache[1]
+
+    @traced(cat="qt")
+    def _paint_slots(self):
         if not self.time_btns:
             return
         off = self._offset()
-        for _, btn in self.time_btns:
-            btn.blockSignals(True)
-            btn.setEnabled(True)
-            btn.setChecked(False)
-            btn.blockSignals(False)
-            paint(btn, GRAY)
-
         if not self.current_machine or not self.date_edit:
+            for _, btn in self.time_btns:
+                btn.blockSignals(True)
+                btn.setEnabled(True)
+                btn.setChecked(False)
+                btn.blockSignals(False)
+                paint(btn, GRAY)
             self.relabel_time_buttons()
             return
 
-        date_s = ymd(self.date_edit.date())
-        booked_rows = self._booking_rows_for(self.current_machine, date_s)
+        booked_rows = self._slot_rows()
         booked_map = {int(r["slot"]): (r.get("display_name") or "") for r in booked_rows}
 
         is_today = self.date_edit.date() == tz_today()
@@ -648,6 +1157,7 @@ class Controller:
             end_h = min(23, start_h + 1)
 
             if is_today and now_t >= QTime(end_h, 0):
+                btn.blockSignals(True); btn.setChecked(False); btn.blockSignals(False)
                 btn.setEnabled(False); paint(btn, GRAY)
                 btn.setText(str(start_h))
                 continue
@@ -669,6 +1179,7 @@ class Controller:
             elif is_booked: paint(btn, RED)
             else: paint(btn, BLUE)
 
+    @traced(cat="qt")
     def update_action_buttons(self):
         if not (self.btn_booking or self.btn_delete): return
         if not (self.current_machine and self.date_edit and self.selected):
@@ -676,13 +1187,13 @@ class Controller:
             if self.btn_delete:  self.btn_delete.setEnabled(False)
             return
 
-        date_s = ymd(self.date_edit.date())
-        booked_rows = self._booking_rows_for(self.current_machine, date_s)
-        booked_set = {int(r["slot"]) for r in booked_rows}
+        booked_set = {int(r["slot"]) for r in self._slot_rows()}
         sels = set(int(x) for x in self.selected)
         any_booked = any(s in booked_set for s in sels)
         any_free   = any(s not in booked_set for s in sels)
 
+        if self.multi:                      # the other machines' conflicts are reported by the batch
+            any_booked = False; any_free = bool(sels)
         if self.btn_booking: self.btn_booking.setEnabled(any_free and not any_booked)
         if self.btn_delete:  self.btn_delete.setEnabled(any_booked)
 
@@ -693,6 +1204,7 @@ class Controller:
         return self.repo.bookings_of(machine_id=mid, date_s=date_s)
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     app.setFont(QFont(app.font().family(), APP_FONT_PT))
 
@@ -738,7 +1250,7 @@ def main():
 if __name__ == "__main__":
     try:
         main()
-    except pymysql.MySQLError as e:
+    except DB_ERRORS as e:
         m = QMessageBox(QMessageBox.Critical, "Database error", fmt_mysql_error(e))
         m.setDetailedText(str(e))
         m.exec()
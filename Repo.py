@@ -0,0 +1,1055 @@
+# Repo.py — booking repository backends (MySQL / SQLite), Python 3.8
+import sqlite3, itertools, threading, time, logging, queue, json, http.client
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterator, Optional, List
+from urllib.parse import urlsplit, urlencode, quote
+
+try:
+    import pymysql
+    from pymysql.cursors import DictCursor, SSCursor
+except ImportError:                     # SQLite-only boxes (benchmarks, CI)
+    pymysql = None
+    DictCursor = SSCursor = None
+
+import DB_Config_sample as _cfg
+from Metrics import QUERY_STATS, timed
+from Trace import TRACER
+
+log = logging.getLogger("RemoteVNCBooking.repo")
+
+DB = _cfg.DB
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of connecting while the database is known to be down."""
+    def __init__(self, retry_in: float):
+        super().__init__(f"Database unavailable, retrying in {retry_in:.0f} s")
+        self.retry_in = retry_in
+
+class ServiceError(RuntimeError):
+    """Booking service answered with an error status."""
+    def __init__(self, msg: str, status: int = 0):
+        super().__init__(msg)
+        self.status = status
+
+class ServiceUnavailable(ServiceError):
+    """Booking service could not be reached (or reported its database down)."""
+
+DB_ERRORS = (sqlite3.Error, CircuitOpenError, ServiceError) + ((pymysql.MySQLError,) if pymysql else ())
+
+class CircuitBreaker:
+    """closed -> (N consecutive outages) -> open -> (backoff elapsed) -> half_open -> one probe.
+    A failed probe re-opens with doubled backoff; a good one closes."""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = 3, backoff_s: float = 2.0, max_backoff_s: float = 60.0):
+        self.threshold = max(1, int(failures))
+        self.base_backoff = float(backoff_s)
+        self.max_backoff = float(max_backoff_s)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.backoff = 0.0
+        self.next_probe = 0.0
+        self.listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        QUERY_STATS.set_gauge("db_circuit", self.state)
+
+    def retry_in(self) -> float:
+        return max(0.0, self.next_probe - time.monotonic())
+
+    def before(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            probe = self.state == self.OPEN and time.monotonic() >= self.next_probe
+            if probe:
+                self.state = self.HALF_OPEN      # this caller is the probe
+        if not probe:
+            raise CircuitOpenError(self.retry_in())
+        self._notify()
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == self.CLOSED:
+                return
+            self.backoff = 0.0
+            self.state = self.CLOSED
+        log.info("database reachable again, circuit closed")
+        self._notify()
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if not (self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold)):
+                return
+            self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else self.base_backoff)
+            self.next_probe = time.monotonic() + self.backoff
+            self.opens += 1
+            self.state = self.OPEN
+        log.warning("database unreachable (%d failures), circuit open, next probe in %.0f s",
+                    self.failures, self.backoff)
+        QUERY_STATS.set_gauge("db_circuit_opens", self.opens)
+        self._notify()
+
+    def _notify(self):
+        QUERY_STATS.set_gauge("db_circuit", self.state)
+        for cb in list(self.listeners):
+            cb(self.state)
+
+class _Guarded:
+    """Connection proxy that reports the round trip outcome to the breaker."""
+    __slots__ = ("_cx", "_repo")
+
+    def __init__(self, cx, repo: "Repo"):
+        self._cx = cx; self._repo = repo
+
+    def __getattr__(self, name):
+        return getattr(self._cx, name)
+
+    def __enter__(self):
+        return self._cx.__enter__()
+
+    def __exit__(self, et, e, tb):
+        outage = e is not None and self._repo._is_outage(e)
+        if outage:
+            self._repo.breaker.failure()
+        else:
+            self._repo.breaker.success()
+        if self._repo._pool is not None and not outage:
+            self._repo._release(self._cx)
+            return False
+        return self._cx.__exit__(et, e, tb)
+
+class Repo:
+    """Repository interface. SQL is written in pymysql paramstyle (%s);
+    backends supply _open() and the IntegrityError raised on a duplicate slot."""
+    backend = "?"
+    IntegrityError = sqlite3.IntegrityError
+    FOR_UPDATE = ""
+    INSERT_IGNORE = "INSERT OR IGNORE"
+    RECURRING_DDL: List[str] = []
+    USAGE_DDL: List[str] = []
+    # whole days / hours from a reference date, computed server-side for the analytics streams
+    DAYS_SINCE = "CAST(ROUND(julianday({col}) - julianday(%s)) AS INTEGER)"
+    HOURS_SINCE = "CAST(ROUND((julianday({col}) - julianday(%s)) * 86400) AS INTEGER) / 3600"
+    # multi-row upsert tail: {keys} = unique key columns, {sets} = UPSERT_SET per updated column
+    UPSERT = " ON CONFLICT({keys}) DO UPDATE SET {sets}"
+    UPSERT_SET = "{c}=excluded.{c}"
+    # portable columns for export / import (bookings carry the sn, machine ids differ per site)
+    MACHINE_COLS = ("sn", "owner", "host_name", "host_account_password", "windows_account", "windows_password",
+                    "note", "state", "data_create_at", "data_update_at")
+    BOOKING_COLS = ("sn", "date", "slot", "display_name", "wwid")
+    # columns owned by the inventory file (Inventory.py); state RETIRED hides a machine from list_machines
+    INVENTORY_COLS = ("owner", "host_name", "host_account_password", "windows_account", "windows_password",
+                      "note", "state")
+    RETIRED = "retired"
+
+    def __init__(self):
+        bcfg = getattr(_cfg, "BREAKER", {})
+        self.breaker = CircuitBreaker(bcfg.get("failures", 3), bcfg.get("backoff_s", 2.0),
+                                      bcfg.get("max_backoff_s", 60.0))
+        self._pool: Optional[queue.LifoQueue] = None
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _revive(self, cx, idle_s: float):
+        """Make sure a pooled connection idle for `idle_s` is still usable."""
+
+    def _is_outage(self, e: BaseException) -> bool:
+        return False
+
+    def is_outage(self, e: BaseException) -> bool:
+        """True when `e` means the backend is unreachable (worth retrying later), not a bad request."""
+        return isinstance(e, CircuitOpenError) or self._is_outage(e)
+
+    def _begin_write(self, cur):
+        """Start a transaction that will write (SQLite takes its write lock up front)."""
+
+    def lock_status(self) -> dict:
+        """Cumulative server-side lock counters, where the backend exposes them."""
+        return {}
+
+    def _stream_cursor(self, cx):
+        """Cursor yielding tuples without buffering the whole result client-side."""
+        return cx.cursor()
+
+    def stream(self, sql: str, params=(), chunk: int = 20000) -> Iterator[list]:
+        """Yield lists of up to `chunk` tuple rows; memory stays at one chunk whatever the
+        result size. The connection is held until the generator is exhausted or closed."""
+        with self.conn() as cx:
+            cur = self._stream_cursor(cx)
+            try:
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(chunk)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cur.close()
+
+    def enable_pool(self, size: int):
+        """Keep up to `size` idle connections for reuse instead of connecting per call."""
+        self._pool = queue.LifoQueue(maxsize=max(1, int(size)))
+
+    def _release(self, cx):
+        try:
+            cx.rollback()
+            self._pool.put_nowait((cx, time.monotonic()))
+        except Exception:
+            cx.close()
+
+    def conn(self):
+        self.breaker.before()
+        t0 = time.perf_counter()
+        try:
+            with TRACER.span("connect", "db"):
+                cx = None
+                while self._pool is not None and cx is None:
+                    try:
+                        cx, since = self._pool.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        self._revive(cx, time.monotonic() - since)
+                    except Exception:
+                        cx.close(); cx = None
+                if cx is None:
+                    cx = self._open()
+        except Exception as e:
+            if self._is_outage(e):
+                self.breaker.failure()
+            raise
+        finally:
+            QUERY_STATS.note_connect((time.perf_counter() - t0) * 1000.0)
+        return _Guarded(cx, self)
+
+    # machines
+    @timed()
+    def list_machines(self) -> List[dict]:
+        sql = """
+            SELECT id, sn, owner, host_name, host_account_password, windows_account, windows_password, note, state,
+                   data_create_at, data_update_at
+            FROM machines
+            WHERE state IS NULL OR state<>%s
+            ORDER BY sn
+        """
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, (self.RETIRED,))
+            return list(cur.fetchall())
+
+    @timed()
+    def connect_info(self, sn: str, date_s: str, slot: int) -> Optional[dict]:
+        """The machine row plus booked_name / booked_wwid of its (date_s, slot) booking (None
+        when free) — the whole Connect check in one round trip: sn lookup + one PK probe."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("""SELECT m.*, b.display_name AS booked_name, b.wwid AS booked_wwid
+                           FROM machines m LEFT JOIN bookings b ON b.machine_id = m.id AND b.date=%s AND b.slot=%s
+                           WHERE m.sn=%s""", (date_s, slot, sn))
+            return cur.fetchone()
+
+    @timed()
+    def machines_fingerprint(self) -> str:
+        """'count|MAX(data_update_at)': changes when a machine is added, retired or edited
+        (Inventory.py stamps every change). Two index lookups, not the machine list."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS n, MAX(data_update_at) AS at FROM machines")
+            r = cur.fetchone()
+            return f"{r['n']}|{r['at']}"
+
+    @timed()
+    def inventory(self) -> List[dict]:
+        """Every machine, retired ones included: id, sn, INVENTORY_COLS, data_update_at."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(f"SELECT id, sn, {','.join(self.INVENTORY_COLS)}, data_update_at FROM machines ORDER BY sn")
+            return list(cur.fetchall())
+
+    @timed()
+    def sync_machines(self, inserts: List[dict], updates: List[dict], retire: List[str], cols: List[str],
+                      at: str, batch: int = 500) -> dict:
+        """Apply an inventory diff, one transaction per `batch` rows: multi-row INSERT of new
+        machines, upsert on sn of changed ones (`cols` only), state=RETIRED for `retire`.
+        data_update_at is set to `at` on exactly these rows; nothing else is written. `at` is
+        moved past the table's newest stamp if needed, so machines_fingerprint() always moves
+        (same-second syncs, clock skew, UTC defaults); the stamp used comes back as "at"."""
+        batch = max(1, batch)
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("SELECT MAX(data_update_at) AS at FROM machines")
+            top = (cur.fetchone() or {}).get("at")
+            if top is not None and str(top)[:19] >= at:
+                at = (datetime.strptime(str(top)[:19], "%Y-%m-%d %H:%M:%S") + timedelta(seconds=1)
+                      ).strftime("%Y-%m-%d %H:%M:%S")
+            out = {"inserted": 0, "updated": 0, "retired": 0, "at": at}
+            for i in range(0, len(inserts), batch):
+                chunk = inserts[i:i + batch]
+                names = ["sn", *cols, "data_create_at", "data_update_at"]
+                cur.execute(f"INSERT INTO machines({','.join(names)}) VALUES "
+                            + ",".join(["(" + ",".join(["%s"] * len(names)) + ")"] * len(chunk)),
+                            [v for r in chunk for v in (r["sn"], *(r.get(c) for c in cols), at, at)])
+                cx.commit()
+                out["inserted"] += len(chunk)
+            names = ["sn", *cols, "data_update_at"]
+            sets = ",".join(self.UPSERT_SET.format(c=c) for c in names[1:])
+            for i in range(0, len(updates), batch):
+                chunk = updates[i:i + batch]
+                cur.execute(f"INSERT INTO machines({','.join(names)}) VALUES "
+                            + ",".join(["(" + ",".join(["%s"] * len(names)) + ")"] * len(chunk))
+                            + self.UPSERT.format(keys="sn", sets=sets),
+                            [v for r in chunk for v in (r["sn"], *(r.get(c) for c in cols), at)])
+                cx.commit()
+                out["updated"] += len(chunk)
+            for i in range(0, len(retire), batch):
+                chunk = retire[i:i + batch]
+                cur.execute(f"UPDATE machines SET state=%s, data_update_at=%s WHERE sn IN ({','.join(['%s'] * len(chunk))})",
+                            [self.RETIRED, at, *chunk])
+                cx.commit()
+                out["retired"] += len(chunk)
+        return out
+
+    @timed()
+    def get_machine_by_sn(self, sn: str) -> Optional[dict]:
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("SELECT * FROM machines WHERE sn=%s", (sn,))
+            return cur.fetchone()
+
+    # bookings
+    @timed()
+    def bookings_of(self, machine_id: Optional[int] = None,
+                    date_s: Optional[str] = None) -> List[dict]:
+        where, params = [], []
+        if machine_id is not None:
+            where.append("b.machine_id=%s"); params.append(machine_id)
+        if date_s is not None:
+            where.append("b.date=%s"); params.append(date_s)
+        sql = "SELECT b.* FROM bookings b"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, params)
+            return list(cur.fetchall())
+
+    @timed()
+    def insert_booking(self, machine_id: int, date_s: str, slot_i: int,
+                       display_name: str, wwid: str) -> bool:
+        sql = """INSERT INTO bookings(machine_id,date,slot,display_name,wwid)
+                 VALUES(%s,%s,%s,%s,%s)"""
+        with self.conn() as cx, cx.cursor() as cur:
+            try:
+                cur.execute(sql, (machine_id, date_s, slot_i, display_name, wwid))
+                cx.commit()
+                return True
+            except self.IntegrityError:
+                cx.rollback()
+                return False
+
+    @timed()
+    def delete_bookings(self, machine_id: int, date_s: str, slots: List[int]) -> int:
+        if not slots:
+            return 0
+        fmt = ",".join(["%s"] * len(slots))
+        sql = f"DELETE FROM bookings WHERE machine_id=%s AND date=%s AND slot IN ({fmt})"
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, [machine_id, date_s, *slots])
+            cx.commit()
+            return cur.rowcount
+
+    @timed()
+    def bookings_between(self, date_from: str, date_to: str,
+                         machine_ids: Optional[List[int]] = None) -> List[dict]:
+        """All bookings with date_from <= date <= date_to in one round trip."""
+        sql, params = "SELECT b.* FROM bookings b WHERE b.date BETWEEN %s AND %s", [date_from, date_to]
+        if machine_ids:
+            sql += " AND b.machine_id IN (" + ",".join(["%s"] * len(machine_ids)) + ")"
+            params += list(machine_ids)
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, params)
+            return list(cur.fetchall())
+
+    @timed()
+    def my_bookings(self, wwid: str, date_from: str) -> List[dict]:
+        """Bookings of `wwid` on every machine from `date_from` on, with the machine sn;
+        one range scan of idx_bookings_wwid (wwid, date)."""
+        sql = """SELECT b.machine_id, m.sn, b.date, b.slot, b.display_name, b.wwid
+                 FROM bookings b JOIN machines m ON m.id = b.machine_id
+                 WHERE b.wwid=%s AND b.date>=%s ORDER BY b.date, m.sn, b.slot"""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, (wwid, date_from))
+            return list(cur.fetchall())
+
+    @timed()
+    def apply_ops(self, ops: List[dict], atomic: bool = False) -> List[dict]:
+        """Apply book/cancel intents, in order, in one transaction.
+
+        ops: {"op": "book"|"cancel", "machine_id", "date", "slot", "display_name", "wwid",
+              "expect_wwid" (cancel: booker the user saw)}.
+        Current rows of the touched (machine, date) pairs are read (locked on MySQL),
+        the outcome of every op is decided against them, then one DELETE and one
+        multi-row INSERT apply the net change. Each op gets "result" = "won" | "lost"
+        and "holder" = display name of the conflicting booking. With `atomic`, one
+        lost op rolls everything back and the would-be winners come back "aborted"."""
+        if not ops:
+            return []
+        pairs = sorted({(int(o["machine_id"]), str(o["date"])) for o in ops})
+        where = " OR ".join(["(machine_id=%s AND date=%s)"] * len(pairs))
+        params = [v for p in pairs for v in p]
+        with self.conn() as cx, cx.cursor() as cur:
+            self._begin_write(cur)
+            cur.execute(f"SELECT machine_id, date, slot, display_name, wwid FROM bookings WHERE {where}{self.FOR_UPDATE}",
+                        params)
+            state = {(int(r["machine_id"]), str(r["date"]), int(r["slot"])): r for r in cur.fetchall()}
+            original = dict(state)
+            out = []
+            for o in ops:
+                k = (int(o["machine_id"]), str(o["date"]), int(o["slot"]))
+                held = state.get(k)
+                res = dict(o, result="won", holder="")
+                if o["op"] == "book":
+                    if held is None:
+                        state[k] = {"display_name": o.get("display_name", ""), "wwid": o.get("wwid", "")}
+                    elif (held.get("wwid") or "") != (o.get("wwid") or ""):
+                        res.update(result="lost", holder=held.get("display_name") or "")
+                else:
+                    if held is not None:
+                        if (held.get("wwid") or "") == (o.get("expect_wwid") or ""):
+                            del state[k]
+                        else:
+                            res.update(result="lost", holder=held.get("display_name") or "")
+                out.append(res)
+            if atomic and any(r["result"] == "lost" for r in out):
+                cx.rollback()
+                for r in out:
+                    if r["result"] == "won": r["result"] = "aborted"
+                return out
+            gone = [k for k, r in original.items() if state.get(k) is not r]
+            new = [(k, r) for k, r in state.items() if original.get(k) is not r]
+            if gone:
+                cond = " OR ".join(["(machine_id=%s AND date=%s AND slot=%s)"] * len(gone))
+                cur.execute(f"DELETE FROM bookings WHERE {cond}", [v for k in gone for v in k])
+            if new:
+                vals = ",".join(["(%s,%s,%s,%s,%s)"] * len(new))
+                cur.execute(f"INSERT INTO bookings(machine_id,date,slot,display_name,wwid) VALUES {vals}",
+                            [v for k, r in new for v in (*k, r.get("display_name", ""), r.get("wwid", ""))])
+            cx.commit()
+            return out
+
+    def _run_ddl(self, stmts: List[str]):
+        with self.conn() as cx, cx.cursor() as cur:
+            for stmt in stmts:
+                cur.execute(stmt)
+            cx.commit()
+
+    # recurring rules
+    def create_recurring_schema(self):
+        self._run_ddl(self.RECURRING_DDL)
+
+    @timed()
+    def add_rule(self, machine_id: int, first_slot: int, last_slot: int, weekdays: int, start_date: str,
+                 end_date: Optional[str], display_name: str, wwid: str) -> int:
+        """weekdays: bit 0 = Monday .. bit 6 = Sunday (127 = daily)."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("""INSERT INTO recurring_rules(machine_id,first_slot,last_slot,weekdays,start_date,end_date,
+                                                       display_name,wwid) VALUES(%s,%s,%s,%s,%s,%s,%s,%s)""",
+                        (machine_id, first_slot, last_slot, weekdays, start_date, end_date or None, display_name, wwid))
+            cx.commit()
+            return cur.lastrowid
+
+    @timed()
+    def list_rules(self, wwid: Optional[str] = None) -> List[dict]:
+        sql = """SELECT r.*, m.sn FROM recurring_rules r JOIN machines m ON m.id = r.machine_id"""
+        params = []
+        if wwid is not None:
+            sql += " WHERE r.wwid=%s"; params.append(wwid)
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql + " ORDER BY r.id", params)
+            return list(cur.fetchall())
+
+    @timed()
+    def delete_rule(self, rule_id: int) -> int:
+        """Stops future expansion; bookings already made stay."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("DELETE FROM recurring_conflicts WHERE rule_id=%s", (rule_id,))
+            cur.execute("DELETE FROM recurring_rules WHERE id=%s", (rule_id,))
+            n = cur.rowcount
+            cx.commit()
+            return n
+
+    @timed()
+    def expand_rules(self, date_s: str, from_slot: int = 0) -> dict:
+        """Materialise every active rule covering `date_s` in one transaction.
+
+        Three statements whatever the rule count: the matching rules (index on
+        active/start_date/end_date, weekday as a bit test), the bookings of their
+        machines on that date (locked on MySQL), then multi-row INSERTs of the missing
+        slots and of new conflicts. Slots already held by the rule's wwid count as
+        kept, so re-running is harmless; a slot held by someone else is recorded
+        once in recurring_conflicts ("new_conflicts"). Slots before `from_slot` are
+        left alone (hours already over today)."""
+        bit = 1 << date.fromisoformat(date_s).weekday()
+        out = {"date": date_s, "rules": 0, "booked": 0, "kept": 0, "conflicts": [], "new_conflicts": 0}
+        with self.conn() as cx, cx.cursor() as cur:
+            self._begin_write(cur)
+            cur.execute("""SELECT id, machine_id, first_slot, last_slot, display_name, wwid FROM recurring_rules
+                           WHERE active=1 AND start_date<=%s AND (end_date IS NULL OR end_date>=%s)
+                             AND (weekdays & %s)<>0 ORDER BY id""", (date_s, date_s, bit))
+            rules = cur.fetchall()
+            out["rules"] = len(rules)
+            if not rules:
+                cx.commit()
+                return out
+            mids = sorted({int(r["machine_id"]) for r in rules})
+            cur.execute(f"SELECT machine_id, slot, display_name, wwid FROM bookings WHERE date=%s "
+                        f"AND machine_id IN ({','.join(['%s'] * len(mids))}){self.FOR_UPDATE}", [date_s, *mids])
+            held = {(int(b["machine_id"]), int(b["slot"])): b for b in cur.fetchall()}
+            new = []
+            for r in rules:
+                mid, wwid = int(r["machine_id"]), r["wwid"] or ""
+                for slot in range(max(int(r["first_slot"]), from_slot), int(r["last_slot"]) + 1):
+                    b = held.get((mid, slot))
+                    if b is None:
+                        held[(mid, slot)] = {"display_name": r["display_name"], "wwid": wwid}
+                        new.append((mid, date_s, slot, r["display_name"] or "", wwid))
+                    elif (b.get("wwid") or "") == wwid:
+                        out["kept"] += 1
+                    else:
+                        out["conflicts"].append({"rule_id": r["id"], "machine_id": mid, "date": date_s, "slot": slot,
+                                                 "wwid": wwid, "holder": b.get("display_name") or "",
+                                                 "holder_wwid": b.get("wwid") or ""})
+            for i in range(0, len(new), 500):
+                chunk = new[i:i + 500]
+                cur.execute("INSERT INTO bookings(machine_id,date,slot,display_name,wwid) VALUES "
+                            + ",".join(["(%s,%s,%s,%s,%s)"] * len(chunk)), [v for row in chunk for v in row])
+            out["booked"] = len(new)
+            cs = out["conflicts"]
+            for i in range(0, len(cs), 500):
+                chunk = cs[i:i + 500]
+                cur.execute(f"{self.INSERT_IGNORE} INTO recurring_conflicts(rule_id,date,slot,holder,holder_wwid) VALUES "
+                            + ",".join(["(%s,%s,%s,%s,%s)"] * len(chunk)),
+                            [v for c in chunk for v in (c["rule_id"], date_s, c["slot"], c["holder"], c["holder_wwid"])])
+                out["new_conflicts"] += max(0, cur.rowcount)
+            cx.commit()
+            return out
+
+    # usage: connect events and the no-show sweeper
+    def create_usage_schema(self):
+        self._run_ddl(self.USAGE_DDL)
+
+    @timed()
+    def record_connections(self, rows: List[dict]) -> int:
+        """rows: {"machine_id", "sn", "wwid", "at" ('YYYY-MM-DD HH:MM:SS', Asia/Taipei),
+        "outcome", "latency_ms"}; one multi-row INSERT."""
+        if not rows:
+            return 0
+        cols = ("machine_id", "sn", "wwid", "at", "outcome", "latency_ms")
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(f"INSERT INTO connections({','.join(cols)}) VALUES "
+                        + ",".join(["(%s,%s,%s,%s,%s,%s)"] * len(rows)),
+                        [r.get(c) for r in rows for c in cols])
+            cx.commit()
+            return len(rows)
+
+    @timed()
+    def sweep_unused(self, date_s: str, slot: int, since: str, sweep_id: str, at: str) -> List[dict]:
+        """Release the (date_s, slot) bookings whose owner has not launched a connection to
+        that machine since `since` (slot start), in one transaction of set-based statements:
+        INSERT..SELECT the victims into booking_releases, then one DELETE. A slot that
+        continues the owner's booking of the previous hour is left alone (that hour was
+        used, or was released by the previous sweep). Returns the released rows."""
+        with self.conn() as cx, cx.cursor() as cur:
+            self._begin_write(cur)
+            cur.execute("""INSERT INTO booking_releases(sweep_id, released_at, machine_id, date, slot, display_name, wwid, reason)
+                           SELECT %s, %s, b.machine_id, b.date, b.slot, b.display_name, b.wwid, 'no-show'
+                           FROM bookings b
+                           WHERE b.date=%s AND b.slot=%s AND b.wwid IS NOT NULL AND b.wwid<>''
+                             AND NOT EXISTS (SELECT 1 FROM bookings p WHERE p.machine_id=b.machine_id AND p.date=b.date
+                                                AND p.slot=b.slot-1 AND p.wwid=b.wwid)
+                             AND NOT EXISTS (SELECT 1 FROM connections c WHERE c.machine_id=b.machine_id AND c.wwid=b.wwid
+                                                AND c.outcome='launched' AND c.at>=%s)""",
+                        (sweep_id, at, date_s, slot, since))
+            cur.execute("SELECT machine_id, date, slot, display_name, wwid FROM booking_releases WHERE sweep_id=%s",
+                        (sweep_id,))
+            rows = list(cur.fetchall())
+            if rows:
+                cur.execute(f"DELETE FROM bookings WHERE date=%s AND slot=%s AND machine_id IN "
+                            f"({','.join(['%s'] * len(rows))})", [date_s, slot, *(int(r["machine_id"]) for r in rows)])
+            cx.commit()
+            return rows
+
+    # analytics streams (tuples, ordered for run detection)
+    def stream_bookings(self, date_from: str, date_to: str, chunk: int = 20000) -> Iterator[list]:
+        """(machine_id, day index from date_from, slot, wwid) ordered by machine, date, slot."""
+        sql = (f"SELECT machine_id, {self.DAYS_SINCE.format(col='date')}, slot, wwid FROM bookings "
+               f"WHERE date BETWEEN %s AND %s ORDER BY machine_id, date, slot")
+        return self.stream(sql, (date_from, date_from, date_to), chunk)
+
+    def stream_connections(self, date_from: str, date_to: str, chunk: int = 20000) -> Iterator[list]:
+        """(machine_id, hour index from date_from 00:00, wwid) of launched connections."""
+        sql = (f"SELECT machine_id, {self.HOURS_SINCE.format(col='at')}, wwid FROM connections "
+               f"WHERE outcome='launched' AND at>=%s AND at<%s")
+        end = (date.fromisoformat(date_to).toordinal() + 1)
+        return self.stream(sql, (date_from, date_from, date.fromordinal(end).isoformat()), chunk)
+
+    # bulk transfer
+    def export_machines(self, chunk: int = 20000) -> Iterator[list]:
+        """MACHINE_COLS tuples ordered by sn."""
+        return self.stream(f"SELECT {','.join(self.MACHINE_COLS)} FROM machines ORDER BY sn", (), chunk)
+
+    def export_bookings(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                        chunk: int = 20000) -> Iterator[list]:
+        """BOOKING_COLS tuples in (machine_id, date, slot) key order."""
+        sql, params = ("SELECT m.sn, b.date, b.slot, b.display_name, b.wwid FROM bookings b "
+                       "JOIN machines m ON m.id = b.machine_id"), []
+        if date_from or date_to:
+            sql += " WHERE b.date BETWEEN %s AND %s"; params += [date_from or "0000-01-01", date_to or "9999-12-31"]
+        return self.stream(sql + " ORDER BY b.machine_id, b.date, b.slot", params, chunk)
+
+    @timed()
+    def upsert_rows(self, table: str, cols: List[str], keys: List[str], rows: List[tuple]) -> int:
+        """One multi-row INSERT in one transaction; rows whose `keys` exist are updated
+        in place (non-key columns), the others inserted."""
+        if not rows:
+            return 0
+        sets = ",".join(self.UPSERT_SET.format(c=c) for c in cols if c not in keys)
+        tail = self.UPSERT.format(keys=",".join(keys), sets=sets) if sets else ""
+        sql = (f"{self.INSERT_IGNORE if not sets else 'INSERT'} INTO {table}({','.join(cols)}) VALUES "
+               + ",".join(["(" + ",".join(["%s"] * len(cols)) + ")"] * len(rows)) + tail)
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute(sql, [v for r in rows for v in r])
+            cx.commit()
+            return len(rows)
+
+    @timed()
+    def releases_since(self, since: str) -> List[dict]:
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("""SELECT r.*, m.sn FROM booking_releases r JOIN machines m ON m.id = r.machine_id
+                           WHERE r.released_at>=%s ORDER BY r.released_at, m.sn""", (since,))
+            return list(cur.fetchall())
+
+class MySQLRepo(Repo):
+    backend = "mysql"
+    FOR_UPDATE = " FOR UPDATE"
+    INSERT_IGNORE = "INSERT IGNORE"
+    DAYS_SINCE = "DATEDIFF({col}, %s)"
+    HOURS_SINCE = "TIMESTAMPDIFF(HOUR, %s, {col})"
+    UPSERT = " ON DUPLICATE KEY UPDATE {sets}"
+    UPSERT_SET = "{c}=VALUES({c})"
+    RECURRING_DDL = [
+        """CREATE TABLE IF NOT EXISTS recurring_rules (
+               id           INT AUTO_INCREMENT PRIMARY KEY,
+               machine_id   INT NOT NULL,
+               first_slot   TINYINT NOT NULL,
+               last_slot    TINYINT NOT NULL,
+               weekdays     TINYINT NOT NULL DEFAULT 127,
+               start_date   DATE NOT NULL,
+               end_date     DATE NULL,
+               display_name VARCHAR(100),
+               wwid         VARCHAR(32),
+               active       TINYINT NOT NULL DEFAULT 1,
+               created_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+               KEY idx_rules_span (active, start_date, end_date),
+               KEY idx_rules_wwid (wwid)
+           )""",
+        """CREATE TABLE IF NOT EXISTS recurring_conflicts (
+               rule_id     INT NOT NULL,
+               date        DATE NOT NULL,
+               slot        TINYINT NOT NULL,
+               holder      VARCHAR(100),
+               holder_wwid VARCHAR(32),
+               noted_at    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (rule_id, date, slot)
+           )""",
+    ]
+    USAGE_DDL = [
+        """CREATE TABLE IF NOT EXISTS connections (
+               id         BIGINT AUTO_INCREMENT PRIMARY KEY,
+               machine_id INT NOT NULL,
+               sn         VARCHAR(64),
+               wwid       VARCHAR(32),
+               at         DATETIME NOT NULL,
+               outcome    VARCHAR(16) NOT NULL,
+               latency_ms INT,
+               KEY idx_connections_owner (machine_id, wwid, at)
+           )""",
+        """CREATE TABLE IF NOT EXISTS booking_releases (
+               id           BIGINT AUTO_INCREMENT PRIMARY KEY,
+               sweep_id     CHAR(32) NOT NULL,
+               released_at  DATETIME NOT NULL,
+               machine_id   INT NOT NULL,
+               date         DATE NOT NULL,
+               slot         TINYINT NOT NULL,
+               display_name VARCHAR(100),
+               wwid         VARCHAR(32),
+               reason       VARCHAR(32) NOT NULL,
+               KEY idx_releases_sweep (sweep_id),
+               KEY idx_releases_at (released_at)
+           )""",
+    ]
+    IntegrityError = pymysql.err.IntegrityError if pymysql else sqlite3.IntegrityError
+
+    def __init__(self, db: Optional[dict] = None):
+        if pymysql is None:
+            raise RuntimeError("pymysql is not installed; set BACKEND = \"sqlite\" or pip install pymysql")
+        super().__init__()
+        self._db = dict(db or DB)
+        for k, v in getattr(_cfg, "DB_TIMEOUTS", {}).items():
+            self._db.setdefault(k, v)
+
+    def _open(self):
+        return pymysql.connect(cursorclass=DictCursor, autocommit=False, **self._db)
+
+    def _stream_cursor(self, cx):
+        return cx.cursor(SSCursor)          # unbuffered: rows come off the socket as they are fetched
+
+    def _revive(self, cx, idle_s: float):
+        if idle_s > 60:
+            cx.ping(reconnect=True)
+
+    def _is_outage(self, e: BaseException) -> bool:
+        # client-side codes (2003 can't connect, 2006 gone away, 2013 lost) — not deadlocks/lock waits
+        if isinstance(e, (pymysql.err.OperationalError, pymysql.err.InterfaceError)):
+            code = e.args[0] if e.args else None
+            return not isinstance(code, int) or code >= 2000
+        return isinstance(e, OSError)
+
+    def lock_status(self) -> dict:
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.execute("SHOW GLOBAL STATUS WHERE Variable_name IN "
+                        "('Innodb_row_lock_waits','Innodb_row_lock_time','Innodb_row_lock_time_max',"
+                        "'Innodb_deadlocks','Threads_connected','Threads_running','Questions')")
+            return {r["Variable_name"]: int(r["Value"]) for r in cur.fetchall()}
+
+# SQLite
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    id                    INTEGER PRIMARY KEY AUTOINCREMENT,
+    sn                    TEXT NOT NULL UNIQUE,
+    owner                 TEXT,
+    host_name             TEXT,
+    host_account_password TEXT,
+    windows_account       TEXT,
+    windows_password      TEXT,
+    note                  TEXT,
+    state                 TEXT,
+    ipkvm                 TEXT,
+    "account/password"    TEXT,
+    data_create_at        TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    data_update_at        TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    machine_id   INTEGER NOT NULL REFERENCES machines(id),
+    date         TEXT    NOT NULL,
+    slot         INTEGER NOT NULL CHECK (slot BETWEEN 0 AND 23),
+    display_name TEXT,
+    wwid         TEXT,
+    UNIQUE (machine_id, date, slot)
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_wwid ON bookings(wwid, date);
+CREATE INDEX IF NOT EXISTS idx_machines_update ON machines(data_update_at);
+"""
+
+SQLITE_USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    machine_id INTEGER NOT NULL,
+    sn         TEXT,
+    wwid       TEXT,
+    at         TEXT    NOT NULL,
+    outcome    TEXT    NOT NULL,
+    latency_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_connections_owner ON connections(machine_id, wwid, at);
+CREATE TABLE IF NOT EXISTS booking_releases (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    sweep_id     TEXT    NOT NULL,
+    released_at  TEXT    NOT NULL,
+    machine_id   INTEGER NOT NULL,
+    date         TEXT    NOT NULL,
+    slot         INTEGER NOT NULL,
+    display_name TEXT,
+    wwid         TEXT,
+    reason       TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_releases_sweep ON booking_releases(sweep_id);
+CREATE INDEX IF NOT EXISTS idx_releases_at ON booking_releases(released_at);
+"""
+
+SQLITE_RECURRING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recurring_rules (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    machine_id   INTEGER NOT NULL REFERENCES machines(id),
+    first_slot   INTEGER NOT NULL CHECK (first_slot BETWEEN 0 AND 23),
+    last_slot    INTEGER NOT NULL CHECK (last_slot BETWEEN 0 AND 23),
+    weekdays     INTEGER NOT NULL DEFAULT 127,
+    start_date   TEXT    NOT NULL,
+    end_date     TEXT,
+    display_name TEXT,
+    wwid         TEXT,
+    active       INTEGER NOT NULL DEFAULT 1,
+    created_at   TEXT    NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_rules_span ON recurring_rules(active, start_date, end_date);
+CREATE INDEX IF NOT EXISTS idx_rules_wwid ON recurring_rules(wwid);
+CREATE TABLE IF NOT EXISTS recurring_conflicts (
+    rule_id     INTEGER NOT NULL,
+    date        TEXT    NOT NULL,
+    slot        INTEGER NOT NULL,
+    holder      TEXT,
+    holder_wwid TEXT,
+    noted_at    TEXT    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (rule_id, date, slot)
+);
+"""
+
+def _dict_row(cur, row):
+    return {d[0]: v for d, v in zip(cur.description, row)}
+
+class _SQLiteCursor:
+    """pymysql-style cursor over sqlite3: context manager, %s placeholders, dict rows."""
+    def __init__(self, cur: sqlite3.Cursor):
+        self._cur = cur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cur.close()
+
+    def execute(self, sql: str, params=()):
+        return self._cur.execute(sql.replace("%s", "?"), tuple(params or ()))
+
+    def executemany(self, sql: str, seq):
+        return self._cur.executemany(sql.replace("%s", "?"), [tuple(p) for p in seq])
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._cur.fetchmany(size)
+
+    def close(self):
+        self._cur.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+class _SQLiteConn:
+    """Closes on exit like pymysql's Connection; uncommitted work is discarded."""
+    def __init__(self, cx: sqlite3.Connection):
+        self._cx = cx
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cx.close()
+
+    def cursor(self) -> _SQLiteCursor:
+        return _SQLiteCursor(self._cx.cursor())
+
+    def commit(self):
+        self._cx.commit()
+
+    def rollback(self):
+        self._cx.rollback()
+
+    def close(self):
+        self._cx.close()
+
+class SQLiteRepo(Repo):
+    backend = "sqlite"
+    IntegrityError = sqlite3.IntegrityError
+    RECURRING_DDL = [x.strip() for x in SQLITE_RECURRING_SCHEMA.split(";") if x.strip()]
+    USAGE_DDL = [x.strip() for x in SQLITE_USAGE_SCHEMA.split(";") if x.strip()]
+    _mem_ids = itertools.count(1)
+
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = None):
+        super().__init__()
+        cfg = getattr(_cfg, "SQLITE", {})
+        path = path or cfg.get("path") or ":memory:"
+        self._timeout = float(timeout if timeout is not None else cfg.get("timeout", 5.0))
+        self._keeper = None
+        if path == ":memory:":
+            # one shared in-memory DB per repo; the keeper connection keeps it alive
+            self._target, self._uri = f"file:rvb_mem_{next(self._mem_ids)}?mode=memory&cache=shared", True
+            self._keeper = self._connect()
+        else:
+            self._target, self._uri = path, False
+        self.create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        cx = sqlite3.connect(self._target, timeout=self._timeout, uri=self._uri, check_same_thread=False)
+        cx.row_factory = _dict_row
+        cx.execute("PRAGMA foreign_keys=ON")
+        return cx
+
+    def _open(self):
+        return _SQLiteConn(self._connect())
+
+    def _is_outage(self, e: BaseException) -> bool:
+        return isinstance(e, sqlite3.OperationalError) and "unable to open" in str(e)
+
+    def _begin_write(self, cur):
+        cur.execute("BEGIN IMMEDIATE")
+
+    def _stream_cursor(self, cx):
+        cur = cx._cx.cursor()
+        cur.row_factory = None              # plain tuples; sqlite3 steps the statement lazily anyway
+        return _SQLiteCursor(cur)
+
+    def create_schema(self):
+        cx = self._connect()
+        try:
+            if not self._uri:
+                cx.execute("PRAGMA journal_mode=WAL")
+            cx.executescript(SQLITE_SCHEMA + SQLITE_RECURRING_SCHEMA + SQLITE_USAGE_SCHEMA)
+            cx.commit()
+        finally:
+            cx.close()
+
+    def seed_machines(self, sns: List[str]) -> int:
+        """Insert bare machines for local runs; existing sn are left alone."""
+        with self.conn() as cx, cx.cursor() as cur:
+            cur.executemany("INSERT OR IGNORE INTO machines(sn, host_name) VALUES(%s,%s)",
+                            [(sn, sn.lower()) for sn in sns])
+            cx.commit()
+            return cur.rowcount
+
+# Booking service client
+class HttpRepo(Repo):
+    """Talks JSON over HTTP to BookingService.py instead of holding DB credentials."""
+    backend = "http"
+    OUTAGE_STATUS = (502, 503, 504)     # gateway / database down; other 5xx are service bugs, not retried offline
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None):
+        super().__init__()
+        cfg = getattr(_cfg, "SERVICE", {})
+        u = urlsplit(url or cfg.get("url") or "http://127.0.0.1:8765")
+        self._host, self._port = u.hostname or "127.0.0.1", u.port or 80
+        self._timeout = float(timeout if timeout is not None else cfg.get("timeout", 5.0))
+        self._auth = {"Authorization": "Bearer " + cfg["token"]} if cfg.get("token") else {}
+        self._local = threading.local()
+
+    def _is_outage(self, e: BaseException) -> bool:
+        return isinstance(e, ServiceUnavailable)
+
+    def _http(self) -> http.client.HTTPConnection:
+        hc = getattr(self._local, "hc", None)
+        if hc is None:
+            t0 = time.perf_counter()
+            with TRACER.span("connect", "db"):
+                hc = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+                hc.connect()
+            QUERY_STATS.note_connect((time.perf_counter() - t0) * 1000.0)
+            self._local.hc = hc
+        return hc
+
+    def _call(self, method: str, path: str, body=None):
+        self.breaker.before()
+        data = json.dumps(body, default=str).encode() if body is not None else None
+        headers = dict(self._auth, **({"Content-Type": "application/json"} if data is not None else {}))
+        for attempt in (0, 1):
+            try:
+                hc = self._http()
+                hc.request(method, path, body=data, headers=headers)
+                resp = hc.getresponse()
+                raw = resp.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                old = getattr(self._local, "hc", None)
+                if old is not None: old.close()
+                self._local.hc = None
+                if attempt:                     # second failure: a real outage, not a stale keep-alive
+                    self.breaker.failure()
+                    raise ServiceUnavailable(f"booking service {self._host}:{self._port}: {e}") from e
+        try:
+            payload = json.loads(raw.decode("utf-8")) if raw else None
+        except ValueError:                      # e.g. a proxy's HTML error page
+            payload = None
+        if resp.status in self.OUTAGE_STATUS:
+            self.breaker.failure()
+            raise ServiceUnavailable((payload or {}).get("error", f"HTTP {resp.status}"), resp.status)
+        self.breaker.success()              # any other answer, a 500 included, means the service is up
+        if resp.status == 404:
+            return None
+        if resp.status >= 400:
+            raise ServiceError((payload or {}).get("error", f"HTTP {resp.status}"), resp.status)
+        return payload
+
+    @timed()
+    def list_machines(self) -> List[dict]:
+        return self._call("GET", "/machines") or []
+
+    @timed()
+    def get_machine_by_sn(self, sn: str) -> Optional[dict]:
+        return self._call("GET", "/machines/" + quote(sn, safe=""))
+
+    @timed()
+    def connect_info(self, sn: str, date_s: str, slot: int) -> Optional[dict]:
+        return self._call("GET", "/machines/" + quote(sn, safe="") + "?" + urlencode({"date": date_s, "slot": slot}))
+
+    @timed()
+    def machines_fingerprint(self) -> str:
+        return (self._call("GET", "/machines?fingerprint=1") or {}).get("fingerprint", "")
+
+    @timed()
+    def bookings_of(self, machine_id: Optional[int] = None,
+                    date_s: Optional[str] = None) -> List[dict]:
+        q = {k: v for k, v in (("machine_id", machine_id), ("date", date_s)) if v is not None}
+        return self._call("GET", "/snapshot" + ("?" + urlencode(q) if q else "")) or []
+
+    @timed()
+    def bookings_between(self, date_from: str, date_to: str,
+                         machine_ids: Optional[List[int]] = None) -> List[dict]:
+        q = {"from": date_from, "to": date_to}
+        if machine_ids: q["machine_ids"] = ",".join(str(m) for m in machine_ids)
+        return self._call("GET", "/snapshot?" + urlencode(q)) or []
+
+    @timed()
+    def my_bookings(self, wwid: str, date_from: str) -> List[dict]:
+        return self._call("GET", "/snapshot?" + urlencode({"wwid": wwid, "from": date_from})) or []
+
+    @timed()
+    def insert_booking(self, machine_id: int, date_s: str, slot_i: int,
+                       display_name: str, wwid: str) -> bool:
+        res = self._call("POST", "/book", {"machine_id": machine_id, "date": date_s, "slots": [int(slot_i)],
+                                           "display_name": display_name, "wwid": wwid})
+        return int(slot_i) in (res or {}).get("booked", [])
+
+    @timed()
+    def delete_bookings(self, machine_id: int, date_s: str, slots: List[int]) -> int:
+        if not slots:
+            return 0
+        res = self._call("POST", "/cancel", {"machine_id": machine_id, "date": date_s,
+                                             "slots": [int(s) for s in slots]})
+        return int((res or {}).get("cancelled", 0))
+
+    @timed()
+    def apply_ops(self, ops: List[dict], atomic: bool = False) -> List[dict]:
+        return self._call("POST", "/apply", {"ops": ops, "atomic": atomic}) or []
+
+    @timed()
+    def record_connections(self, rows: List[dict]) -> int:
+        if not rows:
+            return 0
+        return int((self._call("POST", "/connections", {"rows": rows}) or {}).get("recorded", 0))
+
+def make_repo(backend: Optional[str] = None) -> Repo:
+    """Build the repository selected by DB_Config_sample.BACKEND (or `backend`)."""
+    name = (backend or getattr(_cfg, "BACKEND", "mysql") or "mysql").strip().lower()
+    if name == "mysql":
+        return MySQLRepo()
+    if name == "sqlite":
+        return SQLiteRepo()
+    if name == "http":
+        return HttpRepo()
+    raise ValueError(f"Unknown repository backend: {name}")
@@ -0,0 +1,103 @@
+# Sweeper.py — release bookings whose owner never connected, Python 3.8
+#
+#   python Sweeper.py init                      # create connections / booking_releases (MySQL)
+#   python Sweeper.py once [--grace 15]         # sweep the current hour now
+#   python Sweeper.py run [--interval 60]       # keep sweeping
+#   python Sweeper.py report [--days 7]         # what was released
+#
+# A booked hour is released when, `grace` minutes after it started, its owner has not
+# launched a VNC connection to that machine (connect events come from the desktop
+# client's Connect button). An hour that continues the owner's booking of the previous
+# hour is kept. Each sweep is one transaction of set-based statements however many
+# machines there are, every release is written to booking_releases, and the sweep time
+# and release counts are published as QUERY_STATS gauges (sweeper_*).
+import argparse, logging, time, uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import DB_Config_sample
+from Metrics import QUERY_STATS
+from Repo import Repo, SQLiteRepo, make_repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.sweeper")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+
+class Sweeper:
+    """Sweeps each hour once, at the first call at or after minute `grace_min`."""
+
+    def __init__(self, repo: Repo, grace_min: int = 15):
+        self.repo = repo
+        self.grace_min = grace_min
+        self.last: Optional[str] = None         # "YYYY-MM-DD HH" of the last hour swept
+        self.runs = 0
+        self.released = 0
+
+    def due(self, now: datetime) -> bool:
+        return now.minute >= self.grace_min and now.strftime("%Y-%m-%d %H") != self.last
+
+    def sweep(self, now: Optional[datetime] = None, force: bool = False) -> List[dict]:
+        now = now or datetime.now(TZ)
+        if not force and not self.due(now):
+            return []
+        start = now.replace(minute=0, second=0, microsecond=0)
+        t0 = time.perf_counter()
+        rows = self.repo.sweep_unused(now.date().isoformat(), now.hour, start.strftime("%Y-%m-%d %H:%M:%S"),
+                                      uuid.uuid4().hex, now.strftime("%Y-%m-%d %H:%M:%S"))
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.last = now.strftime("%Y-%m-%d %H")
+        self.runs += 1
+        self.released += len(rows)
+        QUERY_STATS.set_gauge("sweeper_runs", self.runs)
+        QUERY_STATS.set_gauge("sweeper_released", self.released)
+        QUERY_STATS.set_gauge("sweeper_last_released", len(rows))
+        QUERY_STATS.set_gauge("sweeper_last_ms", round(ms, 1))
+        if rows:
+            log.info("released %d unused booking(s) of %s %d:00 in %.0f ms", len(rows), now.date(), now.hour, ms)
+        return rows
+
+def main(argv=None):
+    cfg = getattr(DB_Config_sample, "SWEEPER", {})
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking no-show sweeper")
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("--grace", type=int, default=int(cfg.get("grace_min", 15)), help="minutes after slot start")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init", help="create connections / booking_releases if missing")
+    sub.add_parser("once", help="sweep the current hour now")
+    p = sub.add_parser("run", help="sweep every hour, checking every --interval seconds")
+    p.add_argument("--interval", type=float, default=float(cfg.get("interval_s", 60)))
+    p = sub.add_parser("report", help="list releases")
+    p.add_argument("--days", type=int, default=7)
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+    sw = Sweeper(repo, a.grace)
+
+    if a.cmd == "init":
+        repo.create_usage_schema()
+        print("ok")
+    elif a.cmd == "once":
+        for r in sw.sweep(force=True):
+            print(f"released machine {r['machine_id']} {r['date']} {r['slot']}:00 of {r['display_name']} ({r['wwid']})")
+    elif a.cmd == "run":
+        while True:
+            try:
+                sw.sweep()
+            except DB_ERRORS as e:
+                log.warning("sweep failed: %s", e)
+            time.sleep(a.interval)
+    elif a.cmd == "report":
+        since = (datetime.now(TZ) - timedelta(days=a.days)).strftime("%Y-%m-%d %H:%M:%S")
+        rows = repo.releases_since(since)
+        for r in rows:
+            print(f"{r['released_at']}  {r['sn']:<12} {r['date']} {int(r['slot']):>2}:00  {r['display_name']} ({r['wwid']})")
+        print(f"{len(rows)} release(s) since {since}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
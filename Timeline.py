@@ -0,0 +1,231 @@
+# Timeline.py — multi-day booking timeline (machines x 15 days x 24 h), PySide6 6.5.3 / Python 3.8
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QDate, QPoint, QRect, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen
+from PySide6.QtWidgets import (
+    QAbstractScrollArea, QComboBox, QDialog, QHBoxLayout, QLabel, QPushButton, QToolTip, QVBoxLayout, QWidget
+)
+
+from Occupancy import DayOccupancy, FULL_DAY, hours_mask, section_of
+from Repo import DB_ERRORS
+
+FREE   = QColor("#1e90ff")
+BOOKED = QColor("#dc143c")
+MINE   = QColor("#10b981")
+PAST   = QColor("#B6B6B6")
+GRID   = QColor("#ffffff")
+DAY    = QColor("#303030")
+
+class TimelineView(QAbstractScrollArea):
+    """Custom-painted grid; only the visible rows/columns are drawn, as runs of equal cells."""
+    cell_activated = Signal(str, QDate, int)           # sn, date, hour (double click)
+
+    CELL_W, ROW_H, LABEL_W, HEAD_H = 14, 22, 90, 34
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.machines: List[dict] = []
+        self.days: List[QDate] = []
+        self.occ: Dict[str, DayOccupancy] = {}
+        self.wwid = ""
+        self.now: Tuple[QDate, int] = (QDate(), 0)
+        self._day_occ: List[Optional[DayOccupancy]] = []     # per column day, resolved once per set_data
+        self._past: List[int] = []
+        self.viewport().setMouseTracking(True)
+        self._font = QFont(); self._font.setPointSize(9)
+        self._bold = QFont(self._font); self._bold.setBold(True)
+
+    def set_data(self, machines: List[dict], days: List[QDate], occ: Dict[str, DayOccupancy], wwid: str,
+                 now: Tuple[QDate, int]):
+        self.machines, self.days, self.occ, self.wwid, self.now = machines, days, occ, wwid, now
+        today, h = now
+        self._day_occ = [occ.get(d.toString("yyyy-MM-dd")) for d in days]
+        self._past = [FULL_DAY if d < today else hours_mask(0, h - 1) if d == today else 0 for d in days]
+        self._relayout()
+        self.viewport().update()
+
+    def _relayout(self):
+        vp = self.viewport().size()
+        w = len(self.days) * 24 * self.CELL_W
+        h = len(self.machines) * self.ROW_H
+        self.horizontalScrollBar().setRange(0, max(0, w - (vp.width() - self.LABEL_W)))
+        self.horizontalScrollBar().setPageStep(max(1, vp.width() - self.LABEL_W))
+        self.horizontalScrollBar().setSingleStep(self.CELL_W * 3)
+        self.verticalScrollBar().setRange(0, max(0, h - (vp.height() - self.HEAD_H)))
+        self.verticalScrollBar().setPageStep(max(1, vp.height() - self.HEAD_H))
+        self.verticalScrollBar().setSingleStep(self.ROW_H)
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self._relayout()
+
+    def scroll_to_day(self, i: int):
+        self.horizontalScrollBar().setValue(i * 24 * self.CELL_W)
+
+    def _cell_at(self, pos: QPoint) -> Optional[Tuple[int, int, int]]:
+        """(row, day index, hour) under a viewport position."""
+        if pos.x() < self.LABEL_W or pos.y() < self.HEAD_H:
+            return None
+        col = (pos.x() - self.LABEL_W + self.horizontalScrollBar().value()) // self.CELL_W
+        row = (pos.y() - self.HEAD_H + self.verticalScrollBar().value()) // self.ROW_H
+        if row >= len(self.machines) or col >= len(self.days) * 24:
+            return None
+        return row, col // 24, col % 24
+
+    def _state(self, mid: int, day: int, hour: int) -> QColor:
+        bit = 1 << hour
+        if self._past[day] & bit:
+            return PAST
+        occ = self._day_occ[day]
+        if occ is None or not occ.busy(mid) & bit:
+            return FREE
+        return MINE if occ.who.get((mid, hour), ("", ""))[1] == self.wwid else BOOKED
+
+    def paintEvent(self, e):
+        p = QPainter(self.viewport())
+        vp = self.viewport().rect()
+        x0, y0 = self.horizontalScrollBar().value(), self.verticalScrollBar().value()
+        cw, rh = self.CELL_W, self.ROW_H
+        ncols = len(self.days) * 24
+        c0 = max(0, x0 // cw); c1 = min(ncols, (x0 + vp.width() - self.LABEL_W) // cw + 1)
+        r0 = max(0, y0 // rh); r1 = min(len(self.machines), (y0 + vp.height() - self.HEAD_H) // rh + 1)
+        p.fillRect(vp, GRID)
+
+        p.save()
+        p.setClipRect(QRect(self.LABEL_W, self.HEAD_H, vp.width() - self.LABEL_W, vp.height() - self.HEAD_H))
+        for r in range(r0, r1):
+            mid = int(self.machines[r]["id"])
+            y = self.HEAD_H + r * rh - y0
+            c = c0
+            while c < c1:                               # one rect per run of equal cells
+                color = self._state(mid, c // 24, c % 24)
+                e_ = c + 1
+                while e_ < c1 and self._state(mid, e_ // 24, e_ % 24) == color:
+                    e_ += 1
+                p.fillRect(self.LABEL_W + c * cw - x0, y + 1, (e_ - c) * cw - 1, rh - 2, color)
+                c = e_
+        p.setPen(QPen(DAY, 1))
+        for d in range(c0 // 24, c1 // 24 + 1):
+            x = self.LABEL_W + d * 24 * cw - x0
+            p.drawLine(x, self.HEAD_H, x, vp.height())
+        p.restore()
+
+        # header: dates and hours
+        p.setFont(self._bold)
+        fm = QFontMetrics(self._bold)
+        p.save()
+        p.setClipRect(QRect(self.LABEL_W, 0, vp.width() - self.LABEL_W, self.HEAD_H))
+        for d in range(c0 // 24, min(len(self.days), c1 // 24 + 1)):
+            x = self.LABEL_W + d * 24 * cw - x0
+            p.setPen(DAY)
+            p.drawText(x + 4, fm.ascent() + 2, self.days[d].toString("MM-dd ddd"))
+        p.setFont(self._font)
+        for c in range(c0 - c0 % 3, c1, 3):
+            p.drawText(self.LABEL_W + c * cw - x0 + 1, self.HEAD_H - 4, str(c % 24))
+        p.restore()
+
+        # row labels
+        p.save()
+        p.setClipRect(QRect(0, self.HEAD_H, self.LABEL_W, vp.height() - self.HEAD_H))
+        p.setFont(self._font); p.setPen(DAY)
+        for r in range(r0, r1):
+            y = self.HEAD_H + r * rh - y0
+            p.drawText(QRect(4, y, self.LABEL_W - 8, rh), Qt.AlignVCenter | Qt.AlignLeft, self.machines[r]["sn"])
+        p.restore()
+
+    def mouseMoveEvent(self, e):
+        hit = self._cell_at(e.position().toPoint())
+        if hit is None:
+            QToolTip.hideText(); return
+        r, d, h = hit
+        m = self.machines[r]
+        occ = self._day_occ[d]
+        who = occ.who.get((int(m["id"]), h)) if occ else None
+        text = f"{m['sn']} {self.days[d].toString('yyyy-MM-dd')} {h}:00"
+        if who:
+            text += f"\n{who[0]} ({who[1]})"
+        QToolTip.showText(e.globalPosition().toPoint(), text, self.viewport())
+
+    def mouseDoubleClickEvent(self, e):
+        hit = self._cell_at(e.position().toPoint())
+        if hit is not None:
+            r, d, h = hit
+            self.cell_activated.emit(self.machines[r]["sn"], self.days[d], h)
+
+class TimelineDialog(QDialog):
+    """One bookings_between() call for the whole window of the chosen machines."""
+
+    def __init__(self, repo, machines: Callable[[], List[dict]], today: Callable[[], QDate],
+                 now_hour: Callable[[], int], wwid: str = "", parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("Timeline")
+        self.repo = repo
+        self._machines = machines
+        self._today = today
+        self._now_hour = now_hour
+        self.wwid = wwid
+        self.scope = QComboBox()
+        self.status = QLabel()
+        self.view = TimelineView()
+        btn_refresh = QPushButton("Refresh")
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Show")); top.addWidget(self.scope); top.addWidget(self.status, 1); top.addWidget(btn_refresh)
+        v = QVBoxLayout(self)
+        v.addLayout(top); v.addWidget(self.view, 1)
+        self.resize(1000, 420)
+        self.scope.currentIndexChanged.connect(self.reload)
+        btn_refresh.clicked.connect(self.reload)
+        self.cell_activated = self.view.cell_activated
+
+    def open_for(self, sn: Optional[str]):
+        secs = sorted({section_of(m["sn"]) for m in self._machines()})
+        self.scope.blockSignals(True)
+        self.scope.clear()
+        if sn:
+            self.scope.addItem(sn, ("sn", sn))
+        for s in secs:
+            self.scope.addItem(f"Section {s}", ("section", s))
+        self.scope.addItem("All machines", ("all", None))
+        if sn:
+            self.scope.setCurrentIndex(0)
+        self.scope.blockSignals(False)
+        self.reload()
+        self.show(); self.raise_(); self.activateWindow()
+
+    def _chosen(self) -> List[dict]:
+        kind, val = self.scope.currentData() or ("all", None)
+        ms = self._machines()
+        if kind == "sn":
+            return [m for m in ms if m["sn"] == val]
+        if kind == "section":
+            return [m for m in ms if section_of(m["sn"]) == val]
+        return list(ms)
+
+    def reload(self):
+        today = self._today()
+        days = [today.addDays(i) for i in range(15)]
+        ms = self._chosen()
+        occ = {d.toString("yyyy-MM-dd"): DayOccupancy(d.toString("yyyy-MM-dd")) for d in days}
+        if ms:
+            try:
+                rows = self.repo.bookings_between(days[0].toString("yyyy-MM-dd"), days[-1].toString("yyyy-MM-dd"),
+                                                  [int(m["id"]) for m in ms])
+            except DB_ERRORS as e:
+                self.status.setText(f"Database unavailable: {e}")
+                return
+            for r in rows:
+                o = occ.get(str(r["date"]))
+                if o is not None:
+                    o.set(int(r["machine_id"]), int(r["slot"]), r.get("display_name") or "", r.get("wwid") or "")
+        booked = sum(len(o.who) for o in occ.values())
+        self.status.setText(f"{len(ms)} machine(s) · {days[0].toString('MM-dd')}..{days[-1].toString('MM-dd')} "
+                            f"· {booked} booked hour(s)")
+        self.view.set_data(ms, days, occ, self.wwid, (today, self._now_hour()))
+
+    def apply_deltas(self, deltas: list):
+        if not self.isVisible():
+            return
+        for o in self.view.occ.values():
+            o.apply_deltas(deltas)
+        self.view.viewport().update()
@@ -0,0 +1,111 @@
+# Trace.py — opt-in Chrome trace-event timeline (open the JSON in chrome://tracing or ui.perfetto.dev)
+import functools, json, logging, os, threading, time
+from collections import deque
+from typing import Callable, Optional
+
+log = logging.getLogger("RemoteVNCBooking.trace")
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullSpan()
+
+class _Span:
+    __slots__ = ("_tr", "name", "cat", "args", "_t0")
+
+    def __init__(self, tr: "Tracer", name: str, cat: str, args: Optional[dict]):
+        self._tr = tr; self.name = name; self.cat = cat; self.args = args
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        t1 = time.perf_counter()
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self._tr._complete(self.name, self.cat, self._t0, t1, args)
+        return False
+
+class Tracer:
+    """Collects complete ("X") events in a bounded ring; disabled by default."""
+
+    def __init__(self, max_events: int = 200_000):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._events = deque(maxlen=max_events)
+        self._threads = {}
+        self._pid = os.getpid()
+        self._epoch = time.perf_counter()
+
+    def start(self, path: Optional[str] = None):
+        self.path = path or self.path
+        self.enabled = True
+        log.info("tracing enabled -> %s", self.path or "(in memory)")
+
+    def stop(self):
+        self.enabled = False
+
+    def span(self, name: str, cat: str = "app", **args):
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, cat, args or None)
+
+    def traced(self, name: Optional[str] = None, cat: str = "app") -> Callable:
+        def deco(fn):
+            label = name or fn.__name__
+            @functools.wraps(fn)
+            def wrapper(*a, **kw):
+                if not self.enabled:
+                    return fn(*a, **kw)
+                with _Span(self, label, cat, None):
+                    return fn(*a, **kw)
+            return wrapper
+        return deco
+
+    def instant(self, name: str, cat: str = "app", **args):
+        if self.enabled:
+            self._events.append({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._us(time.perf_counter()),
+                                 "pid": self._pid, "tid": self._tid(), "args": args})
+
+    def _us(self, t: float) -> float:
+        return round((t - self._epoch) * 1e6, 1)
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    def _complete(self, name: str, cat: str, t0: float, t1: float, args: Optional[dict]):
+        ev = {"name": name, "cat": cat, "ph": "X", "ts": self._us(t0), "dur": round((t1 - t0) * 1e6, 1),
+              "pid": self._pid, "tid": self._tid()}
+        if args:
+            ev["args"] = args
+        self._events.append(ev)
+
+    def clear(self):
+        self._events.clear()
+
+    def save(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.path
+        if not path or not self._events:
+            return None
+        meta = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": n}}
+                for tid, n in list(self._threads.items())]
+        meta.append({"name": "process_name", "ph": "M", "pid": self._pid, "tid": 0, "args": {"name": "RemoteVNCBooking"}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + list(self._events), "displayTimeUnit": "ms"}, f, default=str)
+        log.info("trace written: %s (%d events)", path, len(self._events))
+        return path
+
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced
@@ -0,0 +1,215 @@
+# Transfer.py — streaming export / import of machines and bookings (CSV or JSON Lines), Python 3.8
+#
+#   python Transfer.py export machines machines.csv
+#   python Transfer.py export bookings bookings.jsonl [--from 2026-01-01] [--to 2026-12-31]
+#   python Transfer.py --sqlite bench.db import machines machines.csv [--batch 1000]
+#   python Transfer.py --sqlite bench.db import bookings bookings.jsonl       # resumes where it stopped
+#
+# Export reads through an unbuffered server-side cursor (SSCursor on MySQL) and writes
+# each chunk as it arrives, so memory stays flat whatever the table size. Bookings are
+# written with the machine sn instead of machine_id, so a dump loads into a site whose
+# ids differ (import the machines first). Import upserts --batch rows per multi-row
+# statement and transaction — machines on sn, bookings on (machine, date, slot) — so
+# loading a file twice is harmless. After every committed batch the row count is
+# checkpointed in FILE.progress; a re-run against the same database skips those rows
+# (--restart ignores the checkpoint). Columns missing from a file are left alone.
+import argparse, csv, itertools, json, logging, os, time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import DB_Config_sample
+from Repo import Repo, SQLiteRepo, make_repo, DB_ERRORS
+
+log = logging.getLogger("RemoteVNCBooking.transfer")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+TABLES = ("machines", "bookings")
+KEYS = {"machines": ("sn",), "bookings": ("machine_id", "date", "slot")}
+STAMPS = ("data_create_at", "data_update_at")
+
+def format_of(path: str, fmt: Optional[str] = None) -> str:
+    return fmt or ("jsonl" if Path(path).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv")
+
+class Progress:
+    """Logs rows done and rate at most every `every_s` seconds."""
+
+    def __init__(self, what: str, every_s: float = 2.0, start: int = 0):
+        self.what = what
+        self.every_s = every_s
+        self.n = start
+        self._start = start
+        self._t0 = self._last = time.monotonic()
+
+    def tick(self, n: int):
+        self.n += n
+        now = time.monotonic()
+        if now - self._last >= self.every_s:
+            self._last = now
+            log.info("%s: %d row(s), %.0f rows/s", self.what, self.n, (self.n - self._start) / (now - self._t0))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._t0
+
+class Checkpoint:
+    """FILE.progress: how many rows of FILE are committed in `target`. It only counts for
+    the same file (size, mtime), table and target database."""
+
+    def __init__(self, src: str, table: str, target: str):
+        st = os.stat(src)
+        self.path = Path(src + ".progress")
+        self.key = {"table": table, "target": target, "size": st.st_size, "mtime": int(st.st_mtime)}
+
+    def load(self) -> int:
+        try:
+            s = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+        return int(s.get("rows", 0)) if all(s.get(k) == v for k, v in self.key.items()) else 0
+
+    def save(self, rows: int):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dict(self.key, rows=rows), f); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+def export_table(repo: Repo, table: str, path: str, fmt: str, chunk: int = 20000,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None) -> int:
+    """Stream `table` into `path` (written as PATH.part, renamed when complete)."""
+    if table == "machines":
+        cols, parts = repo.MACHINE_COLS, repo.export_machines(chunk)
+    else:
+        cols, parts = repo.BOOKING_COLS, repo.export_bookings(date_from, date_to, chunk)
+    prog = Progress(f"export {table}")
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            w = csv.writer(f)
+            w.writerow(cols)
+            for rows in parts:
+                w.writerows([["" if v is None else str(v) for v in r] for r in rows])
+                prog.tick(len(rows))
+        else:
+            for rows in parts:
+                f.write("".join(json.dumps(dict(zip(cols, r)), ensure_ascii=False, default=str) + "\n" for r in rows))
+                prog.tick(len(rows))
+    os.replace(tmp, path)
+    return prog.n
+
+def read_records(path: str, fmt: str) -> Iterator[dict]:
+    """Lazily yield records; empty CSV fields come back as None."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for r in csv.DictReader(f):
+                yield {k: (v if v != "" else None) for k, v in r.items()}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def import_table(repo: Repo, table: str, path: str, fmt: str, batch: int = 1000,
+                 target: str = "", restart: bool = False) -> dict:
+    """Upsert the records of `path` in batches; returns {"rows", "resumed_at", "unknown_sn", "seconds"}.
+    A DB error stops the import with the checkpoint at the last committed batch."""
+    ck = Checkpoint(path, table, target)
+    skip = 0 if restart else ck.load()
+    if skip:
+        log.info("%s: resuming after %d row(s) already imported", path, skip)
+    src = itertools.islice(read_records(path, fmt), skip, None)
+    first = next(src, None)
+    if first is None:
+        ck.clear()
+        return {"rows": 0, "resumed_at": skip, "unknown_sn": [], "seconds": 0.0}
+    if "sn" not in first:
+        raise ValueError(f"{path}: no 'sn' column")
+    src = itertools.chain([first], src)
+    if table == "machines":
+        cols: List[str] = [c for c in repo.MACHINE_COLS if c in first]
+        ids = {}
+    else:
+        missing = {"date", "slot"} - set(first)
+        if missing:
+            raise ValueError(f"{path}: no {', '.join(sorted(missing))} column")
+        cols = ["machine_id"] + [c for c in repo.BOOKING_COLS[1:] if c in first]
+        ids = {m["sn"]: int(m["id"]) for m in repo.inventory()}        # retired machines keep their history
+    now = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    done, unknown = skip, set()
+    prog = Progress(f"import {table}", start=skip)
+    while True:
+        recs = list(itertools.islice(src, max(1, batch)))
+        if not recs:
+            break
+        rows = []
+        for r in recs:
+            if table == "machines":
+                rows.append(tuple((r.get(c) or now) if c in STAMPS else r.get(c) for c in cols))
+            elif r.get("sn") in ids:
+                rows.append((ids[r["sn"]], str(r["date"]), int(r["slot"]), *(r.get(c) for c in cols[3:])))
+            else:
+                unknown.add(r.get("sn"))
+        repo.upsert_rows(table, cols, KEYS[table], rows)
+        done += len(recs)
+        ck.save(done)
+        prog.tick(len(recs))
+    ck.clear()
+    return {"rows": done - skip, "resumed_at": skip, "unknown_sn": sorted(unknown, key=str), "seconds": prog.elapsed()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking export / import")
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="stream a table to a file")
+    p.add_argument("table", choices=TABLES)
+    p.add_argument("file")
+    p.add_argument("--from", dest="date_from", help="bookings: first date")
+    p.add_argument("--to", dest="date_to", help="bookings: last date")
+    p.add_argument("--chunk", type=int, default=20000, help="rows fetched per round trip")
+    p = sub.add_parser("import", help="upsert a file into a table")
+    p.add_argument("table", choices=TABLES)
+    p.add_argument("file")
+    p.add_argument("--batch", type=int, default=1000, help="rows per statement and transaction")
+    p.add_argument("--restart", action="store_true", help="ignore FILE.progress and start from the top")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+    fmt = format_of(a.file, a.format)
+
+    if a.cmd == "export":
+        t0 = time.monotonic()
+        n = export_table(repo, a.table, a.file, fmt, a.chunk, a.date_from, a.date_to)
+        print(f"exported {n} {a.table} row(s) to {a.file} in {time.monotonic() - t0:.1f} s")
+    elif a.cmd == "import":
+        if a.sqlite:
+            target = "sqlite:" + os.path.abspath(a.sqlite)
+        else:
+            db = getattr(DB_Config_sample, "DB", {})
+            target = f"{repo.backend}:{db.get('host', '')}:{db.get('port', '')}/{db.get('database', db.get('db', ''))}"
+        try:
+            r = import_table(repo, a.table, a.file, fmt, a.batch, target, a.restart)
+        except DB_ERRORS as e:
+            print(f"import stopped: {e}\nre-run the same command to continue from the last committed batch")
+            return 1
+        except ValueError as e:
+            print(e); return 2
+        print(f"imported {r['rows']} {a.table} row(s) from {a.file}"
+              + (f" (resumed after {r['resumed_at']})" if r["resumed_at"] else "")
+              + f" in {r['seconds']:.1f} s")
+        if r["unknown_sn"]:
+            print(f"skipped bookings of {len(r['unknown_sn'])} unknown machine(s): "
+                  + ", ".join(map(str, r["unknown_sn"][:20])) + (" …" if len(r["unknown_sn"]) > 20 else ""))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
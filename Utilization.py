@@ -0,0 +1,238 @@
+# Utilization.py — per-machine / per-section utilization report over a date range (NumPy), Python 3.8
+#
+#   python Utilization.py --weeks 4 --out last4w.html
+#   python Utilization.py --from 2026-09-01 --to 2026-09-30 --out sept.csv
+#   python Utilization.py --backend sqlite --sqlite lab.db --months 3
+#
+# booked h      booked hours in the range
+# used h        booked hours whose owner launched a viewer on that machine during the hour
+#               or earlier in the same run of consecutive booked hours (the sweeper's rule)
+# idle-booked h booked - used
+# connected h   distinct hours in which anyone launched a viewer on the machine
+# peak hours    hours of the day with the highest share of the section's machines booked
+#               (machine rows: of the days the machine was booked in that hour)
+#
+# Bookings and connect events are streamed from unbuffered cursors in fixed-size chunks;
+# each chunk is turned into NumPy arrays and folded into bincount accumulators, so
+# memory stays at one chunk plus the connect-event keys whatever the history size.
+import argparse, csv, html, logging, time
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:                     # only this report needs it
+    np = None
+
+import DB_Config_sample
+from Occupancy import section_of
+from Repo import Repo, SQLiteRepo, make_repo
+
+log = logging.getLogger("RemoteVNCBooking.utilization")
+
+TZ = timezone(timedelta(hours=8))       # Asia/Taipei, no DST
+W_BITS = 21                             # wwid code bits in the (hour, wwid) join key
+
+class _Codes:
+    """wwid -> small int, shared by the booking and connection streams."""
+
+    def __init__(self):
+        self.map: Dict[str, int] = {"": 0}
+
+    def encode(self, col) -> "np.ndarray":
+        uniq, inv = np.unique(col, return_inverse=True)
+        lut = np.fromiter((self.map.setdefault(u, len(self.map)) for u in uniq), np.int64, len(uniq))
+        return lut[inv]
+
+def _columns(rows: list, n: int) -> "np.ndarray":
+    return np.array(rows, dtype=object).reshape(len(rows), n)
+
+def _peaks(share: "np.ndarray", n: int = 3) -> str:
+    """The `n` hours of the day with the highest booked share, e.g. "9:00 (80%), 10:00 (75%)"."""
+    top = [h for h in np.argsort(-share, kind="stable")[:n] if share[h] > 0]
+    return ", ".join(f"{h}:00 ({100 * share[h]:.0f}%)" for h in top)
+
+class UtilizationReport:
+    def __init__(self, machines: List[dict], date_from: date, date_to: date):
+        self.machines = sorted(machines, key=lambda m: m["sn"])
+        self.date_from, self.date_to = date_from, date_to
+        self.ndays = (date_to - date_from).days + 1
+        ids = np.array([int(m["id"]) for m in self.machines], np.int64)
+        self._idx = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, np.int64)
+        self._idx[ids] = np.arange(len(ids))
+        self.sections = sorted({section_of(m["sn"]) for m in self.machines})
+        self.sec_of = np.array([self.sections.index(section_of(m["sn"])) for m in self.machines], np.int64)
+        M, S = len(self.machines), len(self.sections)
+        self.booked = np.zeros(M, np.int64)
+        self.used = np.zeros(M, np.int64)
+        self.connected = np.zeros(M, np.int64)
+        self.sec_hour = np.zeros(S * 24, np.int64)      # booked machine-hours per section x hour of day
+        self.m_hour = np.zeros(M * 24, np.int64)        # booked days per machine x hour of day
+        self.rows = 0
+        self.seconds = 0.0
+        self._codes = _Codes()
+        self._conn_keys = np.zeros(0, np.int64)
+        self._carry = None                              # (mid, day, slot, w, used) of the previous chunk's last row
+
+    def _index(self, mid: "np.ndarray") -> "np.ndarray":
+        ok = (mid >= 0) & (mid < len(self._idx))
+        out = np.full(len(mid), -1, np.int64)
+        out[ok] = self._idx[mid[ok]]
+        return out
+
+    def load_connections(self, chunks):
+        keys, hours = [], []
+        for rows in chunks:
+            a = _columns(rows, 3)
+            idx = self._index(a[:, 0].astype(np.int64))
+            h = a[:, 1].astype(np.int64)
+            ok = (idx >= 0) & (h >= 0) & (h < self.ndays * 24)
+            hk = idx[ok] * (self.ndays * 24) + h[ok]
+            w = self._codes.encode(np.where(a[ok, 2] == None, "", a[ok, 2]).astype(str))   # noqa: E711
+            keys.append(np.unique((hk << W_BITS) | w))
+            hours.append(np.unique(hk))
+        if keys:
+            self._conn_keys = np.unique(np.concatenate(keys))
+            hk = np.unique(np.concatenate(hours))
+            self.connected = np.bincount(hk // (self.ndays * 24), minlength=len(self.machines))
+
+    def add_bookings(self, rows: list):
+        a = _columns(rows, 4)
+        mid = a[:, 0].astype(np.int64); day = a[:, 1].astype(np.int64); slot = a[:, 2].astype(np.int64)
+        w = self._codes.encode(np.where(a[:, 3] == None, "", a[:, 3]).astype(str))   # noqa: E711
+        n = len(mid)
+        start = np.ones(n, bool)                    # first row of a run of consecutive hours, same owner
+        start[1:] = ~((mid[1:] == mid[:-1]) & (day[1:] == day[:-1]) & (slot[1:] == slot[:-1] + 1) & (w[1:] == w[:-1]))
+        c = self._carry
+        if c is not None and (mid[0], day[0], slot[0] - 1, w[0]) == c[:4]:
+            start[0] = False
+        idx = self._index(mid)
+        hk = idx * (self.ndays * 24) + day * 24 + slot
+        keys = (hk << W_BITS) | w
+        pos = np.searchsorted(self._conn_keys, keys)
+        pos[pos >= len(self._conn_keys)] = 0
+        has = (self._conn_keys[pos] == keys) if len(self._conn_keys) else np.zeros(n, bool)
+        i = np.arange(n)
+        run_start = np.maximum.accumulate(np.where(start, i, 0))
+        used = np.maximum.accumulate(np.where(has, i, -1)) >= run_start
+        if not start[0] and c is not None and c[4]:
+            used[run_start == 0] = True             # the run began (and was used) in the previous chunk
+        self._carry = (mid[-1], day[-1], slot[-1], w[-1], bool(used[-1]))
+
+        ok = (idx >= 0) & (day >= 0) & (day < self.ndays)
+        M = len(self.machines)
+        self.booked += np.bincount(idx[ok], minlength=M)
+        self.used += np.bincount(idx[ok & used], minlength=M)
+        self.sec_hour += np.bincount(self.sec_of[idx[ok]] * 24 + slot[ok], minlength=len(self.sections) * 24)
+        self.m_hour += np.bincount(idx[ok] * 24 + slot[ok], minlength=M * 24)
+        self.rows += n
+
+    def run(self, repo: Repo, chunk: int = 50000) -> "UtilizationReport":
+        t0 = time.perf_counter()
+        d0, d1 = self.date_from.isoformat(), self.date_to.isoformat()
+        self.load_connections(repo.stream_connections(d0, d1, chunk))
+        for rows in repo.stream_bookings(d0, d1, chunk):
+            self.add_bookings(rows)
+        self.seconds = time.perf_counter() - t0
+        log.info("%d booking rows, %d connect keys in %.2f s", self.rows, len(self._conn_keys), self.seconds)
+        return self
+
+    # results
+    def machine_rows(self) -> List[dict]:
+        cap = self.ndays * 24
+        share = self.m_hour.reshape(len(self.machines), 24) / self.ndays
+        return [{"level": "machine", "name": m["sn"], "section": self.sections[self.sec_of[i]], "machines": 1,
+                 "booked_h": int(self.booked[i]), "used_h": int(self.used[i]),
+                 "idle_booked_h": int(self.booked[i] - self.used[i]), "connected_h": int(self.connected[i]),
+                 "utilization_pct": round(float(100.0 * self.booked[i] / cap), 1),
+                 "used_pct": round(float(100.0 * self.used[i] / self.booked[i]), 1) if self.booked[i] else 0.0,
+                 "peak_hours": _peaks(share[i])} for i, m in enumerate(self.machines)]
+
+    def section_rows(self) -> List[dict]:
+        S = len(self.sections)
+        n = np.bincount(self.sec_of, minlength=S)
+        booked = np.bincount(self.sec_of, weights=self.booked, minlength=S).astype(np.int64)
+        used = np.bincount(self.sec_of, weights=self.used, minlength=S).astype(np.int64)
+        conn = np.bincount(self.sec_of, weights=self.connected, minlength=S).astype(np.int64)
+        share = self.sec_hour.reshape(S, 24) / np.maximum(1, n * self.ndays)[:, None]
+        out = []
+        for s, name in enumerate(self.sections):
+            out.append({"level": "section", "name": name, "section": name, "machines": int(n[s]),
+                        "booked_h": int(booked[s]), "used_h": int(used[s]), "idle_booked_h": int(booked[s] - used[s]),
+                        "connected_h": int(conn[s]),
+                        "utilization_pct": round(float(100.0 * booked[s] / max(1, n[s] * self.ndays * 24)), 1),
+                        "used_pct": round(float(100.0 * used[s] / booked[s]), 1) if booked[s] else 0.0,
+                        "peak_hours": _peaks(share[s])})
+        return out
+
+FIELDS = ["level", "name", "section", "machines", "booked_h", "used_h", "idle_booked_h", "connected_h",
+          "utilization_pct", "used_pct", "peak_hours"]
+
+def write_csv(rep: UtilizationReport, path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rep.section_rows() + rep.machine_rows())
+
+def write_html(rep: UtilizationReport, path: str):
+    def table(rows: List[dict], cols: List[str]) -> str:
+        head = "".join(f"<th>{c}</th>" for c in cols)
+        body = "".join("<tr>" + "".join(f"<td>{html.escape(str(r[c]))}</td>" for c in cols) + "</tr>" for r in rows)
+        return f"<table><tr>{head}</tr>{body}</table>"
+    S = len(rep.sections)
+    n = np.maximum(1, np.bincount(rep.sec_of, minlength=S) * rep.ndays)
+    share = rep.sec_hour.reshape(S, 24) / n[:, None]
+    heat = "".join(f"<tr><td>{html.escape(sec)}</td>" + "".join(
+        f'<td style="background:rgba(220,20,60,{share[s, h]:.2f})" title="{100 * share[s, h]:.0f}%"></td>' for h in range(24))
+        + "</tr>" for s, sec in enumerate(rep.sections))
+    hours = "".join(f"<th>{h}</th>" for h in range(24))
+    doc = f"""<!doctype html><meta charset="utf-8"><title>Utilization {rep.date_from}..{rep.date_to}</title>
+<style>body{{font-family:sans-serif}} table{{border-collapse:collapse;margin:8px 0}}
+td,th{{border:1px solid #ccc;padding:2px 6px;font-size:13px}} .heat td{{width:18px;height:18px}}</style>
+<h2>Utilization {rep.date_from} .. {rep.date_to} ({rep.ndays} days)</h2>
+<h3>Sections</h3>{table(rep.section_rows(), FIELDS[1:2] + FIELDS[3:])}
+<h3>Share of machines booked, by hour of day</h3><table class="heat"><tr><th></th>{hours}</tr>{heat}</table>
+<h3>Machines</h3>{table(rep.machine_rows(), FIELDS[1:3] + FIELDS[4:])}
+<p>{rep.rows} booking rows in {rep.seconds:.2f} s</p>
+"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(doc)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RemoteVNCBooking utilization report")
+    ap.add_argument("--backend", choices=("mysql", "sqlite"), help="default: DB_Config_sample.BACKEND")
+    ap.add_argument("--sqlite", metavar="PATH", help="SQLite file (implies --backend sqlite)")
+    ap.add_argument("--from", dest="start", help="first date (default: --weeks/--months before --to)")
+    ap.add_argument("--to", dest="end", help="last date (default: yesterday)")
+    ap.add_argument("--weeks", type=int)
+    ap.add_argument("--months", type=int)
+    ap.add_argument("--out", default="utilization.csv", help=".csv or .html")
+    ap.add_argument("--chunk", type=int, default=50000, help="rows per streamed chunk")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if a.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if np is None:
+        print("Utilization.py needs numpy (pip install numpy)"); return 2
+
+    d1 = date.fromisoformat(a.end) if a.end else datetime.now(TZ).date() - timedelta(days=1)
+    days = 7 * (a.weeks or 0) + 30 * (a.months or 0) or 28
+    d0 = date.fromisoformat(a.start) if a.start else d1 - timedelta(days=days - 1)
+    if d0 > d1:
+        print("--from is after --to"); return 2
+
+    backend = a.backend or getattr(DB_Config_sample, "BACKEND", "mysql")
+    repo = SQLiteRepo(a.sqlite) if a.sqlite else make_repo("mysql" if backend == "http" else backend)
+    machines = repo.inventory()         # retired machines keep their history in the range
+    if not machines:
+        print("no machines"); return 2
+    rep = UtilizationReport(machines, d0, d1).run(repo, a.chunk)
+    (write_html if a.out.lower().endswith((".html", ".htm")) else write_csv)(rep, a.out)
+    for r in rep.section_rows():
+        print(f"{r['name']:<8} {r['machines']:>4} machines  booked {r['booked_h']:>7} h ({r['utilization_pct']:>5}%)  "
+              f"used {r['used_h']:>7} h  idle-booked {r['idle_booked_h']:>7} h  peak {r['peak_hours']}")
+    print(f"{rep.rows} booking rows, {d0}..{d1}, {rep.seconds:.2f} s -> {a.out}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
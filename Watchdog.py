@@ -0,0 +1,123 @@
+# Watchdog.py — GUI event-loop stall monitor, PySide6 6.5.3 / Python 3.8
+import linecache, logging, os, sys, threading, time, traceback
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from PySide6.QtCore import QObject, QTimer, Qt
+
+from Metrics import Histogram, QUERY_STATS
+
+log = logging.getLogger("RemoteVNCBooking.watchdog")
+
+Stack = Tuple[Tuple[str, int, str], ...]
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class StallMonitor(QObject):
+    """Heartbeat timer on the GUI thread plus a sampler thread.
+
+    The heartbeat measures event-loop latency (late beats).  While the GUI
+    thread misses beats for longer than `threshold_ms`, the sampler grabs its
+    Python stack, so the stall can be logged together with the code that was
+    running (e.g. refresh_machine_leds -> Repo.conn)."""
+
+    def __init__(self, parent: Optional[QObject] = None, interval_ms: int = 20,
+                 threshold_ms: int = 250, max_stacks: int = 50):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.latency = Histogram()
+        self.stalls = 0
+        self.stalled_ms = 0.0
+        self.max_stall_ms = 0.0
+        self.sites: Counter = Counter()
+        self._max_stacks = max_stacks
+
+        self._gui_tid = threading.get_ident()
+        self._last = time.perf_counter()
+        self._samples: List[Stack] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._beat)
+        self._sampler = threading.Thread(target=self._sample_loop, name="ui-watchdog", daemon=True)
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._timer.start()
+        if not self._sampler.is_alive():
+            self._sampler.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+
+    # GUI thread
+    def _beat(self):
+        now = time.perf_counter()
+        gap = (now - self._last) * 1000.0
+        self._last = now
+        late = max(0.0, gap - self.interval_ms)
+        self.latency.add(late)
+        if gap < self.threshold_ms:
+            return
+        with self._lock:
+            samples, self._samples = self._samples, []
+        self.stalls += 1
+        self.stalled_ms += gap
+        self.max_stall_ms = max(self.max_stall_ms, gap)
+        QUERY_STATS.set_gauge("ui_stalls", self.stalls)
+        QUERY_STATS.set_gauge("ui_stall_max_ms", round(self.max_stall_ms))
+        if not samples:
+            log.warning("GUI event loop stalled %.0f ms (no stack sampled)", gap)
+            return
+        stack, hits = Counter(samples).most_common(1)[0]
+        site = self._site(stack)
+        self.sites[site] += 1
+        log.warning("GUI event loop stalled %.0f ms in %s (%d/%d samples)\n%s",
+                    gap, site, hits, len(samples),
+                    self._format(stack))
+
+    @staticmethod
+    def _format(stack: Stack) -> str:
+        out = []
+        for fn, line, name in stack:
+            out.append(f'  File "{fn}", line {line}, in {name}')
+            code = linecache.getline(fn, line).strip()
+            if code: out.append(f"    {code}")
+        return "\n".join(out)
+
+    @staticmethod
+    def _site(stack: Stack) -> str:
+        """Innermost frame that belongs to the application rather than a library."""
+        for fn, line, name in reversed(stack):
+            if os.path.abspath(fn).startswith(_APP_DIR) and not fn.endswith("Watchdog.py"):
+                return f"{name} ({os.path.basename(fn)}:{line})"
+        fn, line, name = stack[-1]
+        return f"{name} ({os.path.basename(fn)}:{line})"
+
+    # sampler thread
+    def _sample_loop(self):
+        period = max(0.01, self.threshold_ms / 4000.0)
+        while not self._stop.wait(period):
+            if (time.perf_counter() - self._last) * 1000.0 < self.threshold_ms:
+                continue
+            frame = sys._current_frames().get(self._gui_tid)
+            if frame is None:
+                continue
+            stack: Stack = tuple((f.filename, f.lineno, f.name) for f in traceback.extract_stack(frame))
+            with self._lock:
+                if len(self._samples) < self._max_stacks:
+                    self._samples.append(stack)
+
+    # reporting
+    def log_summary(self, level: int = logging.INFO):
+        h = self.latency
+        log.log(level, "event-loop latency n=%d mean=%.1f p95=%.0f p99=%.0f max=%.0f ms; "
+                       "stalls>%dms: %d, total %.1f s, worst %.0f ms",
+                h.n, h.mean(), h.percentile(95), h.percentile(99), h.hi,
+                self.threshold_ms, self.stalls, self.stalled_ms / 1000.0, self.max_stall_ms)
+        for site, n in self.sites.most_common(5):
+            log.log(level, "  stall site %-40s x%d", site, n)
@@ -0,0 +1,53 @@
+# test_connect_log.py — connect events spooled at shutdown survive to the next session, Python 3.8
+import os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ConnectLog import ConnectLog
+from Repo import SQLiteRepo, CircuitOpenError
+
+class FlakyRepo(SQLiteRepo):
+    """SQLite that can be switched off, as if the database were unreachable."""
+    down = False
+
+    def record_connections(self, rows):
+        if self.down:
+            raise CircuitOpenError(30.0)
+        return super().record_connections(rows)
+
+def _event(i: int) -> dict:
+    return {"machine_id": 1, "sn": "A_01", "wwid": "12345678", "at": f"2026-01-05 09:00:{i:02d}",
+            "outcome": "launched", "latency_ms": 10.0}
+
+class SpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.spool = os.path.join(self.dir.name, "connect_spool.jsonl")
+        self.repo = FlakyRepo(":memory:")
+        self.repo.seed_machines(["A_01"])
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _written(self):
+        with self.repo.conn() as cx, cx.cursor() as cur:
+            cur.execute("SELECT at FROM connections ORDER BY at")
+            return [r["at"] for r in cur.fetchall()]
+
+    def test_spool_after_torn_tail_is_replayed(self):
+        with open(self.spool, "w", encoding="utf-8") as f:
+            f.write('{"id": "torn", "machine_id": 1, "sn": "A_')      # previous writer died here
+        self.repo.down = True
+        cl = ConnectLog(self.repo, spool=self.spool)
+        cl.record(_event(1)); cl.record(_event(2))
+        cl.close(timeout=0)
+        self.assertEqual(len(cl.journal.read()), 2)
+
+        self.repo.down = False
+        cl = ConnectLog(self.repo, spool=self.spool)
+        self.assertTrue(cl.flush())
+        self.assertEqual(self._written(), ["2026-01-05 09:00:01", "2026-01-05 09:00:02"])
+        self.assertEqual(cl.journal.read(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# test_http_repo.py — which service answers HttpRepo treats as an outage, Python 3.8
+import json, os, sys, threading, unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Repo import HttpRepo, ServiceError, ServiceUnavailable, CircuitBreaker
+
+class _Handler(BaseHTTPRequestHandler):
+    status = 200
+    body = b"[]"
+
+    def do_GET(self):
+        self.send_response(self.status)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *a):
+        pass
+
+class StatusTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.repo = HttpRepo(self.url, timeout=2.0)
+
+    def tearDown(self):
+        self.server.shutdown(); self.server.server_close()
+
+    def _answer(self, status, body):
+        _Handler.status, _Handler.body = status, body
+
+    def test_500_is_an_error_not_an_outage(self):
+        self._answer(500, json.dumps({"error": "handler bug"}).encode())
+        with self.assertRaises(ServiceError) as cm:
+            self.repo.list_machines()
+        self.assertNotIsInstance(cm.exception, ServiceUnavailable)
+        self.assertFalse(self.repo.is_outage(cm.exception))
+        self.assertEqual(self.repo.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gateway_errors_are_outages(self):
+        for status in (502, 503, 504):
+            self._answer(status, b"<html>bad gateway</html>")
+            repo = HttpRepo(self.url, timeout=2.0)      # a fresh breaker each time
+            with self.assertRaises(ServiceUnavailable) as cm:
+                repo.list_machines()
+            self.assertEqual(cm.exception.status, status)
+            self.assertTrue(repo.is_outage(cm.exception))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# test_inventory.py — inventory diff / sync and the machines fingerprint, Python 3.8
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Inventory import diff_inventory, synced_cols
+from Repo import SQLiteRepo
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.repo = SQLiteRepo(":memory:")
+        self.repo.seed_machines(["A_01", "A_02", "B_01"])
+
+    def _sync(self, wanted, cols, at="2026-01-05 09:00:00"):
+        ins, upd, ret, _ = diff_inventory(self.repo.inventory(), wanted, cols)
+        return self.repo.sync_machines(ins, upd, ret, synced_cols(cols), at)
+
+    def test_diff(self):
+        cur = [{"sn": "A_01", "note": "x", "state": None}, {"sn": "A_02", "note": None, "state": "retired"},
+               {"sn": "B_01", "note": None, "state": None}]
+        ins, upd, ret, changed = diff_inventory(cur, [{"sn": "A_01", "note": "x"}, {"sn": "A_02", "note": "y"},
+                                                      {"sn": "C_01", "note": "z"}], ["note"])
+        self.assertEqual(ins, [{"sn": "C_01", "note": "z", "state": None}])
+        self.assertEqual(upd, [{"sn": "A_02", "note": "y", "state": None}])    # listed again: comes back
+        self.assertEqual(changed, {"A_02": ["note", "state"]})
+        self.assertEqual(ret, ["B_01"])
+
+    def test_sync_retires_inserts_and_keeps_history(self):
+        b01 = next(int(m["id"]) for m in self.repo.list_machines() if m["sn"] == "B_01")
+        self.repo.insert_booking(b01, "2026-01-05", 9, "Alice", "111")
+        res = self._sync([{"sn": "A_01"}, {"sn": "A_02"}, {"sn": "C_01", "owner": "lab"}], ["owner"])
+        self.assertEqual((res["inserted"], res["updated"], res["retired"]), (1, 0, 1))
+        self.assertEqual([m["sn"] for m in self.repo.list_machines()], ["A_01", "A_02", "C_01"])
+        self.assertEqual({m["sn"]: m["state"] for m in self.repo.inventory()}["B_01"], self.repo.RETIRED)
+        self.assertEqual(len(self.repo.bookings_of(b01, "2026-01-05")), 1)
+        again = self._sync([{"sn": "A_01"}, {"sn": "A_02"}, {"sn": "C_01", "owner": "lab"}], ["owner"])
+        self.assertEqual((again["inserted"], again["updated"], again["retired"]), (0, 0, 0))
+
+    def test_fingerprint_moves_when_stamp_is_not_newer(self):
+        with self.repo.conn() as cx, cx.cursor() as cur:
+            cur.execute("UPDATE machines SET data_update_at='2030-01-01 00:00:00' WHERE sn='A_02'")
+            cx.commit()
+        fp = self.repo.machines_fingerprint()
+        res = self._sync([{"sn": "A_01", "note": "x"}, {"sn": "A_02"}], ["note"])
+        self.assertEqual((res["updated"], res["retired"]), (1, 1))
+        self.assertGreater(res["at"], "2030-01-01 00:00:00")
+        self.assertNotEqual(self.repo.machines_fingerprint(), fp)
+        fp = self.repo.machines_fingerprint()
+        self._sync([{"sn": "A_01", "note": "y"}, {"sn": "A_02"}], ["note"], at=res["at"])   # same second
+        self.assertNotEqual(self.repo.machines_fingerprint(), fp)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# test_offline_journal.py — Journal recovery after a crash mid-append, Python 3.8
+import json, os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Offline import Journal, OfflineRepo
+from Repo import SQLiteRepo
+
+class TornLineTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "journal.jsonl")
+        self.journal = Journal(self.path)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _tear(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"id": "torn", "op": "bo')           # no newline: the process died here
+
+    def test_drop_skips_torn_line(self):
+        self.journal.append([{"id": "a"}, {"id": "b"}])
+        self._tear()
+        self.assertEqual([o["id"] for o in self.journal.read()], ["a", "b"])
+        self.journal.drop(["a"])
+        self.assertEqual([o["id"] for o in self.journal.read()], ["b"])
+        self.journal.append([{"id": "c"}])
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(l)["id"] for l in f], ["b", "c"])
+
+    def test_append_after_torn_line(self):
+        self.journal.append([{"id": "a"}])
+        self._tear()
+        self.journal.append([{"id": "c"}, {"id": "d"}])
+        self.assertEqual([o["id"] for o in self.journal.read()], ["a", "c", "d"])
+
+    def test_replay_empties_journal_with_torn_line(self):
+        repo = SQLiteRepo(":memory:")
+        repo.seed_machines(["A_01"])
+        mid = int(repo.list_machines()[0]["id"])
+        off = OfflineRepo(repo, self.path)
+        off.queue_booking(mid, "A_01", "2026-01-05", [9, 10], "Tester", "12345678")
+        self._tear()
+        res = off.replay()
+        self.assertEqual([r["result"] for r in res], ["won", "won"])
+        self.assertEqual(off.pending(), [])
+        self.assertEqual(off.replay(), [])
+        self.assertEqual(len(repo.bookings_of(mid, "2026-01-05")), 2)
+
+if __name__ == "__main__":
+    unittest.main()
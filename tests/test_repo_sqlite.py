@@ -0,0 +1,112 @@
+# test_repo_sqlite.py — apply_ops, expand_rules and sweep_unused on SQLite, Python 3.8
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Repo import SQLiteRepo
+
+D = "2026-01-05"                                    # a Monday
+
+def book(mid, slot, wwid, name=None, date_s=D):
+    return {"op": "book", "machine_id": mid, "date": date_s, "slot": slot, "display_name": name or wwid, "wwid": wwid}
+
+def cancel(mid, slot, expect, date_s=D):
+    return {"op": "cancel", "machine_id": mid, "date": date_s, "slot": slot, "expect_wwid": expect}
+
+class RepoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.repo = SQLiteRepo(":memory:")
+        self.repo.seed_machines(["A_01", "A_02"])
+        self.a1, self.a2 = (int(m["id"]) for m in self.repo.list_machines())
+
+    def held(self, mid, date_s=D):
+        return {int(r["slot"]): r["wwid"] for r in self.repo.bookings_of(mid, date_s)}
+
+class ApplyOpsTest(RepoTestCase):
+    def test_conflicts_are_lost_with_holder(self):
+        self.repo.insert_booking(self.a1, D, 10, "Alice", "111")
+        res = self.repo.apply_ops([book(self.a1, 9, "222"), book(self.a1, 10, "222"), book(self.a2, 10, "222")])
+        self.assertEqual([(r["result"], r["holder"]) for r in res], [("won", ""), ("lost", "Alice"), ("won", "")])
+        self.assertEqual(self.held(self.a1), {9: "222", 10: "111"})
+        self.assertEqual(self.held(self.a2), {10: "222"})
+
+    def test_cancel_needs_the_booker_the_user_saw(self):
+        self.repo.insert_booking(self.a1, D, 10, "Alice", "111")
+        res = self.repo.apply_ops([cancel(self.a1, 10, "222")])
+        self.assertEqual(res[0]["result"], "lost")
+        self.assertEqual(self.held(self.a1), {10: "111"})
+        res = self.repo.apply_ops([cancel(self.a1, 10, "111")])
+        self.assertEqual(res[0]["result"], "won")
+        self.assertEqual(self.held(self.a1), {})
+
+    def test_ops_apply_in_order(self):
+        res = self.repo.apply_ops([book(self.a1, 9, "111"), book(self.a1, 9, "222"), cancel(self.a1, 9, "111"),
+                                   book(self.a1, 9, "222")])
+        self.assertEqual([r["result"] for r in res], ["won", "lost", "won", "won"])
+        self.assertEqual(self.held(self.a1), {9: "222"})
+
+    def test_atomic_abort_writes_nothing(self):
+        self.repo.insert_booking(self.a2, D, 11, "Alice", "111")
+        res = self.repo.apply_ops([book(self.a1, 11, "222"), book(self.a2, 11, "222")], atomic=True)
+        self.assertEqual([r["result"] for r in res], ["aborted", "lost"])
+        self.assertEqual(self.held(self.a1), {})
+        self.assertEqual(self.held(self.a2), {11: "111"})
+
+    def test_atomic_commits_when_nothing_is_lost(self):
+        res = self.repo.apply_ops([book(self.a1, 11, "222"), book(self.a2, 11, "222")], atomic=True)
+        self.assertEqual([r["result"] for r in res], ["won", "won"])
+        self.assertEqual((self.held(self.a1), self.held(self.a2)), ({11: "222"}, {11: "222"}))
+
+class ExpandRulesTest(RepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo.create_recurring_schema()
+        self.repo.add_rule(self.a1, 9, 11, 1, "2026-01-01", None, "Team", "333")     # Mondays 9..11
+
+    def test_rerun_is_harmless(self):
+        first = self.repo.expand_rules(D)
+        self.assertEqual((first["rules"], first["booked"], first["kept"]), (1, 3, 0))
+        again = self.repo.expand_rules(D)
+        self.assertEqual((again["booked"], again["kept"]), (0, 3))
+        self.assertEqual(self.held(self.a1), {9: "333", 10: "333", 11: "333"})
+
+    def test_conflict_recorded_once(self):
+        self.repo.insert_booking(self.a1, D, 10, "Alice", "111")
+        first = self.repo.expand_rules(D)
+        self.assertEqual((first["booked"], len(first["conflicts"]), first["new_conflicts"]), (2, 1, 1))
+        again = self.repo.expand_rules(D)
+        self.assertEqual((again["booked"], again["new_conflicts"]), (0, 0))
+        self.assertEqual(self.held(self.a1), {9: "333", 10: "111", 11: "333"})
+
+    def test_other_weekdays_and_past_hours_are_skipped(self):
+        self.assertEqual(self.repo.expand_rules("2026-01-06")["rules"], 0)         # Tuesday
+        self.assertEqual(self.repo.expand_rules(D, from_slot=11)["booked"], 1)
+        self.assertEqual(self.held(self.a1), {11: "333"})
+
+class SweepUnusedTest(RepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo.create_usage_schema()
+
+    def _sweep(self, slot, sweep_id):
+        return self.repo.sweep_unused(D, slot, f"{D} {slot:02d}:00:00", sweep_id, f"{D} {slot:02d}:15:00")
+
+    def test_releases_only_unconnected_bookings(self):
+        self.repo.insert_booking(self.a1, D, 9, "Alice", "111")
+        self.repo.insert_booking(self.a2, D, 9, "Bob", "222")
+        self.repo.record_connections([{"machine_id": self.a2, "sn": "A_02", "wwid": "222", "at": f"{D} 09:05:00",
+                                       "outcome": "launched", "latency_ms": 1.0}])
+        rows = self._sweep(9, "s1")
+        self.assertEqual([(int(r["machine_id"]), r["wwid"]) for r in rows], [(self.a1, "111")])
+        self.assertEqual((self.held(self.a1), self.held(self.a2)), ({}, {9: "222"}))
+        self.assertEqual(self._sweep(9, "s2"), [])
+
+    def test_continued_run_is_kept(self):
+        self.repo.apply_ops([book(self.a1, 9, "111"), book(self.a1, 10, "111")])
+        self.repo.record_connections([{"machine_id": self.a1, "sn": "A_01", "wwid": "111", "at": f"{D} 09:05:00",
+                                       "outcome": "launched", "latency_ms": 1.0}])
+        self.assertEqual(self._sweep(10, "s1"), [])
+        self.assertEqual(self.held(self.a1), {9: "111", 10: "111"})
+
+if __name__ == "__main__":
+    unittest.main()
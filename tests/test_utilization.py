@@ -0,0 +1,54 @@
+# test_utilization.py — the streamed NumPy report does not depend on the chunk size, Python 3.8
+import os, random, sys, unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Repo import SQLiteRepo
+from Utilization import UtilizationReport, np
+
+D0 = date(2026, 1, 5)
+
+@unittest.skipIf(np is None, "numpy not installed")
+class ChunkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.repo = SQLiteRepo(":memory:")
+        cls.repo.seed_machines(["A_01", "A_02", "B_01", "C_01"])
+        cls.repo.create_usage_schema()
+        cls.machines = cls.repo.list_machines()
+        rnd = random.Random(7)
+        ops, conns = [], []
+        for m in cls.machines:
+            for day in range(7):
+                d = D0 + timedelta(days=day)
+                for slot in range(24):
+                    if rnd.random() < 0.3:
+                        w = rnd.choice(["111", "222"])
+                        ops.append({"op": "book", "machine_id": m["id"], "date": d.isoformat(), "slot": slot,
+                                    "display_name": w, "wwid": w})
+                        if rnd.random() < 0.4:
+                            conns.append({"machine_id": m["id"], "sn": m["sn"], "wwid": w, "outcome": "launched",
+                                          "at": f"{d} {slot:02d}:10:00", "latency_ms": 1.0})
+        cls.repo.apply_ops(ops)
+        cls.repo.record_connections(conns)
+
+    def _report(self, chunk):
+        rep = UtilizationReport(self.machines, D0, D0 + timedelta(days=6)).run(self.repo, chunk)
+        return rep.section_rows() + rep.machine_rows()
+
+    def test_same_result_for_any_chunk_size(self):
+        whole = self._report(100000)
+        self.assertGreater(sum(r["used_h"] for r in whole), 0)
+        for chunk in (1, 2, 7, 50):
+            self.assertEqual(self._report(chunk), whole, f"chunk={chunk}")
+
+    def test_totals_match_the_table(self):
+        rows = {r["name"]: r for r in self._report(13) if r["level"] == "machine"}
+        for m in self.machines:
+            n = sum(len(self.repo.bookings_of(m["id"], (D0 + timedelta(days=i)).isoformat())) for i in range(7))
+            self.assertEqual(rows[m["sn"]]["booked_h"], n)
+            self.assertLessEqual(rows[m["sn"]]["used_h"], n)
+
+if __name__ == "__main__":
+    unittest.main()